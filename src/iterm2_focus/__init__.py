@@ -1,5 +1,8 @@
 """iTerm2 Focus - Focus iTerm2 sessions by ID."""
 
+import importlib
+from typing import TYPE_CHECKING, Any
+
 __version__: str = "0.0.13"
 __author__: str = "mkusaka"
 __email__: str = "hinoshita1992@gmail.com"
@@ -7,11 +10,111 @@ __email__: str = "hinoshita1992@gmail.com"
 __all__: list[str] = [
     "focus_session",
     "FocusError",
+    "FocusTimeoutError",
+    "ITerm2UnavailableError",
     "get_session_info",
     "get_all_sessions",
+    "get_sessions_info",
+    "iter_sessions",
+    "sessions_exist",
     "focus_session_by_name",
+    "focus_session_by_path",
+    "find_session_by_path",
+    "find_session_by_pid",
+    "find_session_by_tty",
+    "find_session_by_job",
+    "search_sessions",
+    "Match",
+    "read_session",
+    "SessionOutput",
+    "wait_for_output",
+    "get_coalescing_stats",
+    "FocusScheduler",
+    "FocusOutcome",
+    "Session",
+    "SessionDiff",
+    "diff_sessions",
+    "watch_sessions",
+    "TopologySnapshot",
+    "async_get_snapshot",
+    "set_rpc_concurrency",
     "__version__",
 ]
 
-from .focus import FocusError, focus_session
-from .utils import focus_session_by_name, get_all_sessions, get_session_info
+# Where each export lives. They are imported on first use, so that loading
+# a light submodule (the CLI's shell completion, say) does not pull in
+# iTerm2's API.
+_EXPORTS: dict[str, str] = {
+    "get_coalescing_stats": "coalesce",
+    "SessionDiff": "diff",
+    "diff_sessions": "diff",
+    "FocusError": "focus",
+    "FocusTimeoutError": "focus",
+    "ITerm2UnavailableError": "focus",
+    "focus_session": "focus",
+    "find_session_by_job": "jobindex",
+    "find_session_by_path": "pathindex",
+    "focus_session_by_path": "pathindex",
+    "find_session_by_pid": "procindex",
+    "find_session_by_tty": "procindex",
+    "SessionOutput": "reader",
+    "read_session": "reader",
+    "wait_for_output": "reader",
+    "set_rpc_concurrency": "rpc",
+    "FocusOutcome": "scheduler",
+    "FocusScheduler": "scheduler",
+    "Match": "search",
+    "search_sessions": "search",
+    "Session": "session",
+    "TopologySnapshot": "topology",
+    "async_get_snapshot": "topology",
+    "focus_session_by_name": "utils",
+    "get_all_sessions": "utils",
+    "get_session_info": "utils",
+    "get_sessions_info": "utils",
+    "iter_sessions": "utils",
+    "sessions_exist": "utils",
+    "watch_sessions": "watch",
+}
+
+if TYPE_CHECKING:
+    from .coalesce import get_coalescing_stats
+    from .diff import SessionDiff, diff_sessions
+    from .focus import (
+        FocusError,
+        FocusTimeoutError,
+        ITerm2UnavailableError,
+        focus_session,
+    )
+    from .jobindex import find_session_by_job
+    from .pathindex import find_session_by_path, focus_session_by_path
+    from .procindex import find_session_by_pid, find_session_by_tty
+    from .reader import SessionOutput, read_session, wait_for_output
+    from .rpc import set_rpc_concurrency
+    from .scheduler import FocusOutcome, FocusScheduler
+    from .search import Match, search_sessions
+    from .session import Session
+    from .topology import TopologySnapshot, async_get_snapshot
+    from .utils import (
+        focus_session_by_name,
+        get_all_sessions,
+        get_session_info,
+        get_sessions_info,
+        iter_sessions,
+        sessions_exist,
+    )
+    from .watch import watch_sessions
+
+
+def __getattr__(name: str) -> Any:
+    """Import an export from its submodule on first access."""
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,158 @@
+"""Run many commands over a single iTerm2 connection."""
+
+import asyncio
+from collections.abc import AsyncIterator, Iterable
+from typing import Any
+
+from .errors import FocusError, FocusTimeoutError
+from .focus import _activate
+from .rpc import deadline_after, rpc
+from .session import Session
+from .topology import TopologySnapshot, async_get_snapshot
+from .utils import _session_details, _session_summary
+
+COMMANDS = ("focus", "info", "list", "exists", "find")
+
+
+class BatchRunner:
+    """Execute batch commands against one app snapshot.
+
+    The topology is snapshotted once, on the first command, so every later
+    lookup is a dictionary access instead of a walk over all windows.
+    """
+
+    def __init__(self, timeout: float | None = None) -> None:
+        """Initialize the runner.
+
+        Args:
+            timeout: Seconds each command may take, or None to wait forever
+        """
+        self.timeout = timeout
+        self._snapshot: TopologySnapshot | None = None
+
+    async def run(self, line: str) -> dict[str, Any]:
+        """Execute one command line.
+
+        Args:
+            line: A command such as "focus <session_id>" or "find <name>"
+
+        Returns:
+            The result record. "ok" is False if the command failed, with the
+            reason in "error".
+        """
+        command, _, argument = line.strip().partition(" ")
+        argument = argument.strip()
+        result: dict[str, Any] = {"command": command}
+
+        if command not in COMMANDS:
+            return {**result, "ok": False, "error": f"Unknown command: {command}"}
+        if command not in ("list", "find") and not argument:
+            return {**result, "ok": False, "error": "Missing session ID"}
+        if command == "find" and not argument:
+            return {**result, "ok": False, "error": "Missing name pattern"}
+
+        deadline = deadline_after(self.timeout)
+        try:
+            async with asyncio.timeout_at(deadline):
+                snapshot = await self._get_snapshot(deadline)
+                return {
+                    **result,
+                    "ok": True,
+                    **await self._execute(snapshot, command, argument),
+                }
+        except TimeoutError:
+            error = str(FocusTimeoutError(self.timeout))
+        except FocusError as e:
+            error = str(e)
+        except ConnectionError as e:
+            error = f"Failed to connect to iTerm2: {e}"
+        except Exception as e:
+            error = f"Unexpected error: {e}"
+        return {**result, "ok": False, "error": error}
+
+    async def _get_snapshot(self, deadline: float | None) -> TopologySnapshot:
+        """Connect and snapshot the topology unless already done."""
+        if self._snapshot is None:
+            self._snapshot = await async_get_snapshot(deadline)
+            if self._snapshot is None:
+                raise FocusError("Failed to get iTerm2 app instance.")
+        return self._snapshot
+
+    async def _execute(
+        self, snapshot: TopologySnapshot, command: str, argument: str
+    ) -> dict[str, Any]:
+        """Dispatch a validated command."""
+        if command == "list":
+            sessions = await self._summaries(snapshot.entries())
+            return {"sessions": [session.to_dict() for session in sessions]}
+        if command == "find":
+            sessions = await self._find(snapshot, argument)
+            return {"sessions": [session.to_dict() for session in sessions]}
+
+        # Remove the prefix (e.g., "w0t5p1:") if present
+        session_id = argument.split(":", 1)[1] if ":" in argument else argument
+        entry = snapshot.find(session_id)
+
+        if command == "exists":
+            return {"session_id": session_id, "exists": entry is not None}
+        if command == "info":
+            info = await _session_details(*entry) if entry is not None else None
+            return {
+                "session_id": session_id,
+                "session": info.to_dict() if info is not None else None,
+            }
+
+        if entry is not None:
+            await _activate(*entry)
+        return {"session_id": session_id, "focused": entry is not None}
+
+    async def _summaries(
+        self, entries: Iterable[tuple[Any, Any, Any]]
+    ) -> list[Session]:
+        """Fetch listing metadata for several sessions concurrently."""
+        return list(
+            await asyncio.gather(*(_session_summary(*entry) for entry in entries))
+        )
+
+    async def _find(
+        self, snapshot: TopologySnapshot, name_pattern: str
+    ) -> list[Session]:
+        """Return sessions whose name contains the pattern (case-insensitive)."""
+        entries = list(snapshot.entries())
+        names = await asyncio.gather(
+            *(
+                rpc(session.async_get_variable("session.name"))
+                for _, _, session in entries
+            )
+        )
+        name_lower = name_pattern.lower()
+        matches = [
+            entry
+            for entry, name in zip(entries, names, strict=True)
+            if name and name_lower in name.lower()
+        ]
+        return await self._summaries(matches)
+
+
+async def run_batch(
+    lines: Iterable[str], timeout: float | None = None
+) -> AsyncIterator[dict[str, Any]]:
+    """Execute newline-delimited commands over one connection.
+
+    Supported commands are "focus <id>", "info <id>", "exists <id>", "list"
+    and "find <name>". Blank lines and lines starting with "#" are skipped.
+    Commands run one after another, so results are yielded in input order as
+    soon as each one finishes.
+
+    Args:
+        lines: Command lines, e.g. an open text stream
+        timeout: Seconds each command may take, or None to wait forever
+
+    Yields:
+        One result record per command, including its 1-based line number
+    """
+    runner = BatchRunner(timeout)
+    for number, line in enumerate(lines, start=1):
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        yield {"line": number, **await runner.run(line)}
@@ -1,21 +1,82 @@
 """CLI interface for iterm2-focus."""
 
-import asyncio
-import os
+import math
 import sys
-from typing import NoReturn
+from pathlib import Path
 
 import click
-from iterm2.app import async_get_app
-from iterm2.connection import Connection
+from click.shell_completion import CompletionItem
 
 from . import __version__
-from .focus import FocusError, focus_session
-from .mcp import MCP_AVAILABLE
+from .store import load_cached_listing
+
+# Shell completion runs this module on every key press, so it imports only
+# what completion needs; the commands (and iTerm2's API) load on dispatch.
+
+
+class WaitSeconds(click.ParamType[float, str | float]):
+    """Seconds for --wait, pointing out a session ID given after it."""
+
+    name = "seconds"
+
+    def convert(
+        self,
+        value: str | float,
+        param: click.Parameter | None,
+        ctx: click.Context | None,
+    ) -> float:
+        if isinstance(value, float):
+            return value
+        try:
+            seconds = float(value)
+        except ValueError:
+            self.fail(
+                f"{value!r} is not a number of seconds. Put SESSION_ID before "
+                "--wait, as in: iterm2-focus SESSION_ID --wait",
+                param,
+                ctx,
+            )
+        if not seconds > 0:
+            self.fail(f"{value!r} is not a positive number of seconds.", param, ctx)
+        return seconds
+
+
+def _complete_session_id(
+    ctx: click.Context, param: click.Parameter, incomplete: str
+) -> list[CompletionItem]:
+    """Suggest session IDs from the cached listing.
+
+    Matches IDs starting with the typed text, then sessions whose name or
+    path contains it. Never contacts iTerm2, so completion stays instant;
+    the suggestions are as fresh as the last --list or --watch.
+    """
+    saved = load_cached_listing()
+    if saved is None:
+        return []
+
+    # Remove the prefix (e.g., "w0t5p1:") if present
+    typed = incomplete.split(":", 1)[1] if ":" in incomplete else incomplete
+    needle = typed.lower()
+    by_id: list[CompletionItem] = []
+    by_text: list[CompletionItem] = []
+    for s in saved.sessions:
+        if s.session_id.startswith(typed):
+            matches = by_id
+        elif needle and (
+            needle in (s.name or "").lower() or needle in (s.path or "").lower()
+        ):
+            matches = by_text
+        else:
+            continue
+        details = " ".join(part for part in (s.name, s.path) if part)
+        matches.append(CompletionItem(s.session_id, help=details or None))
+    return by_id + by_text
 
 
 @click.command()
-@click.argument("session_id", required=False, default=None)
+@click.argument(
+    "session_id", required=False, default=None, shell_complete=_complete_session_id
+)
 @click.option(
     "--version",
     "-v",
@@ -34,6 +95,88 @@ from .mcp import MCP_AVAILABLE
     is_flag=True,
     help="Get the current session ID and exit.",
 )
+@click.option(
+    "--back",
+    "-b",
+    is_flag=True,
+    help="Focus the previous session in the focus history.",
+)
+@click.option(
+    "--forward",
+    "-f",
+    is_flag=True,
+    help="Focus the next session in the focus history (after --back).",
+)
+@click.option(
+    "--mru",
+    metavar="N",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Focus the N-th most recently used session (1 is the previous one).",
+)
+@click.option(
+    "--jump",
+    "-j",
+    metavar="QUERY",
+    default=None,
+    help="Focus the most frequently and recently used session whose ID, "
+    "name or path contains every word of QUERY.",
+)
+@click.option(
+    "--cwd",
+    "cwd",
+    metavar="DIR",
+    type=click.Path(file_okay=False),
+    default=None,
+    help="Focus the session working in the deepest directory at or below DIR.",
+)
+@click.option(
+    "--tty",
+    metavar="DEVICE",
+    default=None,
+    help="Focus the session using a terminal device (e.g., ttys003).",
+)
+@click.option(
+    "--pid",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Focus the session a process runs in, found by its controlling "
+    "terminal if it is not the shell or foreground job.",
+)
+@click.option(
+    "--job",
+    metavar="NAME",
+    default=None,
+    help="Focus the session whose foreground job is NAME, or whose command "
+    "line contains NAME (or matches it as a glob such as 'make *test*').",
+)
+@click.option(
+    "--grep",
+    metavar="REGEX",
+    default=None,
+    help="Print the lines of session output matching REGEX, newest first "
+    "per session, as SESSION_ID:LINE: TEXT.",
+)
+@click.option(
+    "--focus-best",
+    is_flag=True,
+    help="With --grep, focus the session with the most recent match.",
+)
+@click.option(
+    "--scrollback",
+    metavar="LINES",
+    type=click.IntRange(min=1),
+    default=None,
+    help="With --grep, the number of newest lines searched per session "
+    "(default: 10000).",
+)
+@click.option(
+    "--wait-for",
+    metavar="REGEX",
+    default=None,
+    help="Wait until SESSION_ID (or, without one, the current session) "
+    "prints a line matching REGEX, print it, then focus SESSION_ID if given.",
+)
 @click.option(
     "--list",
     "-l",
@@ -41,6 +184,64 @@ from .mcp import MCP_AVAILABLE
     is_flag=True,
     help="List all available sessions.",
 )
+@click.option(
+    "--batch",
+    is_flag=True,
+    help="Read commands (focus, info, exists, list, find) from stdin "
+    "and print one JSON result per line.",
+)
+@click.option(
+    "--exists",
+    "check_exists",
+    is_flag=True,
+    help="Read session IDs from stdin and report which still exist. "
+    "Exits with status 1 if any is missing.",
+)
+@click.option(
+    "--if-changed-since",
+    metavar="VERSION",
+    default=None,
+    help="With --list, only list sessions if the layout version printed by "
+    "an earlier --list has changed.",
+)
+@click.option(
+    "--cached",
+    is_flag=True,
+    help="With --list, print the listing cached by the last live listing "
+    "without connecting to iTerm2.",
+)
+@click.option(
+    "--since",
+    metavar="FILE",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="With --list, show what changed since the listing saved in FILE, "
+    "then save the current listing there.",
+)
+@click.option(
+    "--watch",
+    is_flag=True,
+    help="Print one JSON line per change to the session list until "
+    "interrupted, keeping the listing cache and focus history up to date.",
+)
+@click.option(
+    "--wait",
+    metavar="[SECONDS]",
+    type=WaitSeconds(),
+    is_flag=False,
+    flag_value=math.inf,
+    default=None,
+    help="If SESSION_ID does not exist yet, wait for it to appear (up to "
+    "SECONDS, or without SECONDS up to --timeout) and focus it as soon as "
+    "it does.",
+)
+@click.option(
+    "--timeout",
+    "-t",
+    type=click.FloatRange(min=0, min_open=True),
+    default=None,
+    help="Give up after this many seconds. --list prints what arrived in time.",
+)
 @click.option(
     "--quiet",
     "-q",
@@ -52,184 +253,200 @@ from .mcp import MCP_AVAILABLE
     is_flag=True,
     help="Start as an MCP server.",
 )
+@click.option(
+    "--mcp-transport",
+    type=click.Choice(["stdio", "streamable-http", "sse"]),
+    default="stdio",
+    show_default=True,
+    help="Transport for the MCP server. HTTP transports listen on localhost.",
+)
+@click.option(
+    "--mcp-port",
+    type=int,
+    default=None,
+    help="Port for the HTTP transports (default: 8765).",
+)
+@click.option(
+    "--mcp-max-concurrency",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Maximum concurrent MCP requests over HTTP (default: 16).",
+)
+@click.option(
+    "--mcp-client-concurrency",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Maximum concurrent MCP requests per client over HTTP (default: 4).",
+)
+@click.option(
+    "--mcp-request-timeout",
+    type=click.FloatRange(min=0, min_open=True),
+    default=None,
+    help="Seconds before an MCP request over HTTP times out (default: 30).",
+)
+@click.option(
+    "--mcp-focus-window",
+    type=click.FloatRange(min=0),
+    default=None,
+    help="Seconds during which MCP focus requests are collapsed (default: 0.05).",
+)
 def main(
     session_id: str | None,
     version: bool,
     current: bool,
     get_current: bool,
+    back: bool,
+    forward: bool,
+    mru: int | None,
+    jump: str | None,
+    cwd: str | None,
+    tty: str | None,
+    pid: int | None,
+    job: str | None,
+    grep: str | None,
+    focus_best: bool,
+    scrollback: int | None,
+    wait_for: str | None,
     list_sessions: bool,
+    batch: bool,
+    check_exists: bool,
+    if_changed_since: str | None,
+    cached: bool,
+    since: Path | None,
+    watch: bool,
+    wait: float | None,
+    timeout: float | None,
     quiet: bool,
     mcp: bool,
+    mcp_transport: str,
+    mcp_port: int | None,
+    mcp_max_concurrency: int | None,
+    mcp_client_concurrency: int | None,
+    mcp_request_timeout: float | None,
+    mcp_focus_window: float | None,
 ) -> None:
     """Focus iTerm2 session by ID.
 
     \b
     Examples:
         iterm2-focus w0t0p0:12345678-1234-1234-1234-123456789012
+        iterm2-focus w0t0p0:12345678-1234-1234-1234-123456789012 --wait 5
         iterm2-focus --current
         iterm2-focus -c
         iterm2-focus --get-current
         iterm2-focus -g
+        iterm2-focus --back
+        iterm2-focus --mru 2
+        iterm2-focus --jump api
+        iterm2-focus --cwd ~/src/api
+        iterm2-focus --pid 12345
+        iterm2-focus --job pytest
+        iterm2-focus --grep 'Traceback|panicked' --focus-best
+        iterm2-focus w0t1p0:UUID --wait-for 'passed|failed'
         iterm2-focus --list
+        iterm2-focus --list --cached
+        iterm2-focus --list --since ~/.sessions.json
+        iterm2-focus --watch
+        iterm2-focus --exists < saved-session-ids.txt
+        printf 'exists ID\nfocus ID\n' | iterm2-focus --batch
         iterm2-focus --mcp  # Start as MCP server
+        iterm2-focus --mcp --mcp-transport streamable-http
     """
     if version:
         click.echo(f"iterm2-focus {__version__}")
         sys.exit(0)
 
+    if wait is not None and wait != math.inf and timeout is not None:
+        raise click.UsageError(
+            "--wait SECONDS and --timeout both limit the wait; give only one."
+        )
+
+    from . import commands
+    from .history import FocusHistory
+
     if mcp:
-        _start_mcp_server()
+        commands.start_mcp_server(
+            mcp_transport,
+            port=mcp_port,
+            max_concurrency=mcp_max_concurrency,
+            client_concurrency=mcp_client_concurrency,
+            request_timeout=mcp_request_timeout,
+            focus_window=mcp_focus_window,
+        )
         sys.exit(0)
 
     if get_current:
-        _get_current_session_id(quiet)
+        commands.print_current_session_id(quiet)
         sys.exit(0)
 
     if list_sessions:
-        _list_sessions()
+        if cached:
+            commands.list_cached()
+        elif since is not None:
+            commands.list_changes(since, timeout)
+        else:
+            commands.list_sessions(timeout, if_changed_since)
         sys.exit(0)
 
-    if current:
-        session_id = os.environ.get("ITERM_SESSION_ID")
-        if not session_id:
-            _error_exit(
-                "ITERM_SESSION_ID environment variable not found.",
-                "Are you running this from within iTerm2?",
-            )
-        # Remove the prefix (e.g., "w0t5p1:") if present
-        if ":" in session_id:
-            session_id = session_id.split(":", 1)[1]
-    elif not session_id:
-        click.echo(click.get_current_context().get_help())
-        sys.exit(1)
+    if watch:
+        commands.watch_changes(timeout)
+        sys.exit(0)
 
-    # Type narrowing: session_id is definitely not None here
-    assert session_id is not None
+    if batch:
+        commands.run_commands(timeout)
+        sys.exit(0)
 
-    # Remove the prefix (e.g., "w0t5p1:") if present
-    if ":" in session_id:
-        session_id = session_id.split(":", 1)[1]
-
-    try:
-        result = focus_session(session_id)
-        if result:
-            if not quiet:
-                click.echo(f"Focused session: {session_id}")
+    if check_exists:
+        commands.check_exists(timeout, quiet)
+        sys.exit(0)
+
+    if back or forward or mru is not None:
+        if back:
+            commands.focus_from_history(FocusHistory.back, timeout, quiet)
+        elif forward:
+            commands.focus_from_history(FocusHistory.forward, timeout, quiet)
         else:
-            _error_exit(f"Session not found: {session_id}")
-    except FocusError as e:
-        _error_exit(
-            str(e),
-            "",
-            "Make sure iTerm2's Python API is enabled:",
-            "iTerm2 → Settings → General → Magic → Enable Python API",
-        )
+            assert mru is not None
+            commands.focus_from_history(
+                lambda h: h.mru(mru), timeout, quiet, revisit=True
+            )
+        sys.exit(0)
 
+    if jump is not None:
+        commands.jump(jump, timeout, quiet)
+        sys.exit(0)
 
-def _error_exit(*messages: str) -> NoReturn:
-    """Print error messages and exit with status 1."""
-    for i, msg in enumerate(messages):
-        if i == 0:
-            click.echo(f"Error: {msg}", err=True)
-        else:
-            click.echo(msg, err=True)
-    sys.exit(1)
-
-
-def _get_current_session_id(quiet: bool) -> None:
-    """Get and display the current session ID."""
-    session_id = os.environ.get("ITERM_SESSION_ID")
-    if session_id:
-        # Remove the prefix (e.g., "w0t5p1:") if present
-        if ":" in session_id:
-            session_id = session_id.split(":", 1)[1]
-        click.echo(session_id)
-    else:
-        _error_exit(
-            "ITERM_SESSION_ID environment variable not found.",
-            "Are you running this from within iTerm2?",
-        )
+    if cwd is not None:
+        commands.focus_by_cwd(cwd, timeout, quiet)
+        sys.exit(0)
 
+    if tty is not None:
+        commands.focus_by_tty(tty, timeout, quiet)
+        sys.exit(0)
 
-def _list_sessions() -> None:
-    """List all available iTerm2 sessions."""
-
-    async def list_all_sessions() -> list[dict[str, str | None]]:
-        """Async function to get all sessions."""
-        connection = await Connection.async_create()
-        app = await async_get_app(connection)
-        if app is None:
-            return []
-
-        sessions: list[dict[str, str | None]] = []
-        for window in app.terminal_windows:
-            for tab in window.tabs:
-                for session in tab.sessions:
-                    name = await session.async_get_variable("session.name")
-                    hostname = await session.async_get_variable("hostname")
-                    username = await session.async_get_variable("username")
-                    path = await session.async_get_variable("path")
-
-                    sessions.append(
-                        {
-                            "id": session.session_id,
-                            "name": name or "Unnamed",
-                            "window": window.window_id,
-                            "tab": tab.tab_id,
-                            "hostname": hostname,
-                            "username": username,
-                            "path": path,
-                        }
-                    )
-        return sessions
-
-    try:
-        sessions = asyncio.run(list_all_sessions())
-
-        if not sessions:
-            click.echo("No sessions found.")
-            return
-
-        click.echo("Available iTerm2 sessions:")
-        click.echo("-" * 80)
-
-        for s in sessions:
-            click.echo(f"ID: {s['id']}")
-            click.echo(f"  Name: {s['name']}")
-            click.echo(f"  Window: {s['window']}, Tab: {s['tab']}")
-
-            if s.get("hostname") and s["hostname"] != "localhost":
-                click.echo(f"  Host: {s['username']}@{s['hostname']}")
-
-            if s.get("path"):
-                click.echo(f"  Path: {s['path']}")
-
-            click.echo()
-
-    except Exception as e:
-        _error_exit(f"Failed to list sessions: {e}")
-
-
-def _start_mcp_server() -> None:
-    """Start the MCP server."""
-    if not MCP_AVAILABLE:
-        _error_exit(
-            "MCP dependencies are not installed.",
-            "",
-            "Install with: pip install 'iterm2-focus[mcp]'",
-        )
+    if pid is not None:
+        commands.focus_by_pid(pid, timeout, quiet)
+        sys.exit(0)
+
+    if job is not None:
+        commands.focus_by_job(job, timeout, quiet)
+        sys.exit(0)
+
+    if grep is not None:
+        commands.grep(grep, scrollback, focus_best, timeout, quiet)
+        sys.exit(0)
 
-    from .mcp.__main__ import main as mcp_main
+    if wait_for is not None:
+        commands.wait_for(session_id, wait_for, current, timeout, quiet)
+        sys.exit(0)
 
-    click.echo("Starting iterm2-focus MCP server...")
-    click.echo("Server is running. Press Ctrl+C to stop.")
+    if current:
+        session_id = commands.current_session_id()
+    elif not session_id:
+        click.echo(click.get_current_context().get_help())
+        sys.exit(1)
 
-    try:
-        mcp_main()
-    except KeyboardInterrupt:
-        click.echo("\nServer stopped.")
-    except Exception as e:
-        _error_exit(f"Failed to start MCP server: {e}")
+    commands.focus(session_id, wait, timeout, quiet)
 
 
 if __name__ == "__main__":
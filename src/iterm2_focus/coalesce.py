@@ -0,0 +1,78 @@
+"""Single-flight coalescing of concurrent identical requests."""
+
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Share one in-flight call among concurrent callers with the same key.
+
+    The first caller for a key starts the call; callers arriving while it is
+    still running wait for it and receive the very same result (or
+    exception) instead of starting their own. Once the call finishes the key
+    is forgotten, so later callers trigger a fresh call.
+
+    The call runs in its own task, so a caller that is cancelled does not
+    cancel the call for the others.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: dict[tuple[Any, ...], asyncio.Future[Any]] = {}
+        self._stats: dict[str, dict[str, int]] = {}
+
+    async def do(self, key: tuple[Hashable, ...], fn: Callable[[], Awaitable[T]]) -> T:
+        """Run ``fn`` unless an identical call is already in flight.
+
+        Args:
+            key: Identifies the call; its first element names the operation
+                and is used for the statistics
+            fn: Zero-argument coroutine function performing the call
+
+        Returns:
+            The result of the (possibly shared) call
+        """
+        # Futures are bound to their event loop, so never share across loops.
+        full_key = (asyncio.get_running_loop(), *key)
+        counts = self._stats.setdefault(str(key[0]), {"executed": 0, "coalesced": 0})
+
+        future = self._inflight.get(full_key)
+        if future is None:
+            future = asyncio.ensure_future(fn())
+            self._inflight[full_key] = future
+            future.add_done_callback(lambda f: self._forget(full_key, f))
+            counts["executed"] += 1
+        else:
+            counts["coalesced"] += 1
+
+        return await asyncio.shield(future)
+
+    def _forget(self, full_key: tuple[Any, ...], future: asyncio.Future[Any]) -> None:
+        """Drop a finished call, marking its exception as retrieved."""
+        if self._inflight.get(full_key) is future:
+            del self._inflight[full_key]
+        if not future.cancelled():
+            future.exception()
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """Return executed and coalesced call counts per operation."""
+        return {name: dict(counts) for name, counts in self._stats.items()}
+
+    def reset_stats(self) -> None:
+        """Reset all counters to zero."""
+        self._stats.clear()
+
+
+# Process-wide instance shared by the library and the MCP tools
+single_flight = SingleFlight()
+
+
+def get_coalescing_stats() -> dict[str, dict[str, int]]:
+    """Return how many calls were executed versus coalesced, per operation.
+
+    Returns:
+        Mapping of operation name to ``{"executed": n, "coalesced": m}``
+    """
+    return single_flight.stats()
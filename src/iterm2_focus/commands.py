@@ -0,0 +1,755 @@
+"""Command implementations behind the CLI.
+
+cli.py imports this module only once the arguments are parsed, so shell
+completion never loads iterm2 or asyncio.
+"""
+
+import asyncio
+import contextlib
+import importlib.util
+import json
+import math
+import os
+import re
+import sys
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import NoReturn, TypedDict
+
+import click
+
+from .batch import run_batch
+from .diff import SessionDiff, diff_sessions
+from .focus import (
+    FocusError,
+    FocusTimeoutError,
+    ITerm2UnavailableError,
+    async_focus_session,
+    focus_session,
+)
+from .frecency import load_frecency, record_visit, save_frecency
+from .history import FocusHistory, load_history, save_history
+from .jobindex import find_session_by_job
+from .pathindex import PathTrie, find_session_by_path
+from .procindex import find_session_by_pid, find_session_by_tty
+from .reader import wait_for_output
+from .rpc import deadline_after, time_left
+from .search import DEFAULT_SCROLLBACK, Match, best_match, search_sessions
+from .session import Session
+from .store import (
+    cache_listing,
+    cache_path,
+    load_cached_listing,
+    load_listing,
+    save_listing,
+)
+from .topology import TopologySnapshot, async_get_snapshot
+from .utils import get_all_sessions, sessions_exist
+from .watch import record_focus_changes, watch_sessions
+
+# Checked without importing the MCP server, which would slow down every
+# invocation.
+MCP_AVAILABLE = importlib.util.find_spec("mcp") is not None
+
+
+class _ServerOptions(TypedDict, total=False):
+    """MCP server options given on the command line."""
+
+    port: int
+    max_concurrency: int
+    client_concurrency: int
+    request_timeout: float
+    focus_window: float
+
+
+def _error_exit(*messages: str) -> NoReturn:
+    """Print error messages and exit with status 1."""
+    for i, msg in enumerate(messages):
+        if i == 0:
+            click.echo(f"Error: {msg}", err=True)
+        else:
+            click.echo(msg, err=True)
+    sys.exit(1)
+
+
+def _current_session_id() -> str | None:
+    """Return $ITERM_SESSION_ID without its prefix, or None if unset."""
+    session_id = os.environ.get("ITERM_SESSION_ID")
+    if not session_id:
+        return None
+    # Remove the prefix (e.g., "w0t5p1:") if present
+    return session_id.split(":", 1)[1] if ":" in session_id else session_id
+
+
+def focus(
+    session_id: str,
+    wait: float | None = None,
+    timeout: float | None = None,
+    quiet: bool = False,
+) -> None:
+    """Focus a session by ID and record the visit.
+
+    Args:
+        session_id: The iTerm2 session ID, with or without its prefix
+        wait: If set, wait for a missing session to appear, for up to this
+            many seconds, which replace timeout (math.inf: up to timeout)
+        timeout: Seconds to wait before giving up
+        quiet: Suppress output messages
+    """
+    # Remove the prefix (e.g., "w0t5p1:") if present
+    if ":" in session_id:
+        session_id = session_id.split(":", 1)[1]
+
+    if wait is not None and wait != math.inf:
+        timeout = wait
+
+    try:
+        result = focus_session(session_id, timeout=timeout, wait=wait is not None)
+        if result:
+            if not quiet:
+                click.echo(f"Focused session: {session_id}")
+        else:
+            _error_exit(f"Session not found: {session_id}")
+    except FocusTimeoutError as e:
+        if wait is not None:
+            _error_exit(
+                f"Session did not appear within {timeout} seconds: {session_id}"
+            )
+        _error_exit(str(e))
+    except ITerm2UnavailableError as e:
+        _error_exit(str(e))
+    except FocusError as e:
+        _error_exit(
+            str(e),
+            "",
+            "Make sure iTerm2's Python API is enabled:",
+            "iTerm2 → Settings → General → Magic → Enable Python API",
+        )
+
+
+def current_session_id() -> str:
+    """Return the current session ID, or exit if not run inside iTerm2."""
+    session_id = _current_session_id()
+    if not session_id:
+        _error_exit(
+            "ITERM_SESSION_ID environment variable not found.",
+            "Are you running this from within iTerm2?",
+        )
+    return session_id
+
+
+def focus_from_history(
+    move: Callable[[FocusHistory], str | None],
+    timeout: float | None = None,
+    quiet: bool = False,
+    revisit: bool = False,
+) -> None:
+    """Focus the session chosen by move from the focus history.
+
+    Terminated sessions are dropped from the history before moving, so they
+    are skipped. The target is focused by ID against a single snapshot,
+    without fetching any session metadata.
+
+    Args:
+        move: Picks the target and moves the history cursor
+        timeout: Seconds to wait before giving up
+        quiet: Suppress output messages
+        revisit: Record the target as a new visit, as for --mru
+    """
+    history = load_history()
+    origin = _current_session_id()
+    if origin:
+        history.record(origin)
+
+    async def focus_target() -> str | None:
+        """Focus the chosen session and return its ID, or None if none."""
+        snapshot = await async_get_snapshot(deadline_after(timeout))
+        if snapshot is None:
+            raise FocusError("Failed to get iTerm2 app instance.")
+
+        history.forget(lambda session_id: session_id not in snapshot)
+        target = move(history)
+        if target is not None:
+            # The history is saved below, with the cursor where move left it
+            await async_focus_session(target, timeout, snapshot, record=False)
+        return target
+
+    try:
+        target = asyncio.run(focus_target())
+    except (FocusTimeoutError, ITerm2UnavailableError) as e:
+        _error_exit(str(e))
+    except Exception as e:
+        _error_exit(f"Failed to focus session: {e}")
+
+    if target is not None and revisit:
+        history.record(target)
+    with contextlib.suppress(OSError):
+        save_history(history)
+
+    if target is None:
+        _error_exit("No such session in the focus history.")
+    record_visit(target)
+    if not quiet:
+        click.echo(f"Focused session: {target}")
+
+
+def jump(query: str, timeout: float | None = None, quiet: bool = False) -> None:
+    """Focus the highest-ranked session matching query.
+
+    Sessions are ranked from the local frecency database alone; iTerm2 is
+    only contacted to check the winner still exists and to focus it.
+    Candidates that have been closed are dropped from the database.
+    """
+    store = load_frecency()
+    candidates = store.rank(query)
+    if not candidates:
+        _error_exit(f"No visited session matches: {query}")
+
+    async def focus_best() -> str | None:
+        """Focus the best candidate that still exists and return its ID."""
+        snapshot = await async_get_snapshot(deadline_after(timeout))
+        if snapshot is None:
+            raise FocusError("Failed to get iTerm2 app instance.")
+
+        target = None
+        for candidate in candidates:
+            if candidate.session_id in snapshot:
+                target = candidate.session_id
+                break
+            store.forget(candidate.session_id)
+        # Saved first, since focusing records the visit in the same file
+        with contextlib.suppress(OSError):
+            save_frecency(store)
+        if target is not None:
+            await async_focus_session(target, timeout, snapshot)
+        return target
+
+    try:
+        target = asyncio.run(focus_best())
+    except (FocusTimeoutError, ITerm2UnavailableError) as e:
+        _error_exit(str(e))
+    except Exception as e:
+        _error_exit(f"Failed to focus session: {e}")
+
+    if target is None:
+        _error_exit(f"No open session matches: {query}")
+
+    if not quiet:
+        click.echo(f"Focused session: {target}")
+
+
+def _focus_found(
+    find: Callable[[TopologySnapshot], Awaitable[str | None]],
+    not_found: str,
+    timeout: float | None = None,
+    quiet: bool = False,
+) -> None:
+    """Focus the session picked by find and record the visit.
+
+    Args:
+        find: Returns the ID of the session to focus in a snapshot, or None
+        not_found: Error message when find returns None
+        timeout: Seconds to wait before giving up
+        quiet: Suppress output messages
+    """
+
+    async def find_and_focus() -> str | None:
+        """Focus the session found and return its ID, or None if none."""
+        snapshot = await async_get_snapshot(deadline_after(timeout))
+        if snapshot is None:
+            raise FocusError("Failed to get iTerm2 app instance.")
+
+        session_id = await find(snapshot)
+        if session_id is not None:
+            await async_focus_session(session_id, timeout, snapshot)
+        return session_id
+
+    try:
+        session_id = asyncio.run(find_and_focus())
+    except (FocusTimeoutError, ITerm2UnavailableError) as e:
+        _error_exit(str(e))
+    except Exception as e:
+        _error_exit(f"Failed to focus session: {e}")
+
+    if session_id is None:
+        _error_exit(not_found)
+    if not quiet:
+        click.echo(f"Focused session: {session_id}")
+
+
+def focus_by_cwd(
+    directory: str, timeout: float | None = None, quiet: bool = False
+) -> None:
+    """Focus the session working in the deepest directory under directory.
+
+    A fresh cached listing answers the lookup without fetching any paths;
+    otherwise every session's path is fetched once.
+    """
+    directory = os.path.abspath(os.path.expanduser(directory))
+
+    async def find_deepest(snapshot: TopologySnapshot) -> str | None:
+        """Return the deepest session under directory."""
+        saved = load_cached_listing()
+        if saved is not None and not saved.stale:
+            trie = PathTrie(
+                (s.session_id, s.path)
+                for s in saved.sessions
+                if s.session_id in snapshot
+            )
+            session_id = trie.deepest_under(directory)
+            if session_id is not None:
+                return session_id
+        return await find_session_by_path(directory, timeout, snapshot)
+
+    _focus_found(find_deepest, f"No session under {directory}", timeout, quiet)
+
+
+def focus_by_tty(tty: str, timeout: float | None = None, quiet: bool = False) -> None:
+    """Focus the session using a terminal device."""
+    _focus_found(
+        lambda snapshot: find_session_by_tty(tty, timeout, snapshot),
+        f"No session uses terminal {tty}",
+        timeout,
+        quiet,
+    )
+
+
+def focus_by_pid(pid: int, timeout: float | None = None, quiet: bool = False) -> None:
+    """Focus the session a process runs in."""
+    _focus_found(
+        lambda snapshot: find_session_by_pid(pid, timeout, snapshot),
+        f"Process {pid} does not run in any session",
+        timeout,
+        quiet,
+    )
+
+
+def focus_by_job(job: str, timeout: float | None = None, quiet: bool = False) -> None:
+    """Focus the session whose foreground job matches job."""
+    _focus_found(
+        lambda snapshot: find_session_by_job(job, timeout, snapshot),
+        f"No session is running {job}",
+        timeout,
+        quiet,
+    )
+
+
+def grep(
+    pattern: str,
+    scrollback: int | None = None,
+    focus_best: bool = False,
+    timeout: float | None = None,
+    quiet: bool = False,
+) -> None:
+    """Print matching lines of session output as they are found.
+
+    Exits with status 1 if nothing matches. On timeout the matches found so
+    far count, including for focus_best.
+    """
+    try:
+        regex = re.compile(pattern)
+    except re.error as e:
+        _error_exit(f"Invalid regular expression {pattern!r}: {e}")
+    if scrollback is None:
+        scrollback = DEFAULT_SCROLLBACK
+
+    matches: list[Match] = []
+
+    async def search() -> Match | None:
+        """Print the matches and focus the best one if asked to."""
+        snapshot = await async_get_snapshot(deadline_after(timeout))
+        if snapshot is None:
+            raise FocusError("Failed to get iTerm2 app instance.")
+
+        try:
+            async with contextlib.aclosing(
+                search_sessions(regex, timeout, snapshot, scrollback)
+            ) as found:
+                async for match in found:
+                    matches.append(match)
+                    if not quiet:
+                        click.echo(f"{match.session_id}:{match.line}: {match.text}")
+        except FocusTimeoutError:
+            click.echo(
+                f"Warning: timed out after {timeout} seconds; "
+                "not every session was searched.",
+                err=True,
+            )
+
+        best = best_match(matches)
+        if focus_best and best is not None:
+            await async_focus_session(best.session_id, timeout, snapshot)
+        return best
+
+    try:
+        best = asyncio.run(search())
+    except (FocusTimeoutError, ITerm2UnavailableError) as e:
+        _error_exit(str(e))
+    except Exception as e:
+        _error_exit(f"Failed to search sessions: {e}")
+
+    if best is None:
+        _error_exit(f"No session output matches {pattern}")
+    if focus_best and not quiet:
+        click.echo(f"Focused session: {best.session_id}")
+
+
+def wait_for(
+    session_id: str | None,
+    pattern: str,
+    current: bool = False,
+    timeout: float | None = None,
+    quiet: bool = False,
+) -> None:
+    """Wait for a session to print a matching line, then maybe focus it.
+
+    Naming the session, or passing current, asks for it to be focused once
+    the line appears; without either, the current session is waited in and
+    nothing is focused. Exits with status 1 if the timeout passes or the
+    session closes first.
+    """
+    focus = session_id is not None or current
+    if session_id is None:
+        session_id = _current_session_id()
+    if not session_id:
+        _error_exit(
+            "ITERM_SESSION_ID environment variable not found.",
+            "Pass the SESSION_ID to wait in.",
+        )
+    # Remove the prefix (e.g., "w0t5p1:") if present
+    if ":" in session_id:
+        session_id = session_id.split(":", 1)[1]
+
+    try:
+        regex = re.compile(pattern)
+    except re.error as e:
+        _error_exit(f"Invalid regular expression {pattern!r}: {e}")
+
+    async def wait() -> Match | None:
+        """Wait for the match and focus the session if asked to."""
+        snapshot = await async_get_snapshot(deadline_after(timeout))
+        if snapshot is None:
+            raise FocusError("Failed to get iTerm2 app instance.")
+
+        match = await wait_for_output(session_id, regex, timeout, snapshot=snapshot)
+        if focus and match is not None:
+            await async_focus_session(session_id, timeout)
+        return match
+
+    try:
+        match = asyncio.run(wait())
+    except (FocusTimeoutError, ITerm2UnavailableError) as e:
+        _error_exit(str(e))
+    except Exception as e:
+        _error_exit(f"Failed to wait for output: {e}")
+
+    if match is None:
+        _error_exit(f"Session not found or closed: {session_id}")
+    if not quiet:
+        click.echo(f"{match.session_id}:{match.line}: {match.text}")
+    if focus and not quiet:
+        click.echo(f"Focused session: {session_id}")
+
+
+def print_current_session_id(quiet: bool) -> None:
+    """Get and display the current session ID."""
+    session_id = os.environ.get("ITERM_SESSION_ID")
+    if session_id:
+        # Remove the prefix (e.g., "w0t5p1:") if present
+        if ":" in session_id:
+            session_id = session_id.split(":", 1)[1]
+        click.echo(session_id)
+    else:
+        _error_exit(
+            "ITERM_SESSION_ID environment variable not found.",
+            "Are you running this from within iTerm2?",
+        )
+
+
+def list_sessions(
+    timeout: float | None = None, if_changed_since: str | None = None
+) -> None:
+    """List all available iTerm2 sessions.
+
+    If the layout version still matches if_changed_since, only a short
+    notice is printed and no session metadata is fetched.
+    """
+    version: str | None = None
+
+    async def list_all_sessions() -> list[Session] | None:
+        """Async function to get all sessions, or None if unchanged."""
+        nonlocal version
+        deadline = deadline_after(timeout)
+        snapshot = await async_get_snapshot(deadline)
+        if snapshot is None:
+            return []
+
+        version = snapshot.etag
+        if version == if_changed_since:
+            return None
+
+        sessions = await get_all_sessions(time_left(deadline), snapshot)
+        if len(sessions) < len(snapshot.sessions):
+            click.echo(
+                f"Warning: timed out after {timeout} seconds; "
+                f"showing {len(sessions)} of {len(snapshot.sessions)} sessions.",
+                err=True,
+            )
+        else:
+            cache_listing(sessions, version)
+        return sessions
+
+    try:
+        sessions = asyncio.run(list_all_sessions())
+
+        if sessions is None:
+            click.echo(f"Unchanged since version {if_changed_since}.")
+            return
+
+        _echo_sessions(sessions, "Available iTerm2 sessions:", version)
+
+    except TimeoutError:
+        _error_exit(f"Failed to list sessions: timed out after {timeout} seconds.")
+    except Exception as e:
+        _error_exit(f"Failed to list sessions: {e}")
+
+
+def list_cached() -> None:
+    """Print the cached listing without connecting to iTerm2."""
+    saved = load_cached_listing()
+    if saved is None:
+        _error_exit(
+            f"No cached listing in {cache_path()}.",
+            "Run iterm2-focus --list or --watch to create one.",
+        )
+
+    age = _format_age(saved.age)
+    if saved.stale:
+        click.echo(
+            f"Warning: the cached listing is {age} old and may be out of date; "
+            "run iterm2-focus --list to refresh it.",
+            err=True,
+        )
+    _echo_sessions(
+        list(saved.sessions),
+        f"Cached iTerm2 sessions (as of {age} ago):",
+        saved.version,
+    )
+
+
+def _format_age(seconds: float) -> str:
+    """Format a duration as a short age such as 45s, 12m or 3h."""
+    if seconds < 60:
+        return f"{int(seconds)}s"
+    if seconds < 3600:
+        return f"{int(seconds // 60)}m"
+    return f"{int(seconds // 3600)}h"
+
+
+def _echo_sessions(sessions: list[Session], title: str, version: str | None) -> None:
+    """Print a session listing under a title, followed by its version."""
+    if not sessions:
+        click.echo("No sessions found.")
+        return
+
+    click.echo(title)
+    click.echo("-" * 80)
+
+    for s in sessions:
+        click.echo(f"ID: {s.session_id}")
+        click.echo(f"  Name: {s.name or 'Unnamed'}")
+        click.echo(f"  Window: {s.window_id}, Tab: {s.tab_id}")
+
+        if s.hostname and s.hostname != "localhost":
+            click.echo(f"  Host: {s.username}@{s.hostname}")
+
+        if s.path:
+            click.echo(f"  Path: {s.path}")
+
+        click.echo()
+
+    if version is not None:
+        click.echo(f"Version: {version}")
+
+
+def list_changes(path: Path, timeout: float | None = None) -> None:
+    """Print how the sessions changed since the listing saved in path.
+
+    A missing or unreadable file counts as an empty listing. The current
+    listing is then saved to path for the next call, unless it is incomplete.
+    """
+
+    async def fetch() -> tuple[list[Session], str]:
+        """Get every session and the layout version they belong to."""
+        deadline = deadline_after(timeout)
+        snapshot = await async_get_snapshot(deadline)
+        if snapshot is None:
+            raise FocusError("Failed to get iTerm2 app instance.")
+
+        sessions = await get_all_sessions(time_left(deadline), snapshot)
+        # A partial listing would report the missing sessions as removed
+        if len(sessions) < len(snapshot.sessions):
+            raise TimeoutError
+        return sessions, snapshot.etag
+
+    saved = load_listing(path)
+    try:
+        sessions, version = asyncio.run(fetch())
+    except TimeoutError:
+        _error_exit(f"Failed to list sessions: timed out after {timeout} seconds.")
+    except Exception as e:
+        _error_exit(f"Failed to list sessions: {e}")
+
+    cache_listing(sessions, version)
+    delta = diff_sessions(saved.sessions if saved else (), sessions)
+    if delta:
+        _echo_diff(delta)
+    else:
+        click.echo("No changes.")
+
+    try:
+        save_listing(path, sessions, version)
+    except OSError as e:
+        _error_exit(f"Failed to save listing to {path}: {e}")
+
+
+def _echo_diff(delta: SessionDiff) -> None:
+    """Print one line per change."""
+    for s in delta.added:
+        click.echo(f"+ {s.session_id}  {s.name or 'Unnamed'}")
+    for s in delta.removed:
+        click.echo(f"- {s.session_id}  {s.name or 'Unnamed'}")
+    for change in delta.moved:
+        before, after = change.before, change.after
+        click.echo(
+            f"> {after.session_id}  "
+            f"window {before.window_id}, tab {before.tab_id} -> "
+            f"window {after.window_id}, tab {after.tab_id}"
+        )
+    for change in delta.renamed:
+        click.echo(
+            f"~ {change.after.session_id}  "
+            f"{change.before.name or 'Unnamed'} -> {change.after.name or 'Unnamed'}"
+        )
+    for change in delta.updated:
+        fields = [f for f in change.fields if f not in ("window_id", "tab_id", "name")]
+        click.echo(f"* {change.after.session_id}  {', '.join(fields)} changed")
+
+
+def watch_changes(timeout: float | None = None) -> None:
+    """Print each change to the session list as a JSON line until interrupted."""
+
+    async def watch() -> None:
+        """Stream the changes while recording focus changes alongside."""
+        snapshot = await async_get_snapshot(deadline_after(timeout))
+        if snapshot is None:
+            raise FocusError("Failed to get iTerm2 app instance.")
+        recorder = asyncio.create_task(record_focus_changes(snapshot.app))
+        try:
+            async for delta in watch_sessions(timeout=timeout, save_to=cache_path()):
+                click.echo(json.dumps(delta.to_dict()))
+        finally:
+            recorder.cancel()
+            # Focus history is best effort; its failure must not end the watch
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await recorder
+
+    try:
+        asyncio.run(watch())
+    except KeyboardInterrupt:
+        pass
+    except (FocusTimeoutError, ITerm2UnavailableError) as e:
+        _error_exit(str(e))
+    except Exception as e:
+        _error_exit(f"Failed to watch sessions: {e}")
+
+
+def check_exists(timeout: float | None = None, quiet: bool = False) -> None:
+    """Report which session IDs read from stdin still exist.
+
+    Prints one "<id>\t<exists|missing>" line per ID and exits with status 1
+    if any session is missing.
+    """
+    requested = [line.strip() for line in sys.stdin if line.strip()]
+    # Remove the prefix (e.g., "w0t5p1:") if present
+    session_ids = {s: s.split(":", 1)[1] if ":" in s else s for s in requested}
+
+    try:
+        exists = asyncio.run(sessions_exist(session_ids.values(), timeout=timeout))
+    except (FocusTimeoutError, ITerm2UnavailableError) as e:
+        _error_exit(str(e))
+    except Exception as e:
+        _error_exit(f"Failed to check sessions: {e}")
+
+    if not quiet:
+        for requested_id, session_id in session_ids.items():
+            status = "exists" if exists[session_id] else "missing"
+            click.echo(f"{requested_id}\t{status}")
+
+    if not all(exists.values()):
+        sys.exit(1)
+
+
+def run_commands(timeout: float | None = None) -> None:
+    """Execute commands from stdin, printing NDJSON results in order.
+
+    Exits with status 1 if any command failed.
+    """
+
+    async def run_all() -> bool:
+        """Stream results as each command finishes."""
+        all_ok = True
+        async for result in run_batch(sys.stdin, timeout):
+            click.echo(json.dumps(result))
+            all_ok = all_ok and result["ok"]
+        return all_ok
+
+    if not asyncio.run(run_all()):
+        sys.exit(1)
+
+
+def start_mcp_server(
+    transport: str,
+    *,
+    port: int | None = None,
+    max_concurrency: int | None = None,
+    client_concurrency: int | None = None,
+    request_timeout: float | None = None,
+    focus_window: float | None = None,
+) -> None:
+    """Start the MCP server.
+
+    Options left as None fall back to the server defaults.
+    """
+    if not MCP_AVAILABLE:
+        _error_exit(
+            "MCP dependencies are not installed.",
+            "",
+            "Install with: pip install 'iterm2-focus[mcp]'",
+        )
+
+    from .mcp.__main__ import main as mcp_main
+
+    server_options: _ServerOptions = {}
+    if port is not None:
+        server_options["port"] = port
+    if max_concurrency is not None:
+        server_options["max_concurrency"] = max_concurrency
+    if client_concurrency is not None:
+        server_options["client_concurrency"] = client_concurrency
+    if request_timeout is not None:
+        server_options["request_timeout"] = request_timeout
+    if focus_window is not None:
+        server_options["focus_window"] = focus_window
+
+    click.echo("Starting iterm2-focus MCP server...")
+    if transport != "stdio":
+        click.echo(f"Transport: {transport} on localhost")
+    click.echo("Server is running. Press Ctrl+C to stop.")
+
+    try:
+        mcp_main(transport, **server_options)
+    except KeyboardInterrupt:
+        click.echo("\nServer stopped.")
+    except Exception as e:
+        _error_exit(f"Failed to start MCP server: {e}")
@@ -0,0 +1,251 @@
+"""Connection layer for iTerm2, guarded by a circuit breaker."""
+
+import asyncio
+import contextlib
+import json
+import time
+from pathlib import Path
+from typing import Any, Literal
+
+from iterm2.app import App, async_get_app
+from iterm2.connection import Connection
+
+from .errors import ITerm2UnavailableError
+from .paths import atomic_write_text, cache_dir
+from .rpc import rpc
+
+BreakerState = Literal["closed", "open", "half-open"]
+
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_RESET_TIMEOUT = 10.0
+
+
+class CircuitBreaker:
+    """Remember recent connection failures and fail fast while iTerm2 is down.
+
+    After ``failure_threshold`` consecutive failures the breaker opens and
+    every call fails immediately with :class:`ITerm2UnavailableError`. Once
+    ``reset_timeout`` seconds have passed a single probe is let through: if
+    it connects the breaker closes, otherwise it stays open for another
+    ``reset_timeout``.
+
+    The state is persisted to a small file in the cache directory so that
+    separate CLI invocations share it. The file is only written when the
+    state changes, never on the healthy path.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        reset_timeout: float = DEFAULT_RESET_TIMEOUT,
+        state_path: Path | None = None,
+        persist: bool = True,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.persist = persist
+        self._state_path = state_path
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._loaded = False
+
+    @property
+    def state_path(self) -> Path:
+        """File the breaker state is persisted to."""
+        return self._state_path or cache_dir() / "circuit.json"
+
+    @property
+    def state(self) -> BreakerState:
+        """Current breaker state."""
+        self._load()
+        if self._failures < self.failure_threshold:
+            return "closed"
+        if time.time() - self._opened_at < self.reset_timeout:
+            return "open"
+        return "half-open"
+
+    def before_call(self) -> None:
+        """Let a connection attempt through or fail fast.
+
+        Raises:
+            ITerm2UnavailableError: If the breaker is open, or half-open with
+                a probe already in flight
+        """
+        state = self.state
+        if state == "closed":
+            return
+        if state == "half-open" and not self._probing:
+            self._probing = True
+            return
+        retry_in = max(0.0, self._opened_at + self.reset_timeout - time.time())
+        raise ITerm2UnavailableError(self._failures, retry_in)
+
+    def record_success(self) -> None:
+        """Close the breaker after a successful connection."""
+        self._load()
+        self._probing = False
+        if self._failures:
+            self._failures = 0
+            self._opened_at = 0.0
+            self._save()
+
+    def record_failure(self) -> None:
+        """Count a failed connection, opening the breaker at the threshold."""
+        self._load()
+        self._probing = False
+        self._failures += 1
+        if self._failures >= self.failure_threshold:
+            self._opened_at = time.time()
+        self._save()
+
+    def record_abandoned(self) -> None:
+        """Free the probe slot after an attempt cancelled from outside."""
+        self._probing = False
+
+    def reset(self) -> None:
+        """Forget all in-memory state; it is reloaded from disk on next use."""
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._loaded = False
+
+    def _load(self) -> None:
+        """Read the persisted state once."""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.persist:
+            return
+        try:
+            data = json.loads(self.state_path.read_text())
+            self._failures = int(data["failures"])
+            self._opened_at = float(data["opened_at"])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    def _save(self) -> None:
+        """Persist the state, ignoring an unwritable cache directory."""
+        if not self.persist:
+            return
+        # An unwritable cache directory only costs the shared state
+        with contextlib.suppress(OSError):
+            atomic_write_text(
+                self.state_path,
+                json.dumps({"failures": self._failures, "opened_at": self._opened_at}),
+            )
+
+
+# Process-wide breaker used by every connection the package makes
+circuit_breaker = CircuitBreaker()
+
+
+def connection_alive(connection: Any) -> bool:
+    """Return whether a connection to iTerm2 is still open.
+
+    iterm2 runs its disconnect callbacks only from Connection.run(), never
+    for connections made with Connection.async_create as async_connect
+    does, so state built on a connection must check it directly.
+    """
+    websocket = getattr(connection, "websocket", None)
+    return websocket is not None and bool(websocket.open)
+
+
+class ConnectionBound:
+    """State that is only valid while the connection it was built on is open.
+
+    Subclasses set _connection when they start and override _disconnected
+    to drop what they built on it. running checks the connection on every
+    call, so a restart of iTerm2 is noticed the next time the state is used.
+    """
+
+    _connection: Any | None = None
+
+    @property
+    def running(self) -> bool:
+        """Whether the state is live: started, and its connection still open."""
+        if self._connection is not None and not connection_alive(self._connection):
+            self._disconnected()
+        return self._connection is not None
+
+    def _disconnected(self) -> None:
+        self._connection = None
+
+
+async def _close(connection: Any) -> None:
+    """Close a connection made with Connection.async_create.
+
+    Its dispatch task is cancelled first, so that iterm2 does not report the
+    closed websocket as an error. A connection whose event loop has already
+    closed cannot be closed any further and is left alone.
+    """
+    # Connection keeps the task in a private, name-mangled attribute
+    dispatch = getattr(connection, "_Connection__dispatch_forever_future", None)
+    with contextlib.suppress(Exception):
+        if dispatch is not None:
+            dispatch.cancel()
+        if connection.websocket is not None:
+            await connection.websocket.close()
+
+
+async def _discard(connection: Any | None) -> None:
+    """Close a new connection that the cached App did not end up using."""
+    if connection is not None and (
+        App.instance is None or App.instance.connection is not connection
+    ):
+        await _close(connection)
+
+
+async def async_connect(deadline: float | None = None) -> Any | None:
+    """Connect to iTerm2 and return its app object.
+
+    The connection of iterm2's cached App is reused while it is open, so a
+    long-running process keeps a single connection. Once it has closed, for
+    example because iTerm2 restarted, it is replaced by a new one.
+
+    Failures, including connection attempts that time out on their own,
+    are recorded by the circuit breaker; while it is open this raises
+    immediately without connecting. Running out of the caller's
+    ``deadline`` is not counted, since a short deadline says nothing about
+    whether iTerm2 is up.
+
+    Args:
+        deadline: Absolute event loop time to give up at, or None
+
+    Returns:
+        The iTerm2 ``App``, or None if iTerm2 did not provide one
+
+    Raises:
+        ITerm2UnavailableError: If the circuit breaker is open
+        TimeoutError: If the deadline passes while connecting
+    """
+    circuit_breaker.before_call()
+    cached = App.instance
+    connection = None
+    timeout = asyncio.timeout_at(deadline)
+    try:
+        async with timeout:
+            if cached is not None and connection_alive(cached.connection):
+                app = await rpc(async_get_app(cached.connection))
+            else:
+                connection = await rpc(Connection.async_create())
+                if cached is not None:
+                    # async_get_app would refresh the cached App over its
+                    # dead connection instead of using the new one.
+                    App.instance = None
+                    await _close(cached.connection)
+                app = await rpc(async_get_app(connection))
+    except Exception as e:
+        await _discard(connection)
+        if isinstance(e, TimeoutError) and timeout.expired():
+            circuit_breaker.record_abandoned()
+        else:
+            circuit_breaker.record_failure()
+        raise
+    except BaseException:
+        # Cancelled from outside: not iTerm2's fault, free the probe slot.
+        await _discard(connection)
+        circuit_breaker.record_abandoned()
+        raise
+    circuit_breaker.record_success()
+    return app
@@ -0,0 +1,109 @@
+"""Differences between two session listings."""
+
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from .session import Session
+
+# Fields compared between listings; is_active follows focus, not the layout.
+COMPARED_FIELDS = tuple(f for f in Session.__slots__ if f != "is_active")
+
+
+@dataclass(frozen=True, slots=True)
+class SessionChange:
+    """A session present in both listings whose fields differ."""
+
+    before: Session
+    after: Session
+    fields: tuple[str, ...]
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the change as a plain dictionary."""
+        return {
+            "session_id": self.after.session_id,
+            "fields": list(self.fields),
+            "before": {f: getattr(self.before, f) for f in self.fields},
+            "after": {f: getattr(self.after, f) for f in self.fields},
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class SessionDiff:
+    """What changed between two session listings.
+
+    A session that moved and was renamed at the same time appears in both
+    moved and renamed. Changes to other fields, such as path, are in updated.
+    """
+
+    added: tuple[Session, ...] = ()
+    removed: tuple[Session, ...] = ()
+    moved: tuple[SessionChange, ...] = ()
+    renamed: tuple[SessionChange, ...] = ()
+    updated: tuple[SessionChange, ...] = ()
+
+    def __bool__(self) -> bool:
+        return bool(
+            self.added or self.removed or self.moved or self.renamed or self.updated
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the diff as a plain dictionary."""
+        return {
+            "added": [session.to_dict() for session in self.added],
+            "removed": [session.to_dict() for session in self.removed],
+            "moved": [change.to_dict() for change in self.moved],
+            "renamed": [change.to_dict() for change in self.renamed],
+            "updated": [change.to_dict() for change in self.updated],
+        }
+
+
+def diff_sessions(before: Iterable[Session], after: Iterable[Session]) -> SessionDiff:
+    """Compare two listings by session ID.
+
+    Runs in linear time; fields are only compared for sessions whose records
+    are not equal.
+
+    Args:
+        before: The earlier listing
+        after: The later listing
+
+    Returns:
+        The added, removed, moved, renamed and otherwise updated sessions,
+        each in the order of the listing they come from
+    """
+    old = {session.session_id: session for session in before}
+    new = {session.session_id: session for session in after}
+
+    added = tuple(session for sid, session in new.items() if sid not in old)
+    removed = tuple(session for sid, session in old.items() if sid not in new)
+    moved: list[SessionChange] = []
+    renamed: list[SessionChange] = []
+    updated: list[SessionChange] = []
+
+    for sid, current in new.items():
+        previous = old.get(sid)
+        if previous is None or previous == current:
+            continue
+
+        fields = tuple(
+            f for f in COMPARED_FIELDS if getattr(previous, f) != getattr(current, f)
+        )
+        if not fields:
+            continue
+
+        change = SessionChange(previous, current, fields)
+        if "window_id" in fields or "tab_id" in fields:
+            moved.append(change)
+        if "name" in fields:
+            renamed.append(change)
+        if set(fields) - {"window_id", "tab_id", "name"}:
+            updated.append(change)
+
+    return SessionDiff(
+        added=added,
+        removed=removed,
+        moved=tuple(moved),
+        renamed=tuple(renamed),
+        updated=tuple(updated),
+    )
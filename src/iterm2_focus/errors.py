@@ -0,0 +1,32 @@
+"""Exceptions raised by iterm2-focus."""
+
+
+class FocusError(Exception):
+    """Error raised when focusing fails."""
+
+    pass
+
+
+class FocusTimeoutError(FocusError):
+    """Error raised when an operation does not finish before its deadline."""
+
+    def __init__(self, timeout: float | None) -> None:
+        super().__init__(f"Timed out after {timeout} seconds waiting for iTerm2.")
+        self.timeout = timeout
+
+
+class ITerm2UnavailableError(FocusError):
+    """Error raised without connecting while iTerm2 is known to be unreachable.
+
+    The circuit breaker raises this after repeated connection failures, until
+    its next probe succeeds.
+    """
+
+    def __init__(self, failures: int, retry_in: float) -> None:
+        super().__init__(
+            f"iTerm2 API unavailable after {failures} failed connection attempts; "
+            f"retrying in {retry_in:.1f} seconds. "
+            "Make sure iTerm2 is running and Python API is enabled."
+        )
+        self.failures = failures
+        self.retry_in = retry_in
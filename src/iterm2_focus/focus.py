@@ -3,49 +3,71 @@
 import asyncio
 from typing import Any
 
-from iterm2.app import async_get_app
-from iterm2.connection import Connection
-
-
-class FocusError(Exception):
-    """Error raised when focusing fails."""
-
-    pass
-
-
-async def async_focus_session(session_id: str) -> bool:
+from .errors import FocusError, FocusTimeoutError, ITerm2UnavailableError
+from .history import async_record_focus
+from .rpc import deadline_after, rpc
+from .topology import TopologySnapshot, async_get_snapshot, async_wait_for_session
+
+__all__ = [
+    "FocusError",
+    "FocusTimeoutError",
+    "ITerm2UnavailableError",
+    "async_focus_session",
+    "focus_session",
+]
+
+
+async def async_focus_session(
+    session_id: str,
+    timeout: float | None = None,
+    snapshot: TopologySnapshot | None = None,
+    wait: bool = False,
+    record: bool = True,
+) -> bool:
     """Focus the iTerm2 session with the given ID (async version).
 
     Args:
         session_id: The iTerm2 session ID (e.g., "w0t0p0:UUID")
+        timeout: Seconds to wait before giving up, or None to wait forever
+        snapshot: Topology to look the session up in, or None to fetch one
+        wait: If the session does not exist yet, wait for it to appear
+            (see async_wait_for_session) instead of returning False
+        record: Add the focus to the focus history and frecency database
+            (see history.record_focus)
 
     Returns:
         True if successful, False if session not found
 
     Raises:
+        FocusTimeoutError: If the deadline passes; outstanding RPCs are
+            cancelled
+        ITerm2UnavailableError: If recent connection attempts failed and the
+            circuit breaker is open
         FocusError: If there's an error connecting to iTerm2
     """
-    connection: Any | None = None
+    deadline = deadline_after(timeout)
 
     try:
-        connection = await Connection.async_create()
-        app = await async_get_app(connection)
-        if app is None:
+        if snapshot is None:
+            snapshot = await async_get_snapshot(deadline)
+        if snapshot is None:
             raise FocusError("Failed to get iTerm2 app instance.")
 
-        # Search through all windows, tabs, and sessions
-        for window in app.terminal_windows:
-            for tab in window.tabs:
-                for session in tab.sessions:
-                    if session.session_id == session_id:
-                        # Focus the session
-                        await session.async_activate()
-                        await tab.async_select()
-                        await window.async_activate()
-                        return True
-
-        return False
-
+        entry = snapshot.find(session_id)
+        if entry is None and wait:
+            snapshot = await async_wait_for_session(session_id, deadline, snapshot)
+            entry = snapshot.find(session_id) if snapshot is not None else None
+        if entry is None:
+            return False
+
+        async with asyncio.timeout_at(deadline):
+            await _activate(*entry, record=record)
+            return True
+
+    except FocusError:
+        raise
+    except TimeoutError as e:
+        raise FocusTimeoutError(timeout) from e
     except ConnectionError as e:
         raise FocusError(
             f"Failed to connect to iTerm2: {e}. "
@@ -58,17 +80,41 @@ async def async_focus_session(session_id: str) -> bool:
         pass
 
 
-def focus_session(session_id: str) -> bool:
+async def _activate(window: Any, tab: Any, session: Any, record: bool = True) -> None:
+    """Bring a session, its tab and its window to the front.
+
+    Every focus goes through here, so unless record is False it is also
+    added to the focus history and frecency database, off the event loop.
+    """
+    await rpc(session.async_activate())
+    await rpc(tab.async_select())
+    await rpc(window.async_activate())
+    if record:
+        await async_record_focus(session.session_id)
+
+
+def focus_session(
+    session_id: str,
+    timeout: float | None = None,
+    wait: bool = False,
+    record: bool = True,
+) -> bool:
     """Focus the iTerm2 session with the given ID.
 
     Args:
         session_id: The iTerm2 session ID (e.g., "w0t0p0:UUID")
+        timeout: Seconds to wait before giving up, or None to wait forever
+        wait: If the session does not exist yet, wait for it to appear
+        record: Add the focus to the focus history and frecency database
 
     Returns:
         True if successful, False if session not found
 
     Raises:
+        FocusTimeoutError: If the deadline passes
         FocusError: If there's an error executing the operation
     """
     # iTerm2 Python APIはasyncioベースなので、同期的に実行
-    return asyncio.run(async_focus_session(session_id))
+    return asyncio.run(
+        async_focus_session(session_id, timeout=timeout, wait=wait, record=record)
+    )
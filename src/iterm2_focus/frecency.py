@@ -0,0 +1,210 @@
+"""Frecency ranking of sessions by how often and how recently they are used."""
+
+import contextlib
+import json
+import math
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Any
+
+from .paths import atomic_write_text, cache_dir
+from .store import load_cached_listing
+
+# Bump when the file layout changes incompatibly; older files are ignored.
+FORMAT = 1
+
+# Name of the frecency database inside the cache directory
+FRECENCY_FILE = "frecency.json"
+
+# Seconds after which a visit counts half as much
+HALF_LIFE = 3 * 24 * 3600.0
+
+# Number of sessions remembered; the lowest ranked are dropped beyond this
+MAX_ENTRIES = 500
+
+
+@dataclass(frozen=True, slots=True)
+class Visits:
+    """How often and how recently one session was focused.
+
+    score is the visit count with each visit decayed by its age, as of
+    last_visit; name and path are as last seen, for matching queries.
+    """
+
+    session_id: str
+    visits: int
+    score: float
+    last_visit: float
+    name: str | None = None
+    path: str | None = None
+
+    def frecency(self, now: float) -> float:
+        """Return the decayed score as of now."""
+        age = max(0.0, now - self.last_visit)
+        return self.score * math.pow(0.5, age / HALF_LIFE)
+
+    def search_text(self) -> str:
+        """Return the lower-case ID, name and path that queries match."""
+        return f"{self.session_id}\0{self.name or ''}\0{self.path or ''}".lower()
+
+
+class FrecencyStore:
+    """Visit records keyed by session ID."""
+
+    def __init__(self, entries: Iterable[Visits] = ()) -> None:
+        """Initialize the store with existing records."""
+        self._entries: dict[str, Visits] = {}
+        # Session ID -> search text, kept so ranking does no string building
+        self._texts: dict[str, str] = {}
+        for entry in entries:
+            self._put(entry)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, session_id: str) -> Visits | None:
+        """Return the record of a session, or None if never visited."""
+        return self._entries.get(session_id)
+
+    def visit(
+        self,
+        session_id: str,
+        name: str | None = None,
+        path: str | None = None,
+        now: float | None = None,
+    ) -> Visits:
+        """Record a visit, keeping the previous name and path if not given.
+
+        Returns:
+            The updated record
+        """
+        now = time.time() if now is None else now
+        entry = self._entries.get(session_id)
+        if entry is None:
+            entry = Visits(session_id, 1, 1.0, now, name, path)
+        else:
+            entry = replace(
+                entry,
+                visits=entry.visits + 1,
+                score=entry.frecency(now) + 1.0,
+                last_visit=now,
+                name=name if name is not None else entry.name,
+                path=path if path is not None else entry.path,
+            )
+        self._put(entry)
+
+        if len(self._entries) > MAX_ENTRIES:
+            lowest = min(self._entries.values(), key=lambda e: e.frecency(now))
+            self.forget(lowest.session_id)
+        return entry
+
+    def forget(self, session_id: str) -> None:
+        """Drop the record of a session, if any."""
+        self._entries.pop(session_id, None)
+        self._texts.pop(session_id, None)
+
+    def _put(self, entry: Visits) -> None:
+        self._entries[entry.session_id] = entry
+        self._texts[entry.session_id] = entry.search_text()
+
+    def rank(self, query: str = "", now: float | None = None) -> list[Visits]:
+        """Return the sessions matching a query, highest frecency first.
+
+        Args:
+            query: Whitespace-separated words, each of which must occur
+                (case-insensitively) in the session's ID, name or path
+            now: Time to rank at, or None for the current time
+
+        Returns:
+            The matching records
+        """
+        now = time.time() if now is None else now
+        words = query.lower().split()
+        # Narrow the candidates one word at a time; plain comprehensions keep
+        # this well under a millisecond for a full store.
+        candidates = list(self._texts.items())
+        for word in words:
+            candidates = [(sid, text) for sid, text in candidates if word in text]
+        matches = [self._entries[session_id] for session_id, _ in candidates]
+        matches.sort(key=lambda e: e.frecency(now), reverse=True)
+        return matches
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the store as a plain dictionary."""
+        return {
+            "format": FORMAT,
+            "fields": list(Visits.__slots__),
+            "entries": [
+                [getattr(entry, f) for f in Visits.__slots__]
+                for entry in self._entries.values()
+            ],
+        }
+
+
+def frecency_path() -> Path:
+    """Return the file holding the frecency database."""
+    return cache_dir() / FRECENCY_FILE
+
+
+def load_frecency(path: Path | None = None) -> FrecencyStore:
+    """Read the frecency database.
+
+    Args:
+        path: File to read, or None for frecency_path()
+
+    Returns:
+        The store; empty if the file is missing, unreadable or was written in
+        another format
+    """
+    try:
+        data = json.loads((path or frecency_path()).read_text())
+        if data.get("format") == FORMAT:
+            fields = data["fields"]
+            return FrecencyStore(
+                Visits(**dict(zip(fields, row, strict=True))) for row in data["entries"]
+            )
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        pass
+    return FrecencyStore()
+
+
+def save_frecency(store: FrecencyStore, path: Path | None = None) -> None:
+    """Atomically write the frecency database.
+
+    Args:
+        store: The store to write
+        path: File to write, or None for frecency_path()
+
+    Raises:
+        OSError: If the file cannot be written
+    """
+    atomic_write_text(
+        path or frecency_path(), json.dumps(store.to_dict(), separators=(",", ":"))
+    )
+
+
+def record_visit(session_id: str, path: Path | None = None) -> None:
+    """Count a focus of a session, ignoring write errors.
+
+    The name and path are taken from the cached listing, if it has them, so
+    recording never contacts iTerm2.
+
+    Args:
+        session_id: The focused session
+        path: Database file, or None for frecency_path()
+    """
+    name = cwd = None
+    listing = load_cached_listing()
+    if listing is not None:
+        for session in listing.sessions:
+            if session.session_id == session_id:
+                name, cwd = session.name, session.path
+                break
+
+    store = load_frecency(path)
+    store.visit(session_id, name, cwd)
+    # Ranking is a convenience; failing to save must not fail the focus
+    with contextlib.suppress(OSError):
+        save_frecency(store, path)
@@ -0,0 +1,211 @@
+"""Focus history for moving back and forth between sessions."""
+
+import asyncio
+import contextlib
+import json
+import os
+import threading
+from collections import deque
+from collections.abc import Callable, Iterable
+from pathlib import Path
+from typing import Any
+
+from .frecency import record_visit
+from .paths import atomic_write_text, cache_dir
+
+# Bump when the file layout changes incompatibly; older files are ignored.
+FORMAT = 1
+
+# Name of the history file inside the cache directory
+HISTORY_FILE = "history.json"
+
+# Number of visits remembered; older ones fall off the ring
+HISTORY_SIZE = 100
+
+# Serializes updates of the history and frecency files between threads
+_record_lock = threading.Lock()
+
+# Whether this process has recorded the session it runs in
+_origin_recorded = False
+
+
+class FocusHistory:
+    """A bounded, browser-style history of focused sessions.
+
+    Visits are kept oldest first in a ring buffer with a cursor on the
+    current one. back() and forward() move the cursor; recording a visit
+    while not at the newest entry drops the entries after the cursor, as a
+    browser does.
+    """
+
+    def __init__(
+        self,
+        entries: Iterable[str] = (),
+        position: int | None = None,
+        size: int = HISTORY_SIZE,
+    ) -> None:
+        """Initialize the history.
+
+        Args:
+            entries: Session IDs, oldest first
+            position: Index of the current entry, or None for the newest
+            size: Number of entries kept
+        """
+        self._entries: deque[str] = deque(entries, maxlen=size)
+        newest = len(self._entries) - 1
+        self.position = newest if position is None else max(0, min(position, newest))
+
+    @property
+    def entries(self) -> tuple[str, ...]:
+        """Session IDs, oldest first."""
+        return tuple(self._entries)
+
+    @property
+    def current(self) -> str | None:
+        """The session at the cursor, or None if the history is empty."""
+        return self._entries[self.position] if self._entries else None
+
+    def record(self, session_id: str) -> None:
+        """Record a visit to a session and move the cursor to it.
+
+        Visiting the current session again does nothing.
+        """
+        if session_id == self.current:
+            return
+        while len(self._entries) > self.position + 1:
+            self._entries.pop()
+        self._entries.append(session_id)
+        self.position = len(self._entries) - 1
+
+    def back(self) -> str | None:
+        """Move to the previous entry and return it, or None at the start."""
+        if self.position <= 0:
+            return None
+        self.position -= 1
+        return self.current
+
+    def forward(self) -> str | None:
+        """Move to the next entry and return it, or None at the end."""
+        if self.position >= len(self._entries) - 1:
+            return None
+        self.position += 1
+        return self.current
+
+    def mru(self, n: int) -> str | None:
+        """Return the n-th most recently used session other than the current.
+
+        mru(1) is the session used before the current one. Repeated visits
+        count once, at their latest position.
+
+        Returns:
+            The session ID, or None if fewer sessions have been used
+        """
+        seen = {self.current}
+        for session_id in reversed(self._entries):
+            if session_id in seen:
+                continue
+            seen.add(session_id)
+            n -= 1
+            if n == 0:
+                return session_id
+        return None
+
+    def forget(self, gone: Callable[[str], bool]) -> None:
+        """Remove every entry for which gone(session_id) is true.
+
+        The cursor stays on the same visit, or on the closest earlier one
+        that remains. Consecutive duplicates left behind are merged.
+        """
+        kept: list[str] = []
+        position = 0
+        for index, session_id in enumerate(self._entries):
+            if not gone(session_id) and (not kept or kept[-1] != session_id):
+                kept.append(session_id)
+            if index == self.position:
+                position = max(0, len(kept) - 1)
+        self._entries = deque(kept, maxlen=self._entries.maxlen)
+        self.position = position
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the history as a plain dictionary."""
+        return {
+            "format": FORMAT,
+            "position": self.position,
+            "entries": list(self._entries),
+        }
+
+
+def history_path() -> Path:
+    """Return the file holding the focus history."""
+    return cache_dir() / HISTORY_FILE
+
+
+def load_history(path: Path | None = None) -> FocusHistory:
+    """Read the focus history.
+
+    Args:
+        path: File to read, or None for history_path()
+
+    Returns:
+        The history; empty if the file is missing, unreadable or was written
+        in another format
+    """
+    try:
+        data = json.loads((path or history_path()).read_text())
+        if data.get("format") == FORMAT:
+            return FocusHistory(
+                [str(session_id) for session_id in data["entries"]],
+                int(data["position"]),
+            )
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        pass
+    return FocusHistory()
+
+
+def save_history(history: FocusHistory, path: Path | None = None) -> None:
+    """Atomically write the focus history.
+
+    Args:
+        history: The history to write
+        path: File to write, or None for history_path()
+
+    Raises:
+        OSError: If the file cannot be written
+    """
+    atomic_write_text(
+        path or history_path(), json.dumps(history.to_dict(), separators=(",", ":"))
+    )
+
+
+def record_focus(session_id: str, path: Path | None = None) -> None:
+    """Record a focus change made by this process, ignoring write errors.
+
+    On the first focus the session this process runs in ($ITERM_SESSION_ID)
+    is recorded before the target, so back() returns to it; a process that
+    focuses many times, such as the MCP server or --batch, records it only
+    once. The focus is also counted in the frecency database.
+
+    This reads and writes files; from async code use async_record_focus.
+
+    Args:
+        session_id: The focused session
+        path: History file, or None for history_path()
+    """
+    global _origin_recorded
+    with _record_lock:
+        history = load_history(path)
+        origin = os.environ.get("ITERM_SESSION_ID")
+        if origin and not _origin_recorded:
+            # Remove the prefix (e.g., "w0t5p1:") if present
+            history.record(origin.split(":", 1)[-1])
+        _origin_recorded = True
+        history.record(session_id)
+        # History is a convenience; failing to save it must not fail the focus
+        with contextlib.suppress(OSError):
+            save_history(history, path)
+        record_visit(session_id)
+
+
+async def async_record_focus(session_id: str, path: Path | None = None) -> None:
+    """Record a focus change in a worker thread; see record_focus."""
+    await asyncio.to_thread(record_focus, session_id, path)
@@ -0,0 +1,181 @@
+"""Find sessions by the command they are running."""
+
+import asyncio
+import fnmatch
+import itertools
+from collections.abc import Iterable, Mapping
+from typing import Any
+
+from .errors import FocusTimeoutError
+from .monitor import MonitoredIndex
+from .rpc import deadline_after, gather_until, rpc
+from .topology import TopologySnapshot, async_get_snapshot
+
+# Session variables the index is built from: the foreground job's process
+# name and its full command line.
+JOB_VARIABLES = ("jobName", "commandLine")
+
+_GLOB_CHARACTERS = frozenset("*?[")
+
+
+class JobIndex:
+    """Session IDs keyed by foreground job name, with their command lines.
+
+    A query equal to a job name (e.g., "pytest") is a dictionary hit.
+    Otherwise it is matched against the command lines held in the index: as
+    a glob if it contains *, ? or [, else as a substring, so "pytest" also
+    finds "python -m pytest". Matching is case-insensitive, and the session
+    whose job changed most recently wins.
+    """
+
+    def __init__(self, sessions: Iterable[tuple[str, Mapping[str, Any]]] = ()) -> None:
+        """Initialize the index.
+
+        Args:
+            sessions: (session_id, variables) pairs, with variables named as
+                in JOB_VARIABLES
+        """
+        # Job name -> session ID -> stamp, for preferring recent changes
+        self.by_name: dict[str, dict[str, int]] = {}
+        # Session ID -> (job name, command line, stamp)
+        self._jobs: dict[str, tuple[str, str, int]] = {}
+        self._stamps = itertools.count()
+        for session_id, values in sessions:
+            self.update(session_id, values)
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def update(self, session_id: str, values: Mapping[str, Any]) -> None:
+        """Set a session's job, replacing the previous one.
+
+        The session keeps its stamp while its job stays the same, so
+        unrelated variable updates do not make it look recently started.
+        """
+        name = str(values.get("jobName") or "").lower()
+        command = str(values.get("commandLine") or "").lower()
+        previous = self._jobs.get(session_id)
+        if previous is not None and previous[:2] == (name, command):
+            return
+        self.remove(session_id)
+        if not name and not command:
+            return
+        stamp = next(self._stamps)
+        self._jobs[session_id] = (name, command, stamp)
+        if name:
+            self.by_name.setdefault(name, {})[session_id] = stamp
+
+    def remove(self, session_id: str) -> None:
+        """Remove a session, if present."""
+        previous = self._jobs.pop(session_id, None)
+        if previous is None or not previous[0]:
+            return
+        sessions = self.by_name[previous[0]]
+        del sessions[session_id]
+        if not sessions:
+            del self.by_name[previous[0]]
+
+    def find(self, query: str) -> str | None:
+        """Return the session running a job, or None.
+
+        Args:
+            query: Job name, or a substring or glob of the command line
+
+        Returns:
+            The ID of the matching session whose job changed most recently
+        """
+        query = query.strip().lower()
+        if not query:
+            return None
+
+        named = self.by_name.get(query)
+        if named:
+            return max(named, key=named.__getitem__)
+
+        if _GLOB_CHARACTERS.intersection(query):
+            matches = (
+                (stamp, session_id)
+                for session_id, (_, command, stamp) in self._jobs.items()
+                if fnmatch.fnmatchcase(command, query)
+            )
+        else:
+            matches = (
+                (stamp, session_id)
+                for session_id, (_, command, stamp) in self._jobs.items()
+                if query in command
+            )
+        best = max(matches, default=None)
+        return best[1] if best is not None else None
+
+
+class JobMonitor(MonitoredIndex[JobIndex]):
+    """A JobIndex kept current by monitoring each session's job variables."""
+
+    def __init__(self) -> None:
+        """Initialize a stopped index."""
+        index = JobIndex()
+        super().__init__(index, JOB_VARIABLES, index.update, index.remove)
+
+
+job_monitor = JobMonitor()
+
+
+async def _job_index(snapshot: TopologySnapshot, deadline: float | None) -> JobIndex:
+    """Return the running index, or build one by fetching every session."""
+    index = await job_monitor.async_current(snapshot, deadline)
+    if index is not None:
+        return index
+
+    sessions = list(snapshot.sessions.items())
+    values = await gather_until(
+        (_job_variables(session) for _, (_, _, session) in sessions), deadline
+    )
+    return JobIndex(
+        (session_id, variables)
+        for (session_id, _), variables in zip(sessions, values, strict=True)
+        if variables is not None
+    )
+
+
+async def _job_variables(session: Any) -> dict[str, Any]:
+    """Fetch the variables a JobIndex is built from."""
+    values = await asyncio.gather(
+        *(rpc(session.async_get_variable(name)) for name in JOB_VARIABLES)
+    )
+    return dict(zip(JOB_VARIABLES, values, strict=True))
+
+
+async def find_session_by_job(
+    query: str,
+    timeout: float | None = None,
+    snapshot: TopologySnapshot | None = None,
+) -> str | None:
+    """Find the session whose foreground job matches a query.
+
+    While job_monitor is running and monitoring every session, its index
+    answers the lookup. Otherwise the job variables of every session are
+    fetched once, concurrently.
+
+    Args:
+        query: Job name (e.g., "pytest"), or a substring or glob of the
+            command line (e.g., "make *test*")
+        timeout: Seconds to wait before giving up, or None to wait forever
+        snapshot: Topology to search, or None to fetch one
+
+    Returns:
+        The session ID, or None if no session runs a matching job
+
+    Raises:
+        FocusTimeoutError: If the deadline passes before iTerm2 answers
+    """
+    deadline = deadline_after(timeout)
+    try:
+        if snapshot is None:
+            snapshot = await async_get_snapshot(deadline)
+        if snapshot is None:
+            return None
+        index = await _job_index(snapshot, deadline)
+    except TimeoutError as e:
+        raise FocusTimeoutError(timeout) from e
+
+    return index.find(query)
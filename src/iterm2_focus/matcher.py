@@ -0,0 +1,110 @@
+"""Regex matching of session output off the event loop."""
+
+import asyncio
+import multiprocessing
+import os
+import re
+from collections.abc import Sequence
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Below this many characters, matching runs inline; handing text to a
+# worker would cost more than the match
+OFFLOAD_CHARS = 256 * 1024
+
+# Characters per chunk handed to a worker; chunks are matched in parallel
+CHUNK_CHARS = 1024 * 1024
+
+# (line index, match start, match end)
+LineMatch = tuple[int, int, int]
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def _match_text(pattern: re.Pattern[str], text: str, base: int) -> list[LineMatch]:
+    """Match pattern against each line of newline-joined text.
+
+    Runs in worker processes, so it takes one string per chunk: a single
+    buffer pickles far faster than a list of lines.
+    """
+    matches = []
+    for index, line in enumerate(text.split("\n"), base):
+        found = pattern.search(line)
+        if found is not None:
+            matches.append((index, found.start(), found.end()))
+    return matches
+
+
+def _get_pool() -> Executor:
+    """Return the process pool, starting it on first use."""
+    global _pool
+    if _pool is None:
+        # Spawned workers do not inherit the event loop or its threads
+        _pool = ProcessPoolExecutor(
+            max_workers=os.cpu_count(),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def _discard_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _chunks(lines: Sequence[str]) -> list[tuple[int, str]]:
+    """Split lines into (index of first line, joined text) chunks."""
+    chunks: list[tuple[int, str]] = []
+    start = size = 0
+    for index, line in enumerate(lines):
+        size += len(line) + 1
+        if size >= CHUNK_CHARS:
+            chunks.append((start, "\n".join(lines[start : index + 1])))
+            start, size = index + 1, 0
+    if start < len(lines):
+        chunks.append((start, "\n".join(lines[start:])))
+    return chunks
+
+
+async def match_lines(
+    pattern: re.Pattern[str], lines: Sequence[str]
+) -> list[LineMatch]:
+    """Find the lines matching a pattern without blocking the event loop.
+
+    Small inputs are matched inline. Larger ones are split into chunks of
+    about CHUNK_CHARS and matched in parallel in a process pool, so long
+    searches use every core while other requests are served. If worker
+    processes cannot be used, the chunks are matched in a thread instead.
+    Lines must not contain newlines.
+
+    Args:
+        pattern: Compiled regular expression
+        lines: Lines to match, each searched on its own
+
+    Returns:
+        (line index, match start, match end) of each matching line, in
+        line order
+    """
+    if sum(len(line) for line in lines) < OFFLOAD_CHARS:
+        return _match_text(pattern, "\n".join(lines), 0) if lines else []
+
+    loop = asyncio.get_running_loop()
+    chunks = _chunks(lines)
+    try:
+        pool = _get_pool()
+        results = await asyncio.gather(
+            *(
+                loop.run_in_executor(pool, _match_text, pattern, text, base)
+                for base, text in chunks
+            )
+        )
+    except (BrokenProcessPool, OSError, NotImplementedError):
+        # No usable worker processes (e.g., a sandbox without semaphores)
+        _discard_pool()
+        results = [
+            await asyncio.to_thread(_match_text, pattern, text, base)
+            for base, text in chunks
+        ]
+    return [match for chunk in results for match in chunk]
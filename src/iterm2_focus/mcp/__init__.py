@@ -7,9 +7,11 @@ mcp: Any | None = None
 focus_session: Any | None = None
 get_current_session: Any | None = None
 list_sessions: Any | None = None
+coalescing_stats: Any | None = None
 MCP_AVAILABLE = False
 
 try:
+    from .resources import coalescing_stats
     from .server import mcp
     from .tools import focus_session, get_current_session, list_sessions
 
@@ -24,4 +26,5 @@ __all__ = [
     "focus_session",
     "get_current_session",
     "list_sessions",
+    "coalescing_stats",
 ]
@@ -1,21 +1,84 @@
 """Entry point for running the MCP server."""
 
+import argparse
 import sys
 
+from ..scheduler import DEFAULT_FOCUS_WINDOW
+
 try:
+    from .resources import coalescing_stats  # noqa: F401
     from .server import mcp
     from .tools import focus_session, get_current_session, list_sessions  # noqa: F401
+    from .tools.iterm_tools import focus_scheduler
+    from .transport import (
+        DEFAULT_CLIENT_CONCURRENCY,
+        DEFAULT_HOST,
+        DEFAULT_MAX_CONCURRENCY,
+        DEFAULT_PORT,
+        DEFAULT_REQUEST_TIMEOUT,
+        TRANSPORTS,
+        run_http,
+    )
 except ImportError as e:
     print(f"Error: Failed to import MCP dependencies: {e}", file=sys.stderr)
     print("Please install with: pip install 'iterm2-focus[mcp]'", file=sys.stderr)
     sys.exit(1)
 
 
-def main() -> None:
-    """Run the MCP server."""
-    # Run with STDIO transport (default for Claude Desktop and other MCP clients)
-    mcp.run()
+def main(
+    transport: str = "stdio",
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    client_concurrency: int = DEFAULT_CLIENT_CONCURRENCY,
+    request_timeout: float | None = DEFAULT_REQUEST_TIMEOUT,
+    focus_window: float = DEFAULT_FOCUS_WINDOW,
+) -> None:
+    """Run the MCP server.
+
+    Args:
+        transport: "stdio" (default), "streamable-http" or "sse"
+        host: Loopback address for the HTTP transports
+        port: TCP port for the HTTP transports
+        max_concurrency: Maximum concurrent requests (HTTP transports only)
+        client_concurrency: Maximum concurrent requests per client
+            (HTTP transports only)
+        request_timeout: Per-request timeout in seconds (HTTP transports only)
+        focus_window: Seconds during which focus requests are collapsed
+    """
+    focus_scheduler.window = focus_window
+
+    if transport == "stdio":
+        # STDIO transport (default for Claude Desktop and other MCP clients)
+        mcp.run()
+        return
+
+    run_http(
+        transport,
+        host=host,
+        port=port,
+        max_concurrency=max_concurrency,
+        client_concurrency=client_concurrency,
+        request_timeout=request_timeout,
+    )
+
+
+def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """Parse command line arguments for ``python -m iterm2_focus.mcp``."""
+    parser = argparse.ArgumentParser(prog="python -m iterm2_focus.mcp")
+    parser.add_argument("--transport", choices=TRANSPORTS, default="stdio")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY)
+    parser.add_argument(
+        "--client-concurrency", type=int, default=DEFAULT_CLIENT_CONCURRENCY
+    )
+    parser.add_argument(
+        "--request-timeout", type=float, default=DEFAULT_REQUEST_TIMEOUT
+    )
+    parser.add_argument("--focus-window", type=float, default=DEFAULT_FOCUS_WINDOW)
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
-    main()
+    main(**vars(_parse_args()))
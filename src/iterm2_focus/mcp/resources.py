@@ -0,0 +1,16 @@
+"""MCP resources for iterm2-focus."""
+
+import json
+
+from ..coalesce import get_coalescing_stats
+from .server import mcp
+
+
+@mcp.resource("iterm2-focus://stats/coalescing", mime_type="application/json")
+def coalescing_stats() -> str:
+    """Executed versus coalesced call counts per operation.
+
+    Use this to tune clients: a high coalesced count means concurrent
+    identical requests are being served by a single iTerm2 fetch.
+    """
+    return json.dumps(get_coalescing_stats())
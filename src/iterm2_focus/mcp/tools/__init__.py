@@ -1,5 +1,25 @@
 """MCP tools for iTerm2 focus functionality."""
 
-from .iterm_tools import focus_session, get_current_session, list_sessions
+from .iterm_tools import (
+    focus_session,
+    focus_session_by_directory,
+    focus_session_by_job,
+    focus_session_by_process,
+    get_current_session,
+    list_sessions,
+    read_session,
+    search_scrollback,
+    wait_for_output,
+)
 
-__all__ = ["list_sessions", "focus_session", "get_current_session"]
+__all__ = [
+    "list_sessions",
+    "focus_session",
+    "focus_session_by_directory",
+    "focus_session_by_process",
+    "focus_session_by_job",
+    "search_scrollback",
+    "read_session",
+    "wait_for_output",
+    "get_current_session",
+]
@@ -1,23 +1,53 @@
 """MCP tools for iTerm2 session management."""
 
-from iterm2.app import async_get_app
-from iterm2.connection import Connection
+import asyncio
+import contextlib
+from typing import Any
+
 from pydantic import BaseModel, Field
 
+from ...coalesce import single_flight
+from ...connection import async_connect
+from ...focus import (
+    FocusError,
+    FocusTimeoutError,
+    ITerm2UnavailableError,
+    _activate,
+)
+from ...jobindex import find_session_by_job, job_monitor
+from ...pathindex import find_session_by_path, path_index
+from ...procindex import find_session_by_pid, find_session_by_tty, process_monitor
+from ...reader import DEFAULT_READ_LINES, SessionOutput
+from ...reader import read_session as read_session_output
+from ...reader import wait_for_output as wait_for_session_output
+from ...rpc import deadline_after, gather_until, rpc
+from ...scheduler import FocusScheduler
+from ...scrollback import scrollback_index
+from ...search import DEFAULT_SCROLLBACK, Match, best_match, search_sessions
+from ...session import Session
+from ...topology import async_get_snapshot, async_track_changes
 from ..server import mcp
 
+# Deadline applied to every tool call so a stalled iTerm2 cannot hang agents
+DEFAULT_TOOL_TIMEOUT = 10.0
+
+# Default wait for wait_for_output; below the HTTP transports' request timeout
+DEFAULT_WAIT_TIMEOUT = 20.0
+
 
-class SessionInfo(BaseModel):
-    """Information about an iTerm2 session."""
+class SessionList(BaseModel):
+    """A listing of iTerm2 sessions."""
 
-    session_id: str = Field(description="The unique session ID")
-    window_id: str = Field(description="The window ID containing this session")
-    tab_id: str = Field(description="The tab ID containing this session")
-    is_active: bool = Field(description="Whether this is the currently active session")
-    title: str | None = Field(
-        default=None, description="The session title if available"
+    changed: bool = Field(
+        description="False if the layout still matches if_changed_since, "
+        "in which case no sessions are returned"
     )
-    name: str | None = Field(default=None, description="The session name if available")
+    version: str | None = Field(
+        default=None,
+        description="Layout version; pass it as if_changed_since to skip "
+        "the listing while nothing has changed",
+    )
+    sessions: list[Session] = Field(default_factory=list)
 
 
 class FocusResult(BaseModel):
@@ -26,129 +56,496 @@ class FocusResult(BaseModel):
     success: bool = Field(description="Whether the operation was successful")
     session_id: str = Field(description="The session ID that was targeted")
     message: str = Field(description="A descriptive message about the operation")
+    status: str | None = Field(
+        default=None,
+        description="How the request was scheduled: applied, coalesced or preempted",
+    )
+
+
+class SearchResult(BaseModel):
+    """Lines of session output matching a search."""
+
+    matches: list[Match] = Field(
+        default_factory=list, description="Matching lines, in the order found"
+    )
+    complete: bool = Field(
+        description="False if the search stopped at max_matches or timed out "
+        "before every session was searched"
+    )
+    focused: FocusResult | None = Field(
+        default=None,
+        description="Result of focusing the most recent match, if requested",
+    )
+
+
+class WaitResult(BaseModel):
+    """Outcome of waiting for session output."""
+
+    matched: bool = Field(description="Whether the pattern was printed in time")
+    match: Match | None = Field(
+        default=None, description="The first line that matched, if any"
+    )
+    message: str = Field(description="A descriptive message about the wait")
+    focused: FocusResult | None = Field(
+        default=None, description="Result of focusing the session, if requested"
+    )
 
 
 @mcp.tool()
-async def list_sessions() -> list[SessionInfo]:
+async def list_sessions(if_changed_since: str | None = None) -> SessionList:
     """List all available iTerm2 sessions.
 
-    Returns a list of all sessions across all windows and tabs,
-    including their IDs and whether they're currently active.
+    Returns all sessions across all windows and tabs, including their IDs
+    and whether they're currently active, plus a layout version.
+
+    Args:
+        if_changed_since: Version from an earlier listing. If no window, tab
+            or session has been added, removed or moved since, a short
+            unchanged result is returned instead of the sessions.
     """
+    if if_changed_since is not None:
+        try:
+            snapshot = await async_get_snapshot(deadline_after(DEFAULT_TOOL_TIMEOUT))
+        except ITerm2UnavailableError:
+            raise
+        except Exception:
+            snapshot = None
+        if snapshot is not None and snapshot.etag == if_changed_since:
+            return SessionList(changed=False, version=snapshot.etag)
+
+    return await single_flight.do(("mcp.list_sessions",), _list_sessions)
+
+
+async def _list_sessions() -> SessionList:
+    """Walk all windows and tabs, building a Session for every session."""
+    deadline = deadline_after(DEFAULT_TOOL_TIMEOUT)
     try:
-        connection = await Connection.async_create()
-        app = await async_get_app(connection)
-        if app is None:
-            return []
-        sessions = []
+        snapshot = await async_get_snapshot(deadline)
+        if snapshot is None:
+            return SessionList(changed=True)
+        await async_track_changes(snapshot)
 
         # Get the current active session for comparison
-        current_window = app.current_terminal_window
+        current_window = snapshot.app.current_terminal_window
         current_session_id = None
         if current_window and current_window.current_tab:
             current_session = current_window.current_tab.current_session
             if current_session:
                 current_session_id = current_session.session_id
 
-        # Iterate through all windows, tabs, and sessions
-        for window in app.terminal_windows:
-            for tab in window.tabs:
-                for session in tab.sessions:
-                    # Get session metadata
-                    title = None
-                    name = None
-                    try:
-                        profile = await session.async_get_profile()
-                        if profile:
-                            name = profile.name
-                    except Exception:
-                        # Ignore errors getting profile info
-                        pass
-
-                    sessions.append(
-                        SessionInfo(
-                            session_id=session.session_id,
-                            window_id=window.window_id,
-                            tab_id=tab.tab_id,
-                            is_active=session.session_id == current_session_id,
-                            title=title,
-                            name=name,
-                        )
-                    )
-
-        return sessions
+        entries = list(snapshot.entries())
+        # Sessions whose name has not arrived by the deadline are listed
+        # without one.
+        names = await gather_until(
+            (_session_name(session) for _, _, session in entries), deadline
+        )
+
+        sessions = [
+            Session(
+                session_id=session.session_id,
+                window_id=window.window_id,
+                tab_id=tab.tab_id,
+                name=name,
+                is_active=session.session_id == current_session_id,
+            )
+            for (window, tab, session), name in zip(entries, names, strict=True)
+        ]
+        return SessionList(changed=True, version=snapshot.etag, sessions=sessions)
 
+    except ITerm2UnavailableError:
+        # Fail fast with a clear error while iTerm2 is known to be down
+        raise
     except Exception:
         # Return empty list on error rather than failing
-        return []
+        return SessionList(changed=True)
+
+
+async def _session_name(session: Any) -> str | None:
+    """Return the session's name, or None if unavailable."""
+    try:
+        name = await rpc(session.async_get_variable("session.name"))
+        if name:
+            return str(name)
+    except Exception:
+        # Ignore errors getting the name
+        pass
+    return None
 
 
 @mcp.tool()
-async def focus_session(session_id: str) -> FocusResult:
+async def focus_session(session_id: str, priority: int = 0) -> FocusResult:
     """Focus a specific iTerm2 session by ID.
 
+    Focus requests arriving within a short window are collapsed: only the
+    highest-priority (then most recent) request is applied, and the others
+    are reported as coalesced or preempted without touching iTerm2.
+
     Args:
         session_id: The iTerm2 session ID to focus (e.g., "w0t0p0:UUID")
+        priority: Requests with a higher priority win over concurrent
+            lower-priority requests (default 0)
 
     Returns:
         FocusResult indicating success or failure with a descriptive message
     """
     try:
-        connection = await Connection.async_create()
-        app = await async_get_app(connection)
-        if app is None:
-            return FocusResult(
-                success=False,
-                session_id=session_id,
-                message="Failed to get iTerm2 app instance.",
-            )
+        outcome = await focus_scheduler.submit(session_id, priority)
+    except FocusError as e:
+        return FocusResult(success=False, session_id=session_id, message=str(e))
+    except ConnectionError as e:
+        return FocusResult(
+            success=False,
+            session_id=session_id,
+            message=f"Failed to connect to iTerm2: {str(e)}. Make sure iTerm2 is running and Python API is enabled.",
+        )
+    except Exception as e:
+        return FocusResult(
+            success=False,
+            session_id=session_id,
+            message=f"Failed to focus session: {str(e)}",
+        )
+
+    if outcome.status == "preempted":
+        message = (
+            f"Focus request for {session_id} was superseded by a request "
+            f"for {outcome.applied_session_id}"
+        )
+    elif not outcome.success:
+        message = f"Session {session_id} not found"
+    elif outcome.status == "coalesced":
+        message = (
+            f"Successfully focused session {session_id} "
+            "(coalesced with a concurrent request)"
+        )
+    else:
+        message = f"Successfully focused session {session_id}"
+
+    return FocusResult(
+        success=outcome.success,
+        session_id=session_id,
+        message=message,
+        status=outcome.status,
+    )
+
+
+async def _activate_session(session_id: str) -> bool:
+    """Focus the session, its tab and its window.
+
+    Returns:
+        True if the session was found and focused, False otherwise
+    """
+    deadline = deadline_after(DEFAULT_TOOL_TIMEOUT)
+    try:
+        snapshot = await async_get_snapshot(deadline)
+        if snapshot is None:
+            raise FocusError("Failed to get iTerm2 app instance.")
+
+        entry = snapshot.find(session_id)
+        if entry is None:
+            return False
 
-        # Search for the session
-        for window in app.terminal_windows:
-            for tab in window.tabs:
-                for session in tab.sessions:
-                    if session.session_id == session_id:
-                        # Focus the session, tab, and window
-                        await session.async_activate()
-                        await tab.async_select()
-                        await window.async_activate()
-
-                        return FocusResult(
-                            success=True,
-                            session_id=session_id,
-                            message=f"Successfully focused session {session_id}",
-                        )
+        async with asyncio.timeout_at(deadline):
+            # Focus the session, tab, and window
+            await _activate(*entry)
+            return True
+    except TimeoutError as e:
+        raise FocusTimeoutError(DEFAULT_TOOL_TIMEOUT) from e
 
+
+focus_scheduler = FocusScheduler(_activate_session)
+
+
+@mcp.tool()
+async def focus_session_by_directory(directory: str) -> FocusResult:
+    """Focus the session working in the deepest directory under a directory.
+
+    For example, "~/src/api" focuses a session in ~/src/api/server over one
+    in ~/src/api. Working directories are tracked as they change, so repeat
+    calls do not refetch them.
+
+    Args:
+        directory: Absolute directory; "~" is expanded
+
+    Returns:
+        FocusResult naming the focused session, or failure if no session is
+        in or below the directory
+    """
+    try:
+        snapshot = await async_get_snapshot(deadline_after(DEFAULT_TOOL_TIMEOUT))
+        if snapshot is None:
+            raise FocusError("Failed to get iTerm2 app instance.")
+        # Without monitors every call fetches all paths, which still works
+        with contextlib.suppress(Exception):
+            async with asyncio.timeout(DEFAULT_TOOL_TIMEOUT):
+                await path_index.async_start(snapshot)
+
+        session_id = await find_session_by_path(
+            directory, DEFAULT_TOOL_TIMEOUT, snapshot
+        )
+    except Exception as e:
         return FocusResult(
             success=False,
-            session_id=session_id,
-            message=f"Session {session_id} not found",
+            session_id="",
+            message=f"Failed to find a session under {directory}: {e}",
         )
 
-    except ConnectionError as e:
+    if session_id is None:
+        return FocusResult(
+            success=False, session_id="", message=f"No session under {directory}"
+        )
+    result: FocusResult = await focus_session(session_id)
+    return result
+
+
+@mcp.tool()
+async def focus_session_by_process(
+    pid: int | None = None, tty: str | None = None
+) -> FocusResult:
+    """Focus the session a process runs in, or that uses a terminal device.
+
+    Give exactly one of pid or tty. A PID that is not a session's shell or
+    foreground job is matched by its controlling terminal, so any process
+    started from a session finds it.
+
+    Args:
+        pid: Process ID
+        tty: Terminal device, with or without "/dev/" (e.g., "ttys003")
+
+    Returns:
+        FocusResult naming the focused session, or failure if no session
+        owns the process or terminal
+    """
+    if (pid is None) == (tty is None):
+        return FocusResult(
+            success=False, session_id="", message="Give exactly one of pid or tty"
+        )
+    target = f"process {pid}" if pid is not None else f"terminal {tty}"
+
+    try:
+        snapshot = await async_get_snapshot(deadline_after(DEFAULT_TOOL_TIMEOUT))
+        if snapshot is None:
+            raise FocusError("Failed to get iTerm2 app instance.")
+        # Without monitors every call fetches all sessions, which still works
+        with contextlib.suppress(Exception):
+            async with asyncio.timeout(DEFAULT_TOOL_TIMEOUT):
+                await process_monitor.async_start(snapshot)
+
+        if pid is not None:
+            session_id = await find_session_by_pid(pid, DEFAULT_TOOL_TIMEOUT, snapshot)
+        else:
+            assert tty is not None
+            session_id = await find_session_by_tty(tty, DEFAULT_TOOL_TIMEOUT, snapshot)
+    except Exception as e:
         return FocusResult(
             success=False,
-            session_id=session_id,
-            message=f"Failed to connect to iTerm2: {str(e)}. Make sure iTerm2 is running and Python API is enabled.",
+            session_id="",
+            message=f"Failed to find the session of {target}: {e}",
         )
+
+    if session_id is None:
+        return FocusResult(
+            success=False, session_id="", message=f"No session owns {target}"
+        )
+    result: FocusResult = await focus_session(session_id)
+    return result
+
+
+@mcp.tool()
+async def focus_session_by_job(job: str) -> FocusResult:
+    """Focus the session running a job, such as a build or test run.
+
+    Jobs are tracked as they start and finish, so repeat calls do not
+    refetch every session's variables.
+
+    Args:
+        job: Job name (e.g., "pytest"), or a substring or glob of the
+            command line (e.g., "make *test*")
+
+    Returns:
+        FocusResult naming the focused session, or failure if no session is
+        running a matching job
+    """
+    try:
+        snapshot = await async_get_snapshot(deadline_after(DEFAULT_TOOL_TIMEOUT))
+        if snapshot is None:
+            raise FocusError("Failed to get iTerm2 app instance.")
+        # Without monitors every call fetches all sessions, which still works
+        with contextlib.suppress(Exception):
+            async with asyncio.timeout(DEFAULT_TOOL_TIMEOUT):
+                await job_monitor.async_start(snapshot)
+
+        session_id = await find_session_by_job(job, DEFAULT_TOOL_TIMEOUT, snapshot)
     except Exception as e:
         return FocusResult(
             success=False,
-            session_id=session_id,
-            message=f"Failed to focus session: {str(e)}",
+            session_id="",
+            message=f"Failed to find a session running {job}: {e}",
+        )
+
+    if session_id is None:
+        return FocusResult(
+            success=False, session_id="", message=f"No session is running {job}"
+        )
+    result: FocusResult = await focus_session(session_id)
+    return result
+
+
+@mcp.tool()
+async def search_scrollback(
+    pattern: str,
+    max_matches: int = 50,
+    focus_best: bool = False,
+    scrollback: int = DEFAULT_SCROLLBACK,
+) -> SearchResult:
+    """Search the screen and scrollback of every session with a regex.
+
+    Finds the session where something was printed, such as a stack trace
+    or an error message. Output is indexed as it arrives, so repeat
+    searches do not refetch it.
+
+    Args:
+        pattern: Python regular expression, matched against each line
+        max_matches: Stop after this many matching lines
+        focus_best: Focus the session with the most recent match
+        scrollback: Newest lines searched per session
+
+    Returns:
+        SearchResult with the matching lines; each names its session, line
+        number and lines_below (0 for the newest line)
+    """
+    matches: list[Match] = []
+    complete = True
+    try:
+        snapshot = await async_get_snapshot(deadline_after(DEFAULT_TOOL_TIMEOUT))
+        if snapshot is None:
+            raise FocusError("Failed to get iTerm2 app instance.")
+        # Without the index every call fetches all output, which still works
+        with contextlib.suppress(Exception):
+            async with asyncio.timeout(DEFAULT_TOOL_TIMEOUT):
+                await scrollback_index.async_start(snapshot)
+
+        async with contextlib.aclosing(
+            search_sessions(pattern, DEFAULT_TOOL_TIMEOUT, snapshot, scrollback)
+        ) as found:
+            async for match in found:
+                matches.append(match)
+                if len(matches) >= max_matches:
+                    complete = False
+                    break
+    except FocusTimeoutError:
+        complete = False
+    except Exception as e:
+        return SearchResult(
+            complete=False,
+            focused=FocusResult(
+                success=False,
+                session_id="",
+                message=f"Failed to search sessions: {e}",
+            ),
+        )
+
+    focused = None
+    best = best_match(matches)
+    if focus_best:
+        if best is None:
+            focused = FocusResult(
+                success=False, session_id="", message=f"No output matches {pattern}"
+            )
+        else:
+            focused = await focus_session(best.session_id)
+    return SearchResult(matches=matches, complete=complete, focused=focused)
+
+
+@mcp.tool()
+async def read_session(
+    session_id: str,
+    lines: int = DEFAULT_READ_LINES,
+    before: int | None = None,
+    since: str | None = None,
+) -> SessionOutput | None:
+    """Read what a session shows: its newest lines, or a page of scrollback.
+
+    To follow output, such as a running build, pass the token of the
+    previous read as since: only lines added or changed after that read
+    are returned.
+
+    Args:
+        session_id: The iTerm2 session ID (e.g., "w0t0p0:UUID")
+        lines: Maximum number of lines returned
+        before: Return the lines just before this line number, to page
+            back through scrollback; cannot be combined with since
+        since: token from an earlier read of the same session
+
+    Returns:
+        SessionOutput with numbered lines, oldest first, and a token for
+        the next read; None if the session does not exist
+    """
+    return await read_session_output(
+        session_id, lines, before, since, timeout=DEFAULT_TOOL_TIMEOUT
+    )
+
+
+@mcp.tool()
+async def wait_for_output(
+    session_id: str,
+    pattern: str,
+    timeout: float = DEFAULT_WAIT_TIMEOUT,
+    focus: bool = False,
+    since: str | None = None,
+) -> WaitResult:
+    """Wait until a session prints a line matching a regex.
+
+    Use this instead of reading a session repeatedly, e.g. to wait for
+    "passed|failed" after starting tests. The session's screen updates are
+    streamed and only new or changed lines are matched, so the call
+    returns as soon as the output appears. Output already on screen does
+    not count, unless since is given.
+
+    Args:
+        session_id: The iTerm2 session ID (e.g., "w0t0p0:UUID")
+        pattern: Python regular expression, matched against each line
+        timeout: Seconds to wait
+        focus: Focus the session once the pattern matches
+        since: token from an earlier read_session; lines printed after
+            that read are checked first, so none are missed in between
+
+    Returns:
+        WaitResult with the matching line, or matched false if the
+        timeout passed or the session closed first
+    """
+    try:
+        match = await wait_for_session_output(session_id, pattern, timeout, since)
+    except FocusTimeoutError:
+        return WaitResult(
+            matched=False, message=f"No output matched {pattern} in {timeout}s"
+        )
+    except Exception as e:
+        return WaitResult(matched=False, message=f"Failed to wait for output: {e}")
+    if match is None:
+        return WaitResult(
+            matched=False, message=f"Session {session_id} not found or closed"
         )
 
+    focused = await focus_session(session_id) if focus else None
+    return WaitResult(
+        matched=True, match=match, message="Output matched", focused=focused
+    )
+
 
 @mcp.tool()
-async def get_current_session() -> SessionInfo | None:
+async def get_current_session() -> Session | None:
     """Get information about the currently focused iTerm2 session.
 
     Returns:
-        SessionInfo about the current session, or None if no session is active
+        Session describing the current session, or None if no session is active
     """
+    return await single_flight.do(("mcp.get_current_session",), _get_current_session)
+
+
+async def _get_current_session() -> Session | None:
+    """Resolve the current window, tab and session."""
     try:
-        connection = await Connection.async_create()
-        app = await async_get_app(connection)
+        app = await async_connect(deadline_after(DEFAULT_TOOL_TIMEOUT))
         if app is None:
             return None
 
@@ -164,25 +561,21 @@ async def get_current_session() -> SessionInfo | None:
         if not session:
             return None
 
-        # Get session metadata
-        title = None
-        name = None
-        try:
-            profile = await session.async_get_profile()
-            if profile:
-                name = profile.name
-        except Exception:
-            # Ignore errors getting profile info
-            pass
+        # Get session metadata, leaving the name out if it is slow to arrive
+        (name,) = await gather_until(
+            [_session_name(session)], deadline_after(DEFAULT_TOOL_TIMEOUT)
+        )
 
-        return SessionInfo(
+        return Session(
             session_id=session.session_id,
             window_id=window.window_id,
             tab_id=tab.tab_id,
-            is_active=True,
-            title=title,
             name=name,
+            is_active=True,
         )
 
+    except ITerm2UnavailableError:
+        # Fail fast with a clear error while iTerm2 is known to be down
+        raise
     except Exception:
         return None
@@ -0,0 +1,252 @@
+"""HTTP transports for the iterm2-focus MCP server."""
+
+import asyncio
+import functools
+from collections.abc import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Hashable,
+    MutableMapping,
+)
+from contextlib import asynccontextmanager
+from typing import Any
+from urllib.parse import parse_qs
+
+from mcp import types
+from mcp.server.fastmcp import FastMCP
+
+from .server import mcp
+
+Scope = MutableMapping[str, Any]
+Message = MutableMapping[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+ASGIApp = Callable[[Scope, Receive, Send], Awaitable[None]]
+
+TRANSPORTS = ("stdio", "sse", "streamable-http")
+LOOPBACK_HOSTS = frozenset({"127.0.0.1", "localhost", "::1"})
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_CLIENT_CONCURRENCY = 4
+DEFAULT_REQUEST_TIMEOUT = 30.0
+
+
+class _ClientSlot:
+    """Per-client semaphore plus the number of requests holding or awaiting it."""
+
+    def __init__(self, limit: int) -> None:
+        self.semaphore = asyncio.Semaphore(limit)
+        self.users = 0
+
+
+class ConcurrencyLimiter:
+    """Global and per-client bounds on in-flight MCP requests.
+
+    Each request first takes a slot from its client's semaphore and then one
+    from the global semaphore, so a single busy client can hold at most
+    ``client_concurrency`` of the ``max_concurrency`` global slots and cannot
+    starve the others.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        client_concurrency: int = DEFAULT_CLIENT_CONCURRENCY,
+    ) -> None:
+        if max_concurrency < 1 or client_concurrency < 1:
+            raise ValueError("Concurrency limits must be at least 1.")
+        self.max_concurrency = max_concurrency
+        self.client_concurrency = min(client_concurrency, max_concurrency)
+        self._global = asyncio.Semaphore(max_concurrency)
+        self._clients: dict[Hashable, _ClientSlot] = {}
+
+    @asynccontextmanager
+    async def slot(self, client: Hashable) -> AsyncIterator[None]:
+        """Hold one of ``client``'s slots and a global one.
+
+        Idle clients are forgotten afterwards.
+        """
+        slot = self._clients.get(client)
+        if slot is None:
+            slot = self._clients[client] = _ClientSlot(self.client_concurrency)
+        slot.users += 1
+        try:
+            async with slot.semaphore, self._global:
+                yield
+        finally:
+            slot.users -= 1
+            if slot.users == 0:
+                del self._clients[client]
+
+
+class ConcurrencyLimitMiddleware:
+    """ASGI middleware bounding in-flight streamable HTTP requests.
+
+    Only POST requests (which carry tool calls) are limited; long-lived GET
+    event streams pass straight through. This does not work for SSE, where
+    a POST is answered before its tool runs; see limit_tool_calls.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        client_concurrency: int = DEFAULT_CLIENT_CONCURRENCY,
+        request_timeout: float | None = DEFAULT_REQUEST_TIMEOUT,
+    ) -> None:
+        self.app = app
+        self.limiter = ConcurrencyLimiter(max_concurrency, client_concurrency)
+        self.request_timeout = request_timeout
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope.get("method") != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def tracking_send(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            async with (
+                asyncio.timeout(self.request_timeout),
+                self.limiter.slot(_client_key(scope)),
+            ):
+                await self.app(scope, receive, tracking_send)
+        except TimeoutError:
+            # Once headers are out the only option is to drop the stream.
+            if not response_started:
+                await _send_error(send, 504, "Request timed out")
+
+
+def limit_tool_calls(
+    server: FastMCP,
+    limiter: ConcurrencyLimiter,
+    request_timeout: float | None = DEFAULT_REQUEST_TIMEOUT,
+) -> None:
+    """Bound the server's tool calls where they run.
+
+    With SSE a POST only queues its message and is answered with 202 at
+    once; the tool then runs in the MCP session's task and its result is
+    sent on the event stream. So the limits are applied around tool
+    dispatch instead, keyed by MCP session, and a call that runs out of
+    time returns a tool error. Calling this again replaces the limits.
+    """
+    handlers = server._mcp_server.request_handlers
+    handler = handlers[types.CallToolRequest]
+    handler = getattr(handler, "__wrapped__", handler)
+
+    @functools.wraps(handler)
+    async def limited(request: types.CallToolRequest) -> types.ServerResult:
+        session = server._mcp_server.request_context.session
+        try:
+            async with asyncio.timeout(request_timeout), limiter.slot(session):
+                return await handler(request)
+        except TimeoutError:
+            return types.ServerResult(
+                types.CallToolResult(
+                    content=[types.TextContent(type="text", text="Request timed out")],
+                    isError=True,
+                )
+            )
+
+    handlers[types.CallToolRequest] = limited
+
+
+def _client_key(scope: Scope) -> str:
+    """Identify the MCP client that issued a request.
+
+    All local agents share the loopback address, so the MCP session ID is
+    preferred: the ``mcp-session-id`` header for streamable HTTP and the
+    ``session_id`` query parameter for SSE.
+    """
+    for name, value in scope.get("headers", []):
+        if name == b"mcp-session-id":
+            return str(value.decode("latin-1"))
+
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    if "session_id" in query:
+        return str(query["session_id"][0])
+
+    client = scope.get("client")
+    return f"{client[0]}:{client[1]}" if client else "unknown"
+
+
+async def _send_error(send: Send, status: int, message: str) -> None:
+    """Send a minimal plain-text error response."""
+    body = message.encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"text/plain; charset=utf-8"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+def run_http(
+    transport: str,
+    *,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    client_concurrency: int = DEFAULT_CLIENT_CONCURRENCY,
+    request_timeout: float | None = DEFAULT_REQUEST_TIMEOUT,
+) -> None:
+    """Serve the MCP server over streamable HTTP or SSE on a loopback address.
+
+    Args:
+        transport: Either "streamable-http" or "sse"
+        host: Loopback address to bind to
+        port: TCP port to bind to
+        max_concurrency: Maximum number of requests processed at once
+        client_concurrency: Maximum number of requests per client at once
+        request_timeout: Seconds before a request is answered with 504
+            (a tool error with SSE), or None to wait indefinitely
+
+    Raises:
+        ValueError: If the transport is unknown or the host is not loopback
+    """
+    if transport not in ("streamable-http", "sse"):
+        raise ValueError(f"Unknown HTTP transport: {transport}")
+    if host not in LOOPBACK_HOSTS:
+        raise ValueError(
+            f"Refusing to bind to {host}: the MCP server can only listen on "
+            "a loopback address."
+        )
+
+    import uvicorn
+
+    mcp.settings.host = host
+    mcp.settings.port = port
+    app: ASGIApp
+    if transport == "streamable-http":
+        app = ConcurrencyLimitMiddleware(
+            mcp.streamable_http_app(),
+            max_concurrency=max_concurrency,
+            client_concurrency=client_concurrency,
+            request_timeout=request_timeout,
+        )
+    else:
+        limiter = ConcurrencyLimiter(max_concurrency, client_concurrency)
+        limit_tool_calls(mcp, limiter, request_timeout)
+        app = mcp.sse_app()
+
+    uvicorn.run(
+        app,
+        host=host,
+        port=port,
+        log_level=mcp.settings.log_level.lower(),
+    )
@@ -0,0 +1,228 @@
+"""Session variables kept current by iTerm2 change notifications."""
+
+import asyncio
+import contextlib
+from collections.abc import Callable, Mapping
+from typing import Any, Generic, TypeVar
+
+from iterm2.variables import VariableMonitor, VariableScopes
+
+from .connection import ConnectionBound
+from .rpc import rpc
+from .topology import TopologySnapshot
+
+IndexT = TypeVar("IndexT")
+
+
+class SessionVariables(ConnectionBound):
+    """Follow a few variables of every session, for indexes built on them.
+
+    Meant for long-running processes such as the MCP server. Each variable
+    of each session is read once and then followed through a
+    VariableMonitor, so lookups in an index fed by on_change need no RPC.
+    """
+
+    def __init__(
+        self,
+        names: tuple[str, ...],
+        on_change: Callable[[str, Mapping[str, Any]], None],
+        on_remove: Callable[[str], None],
+    ) -> None:
+        """Initialize a stopped monitor.
+
+        Args:
+            names: Session variables to follow
+            on_change: Called with a session ID and its current variable
+                values (those read so far) whenever one of them changes
+            on_remove: Called with a session ID when it is no longer followed
+        """
+        self.names = names
+        self._on_change = on_change
+        self._on_remove = on_remove
+        self._connection: Any | None = None
+        self._monitors: dict[str, list[asyncio.Task[None]]] = {}
+        self._values: dict[str, dict[str, Any]] = {}
+
+    async def async_start(self, snapshot: TopologySnapshot) -> bool:
+        """Start monitoring the snapshot's sessions.
+
+        Does nothing but sync if already running.
+
+        Returns:
+            Whether every session in the snapshot is being monitored
+        """
+        if not self.running:
+            self._connection = snapshot.app.connection
+        return await self.async_sync(snapshot)
+
+    async def async_sync(self, snapshot: TopologySnapshot) -> bool:
+        """Monitor new sessions and forget closed ones.
+
+        Returns once the variables of every new session have been read.
+        Sessions whose monitors could not be started are left out, and
+        retried on the next sync.
+
+        Returns:
+            Whether every session in the snapshot is being monitored
+        """
+        for session_id in [s for s in self._monitors if s not in snapshot]:
+            self._drop(session_id)
+
+        loop = asyncio.get_running_loop()
+        pending: dict[str, list[asyncio.Future[None]]] = {}
+        for session_id, (_, _, session) in snapshot.sessions.items():
+            if session_id in self._monitors:
+                continue
+            self._values[session_id] = {}
+            started = [loop.create_future() for _ in self.names]
+            self._monitors[session_id] = [
+                asyncio.create_task(
+                    self._monitor(self._connection, session, name, future)
+                )
+                for name, future in zip(self.names, started, strict=True)
+            ]
+            pending[session_id] = started
+
+        complete = True
+        for session_id, started in pending.items():
+            results = await asyncio.gather(*started, return_exceptions=True)
+            if any(isinstance(result, BaseException) for result in results):
+                complete = False
+                self._drop(session_id)
+        return complete
+
+    async def async_stop(self) -> None:
+        """Stop every monitor and forget every session."""
+        tasks = [task for monitors in self._monitors.values() for task in monitors]
+        self._disconnected()
+        for task in tasks:
+            with contextlib.suppress(BaseException):
+                await task
+
+    def _disconnected(self) -> None:
+        # Changes are no longer seen, so the values cannot be trusted
+        for session_id in list(self._monitors):
+            self._drop(session_id)
+        self._connection = None
+
+    def _drop(self, session_id: str) -> None:
+        current = asyncio.current_task() if _loop_running() else None
+        for task in self._monitors.pop(session_id, ()):
+            if task is not current:
+                task.cancel()
+        self._values.pop(session_id, None)
+        self._on_remove(session_id)
+
+    def _set(self, session_id: str, name: str, value: Any) -> None:
+        values = self._values.get(session_id)
+        if values is None:
+            return
+        values[name] = value
+        self._on_change(session_id, values)
+
+    async def _monitor(
+        self, connection: Any, session: Any, name: str, started: asyncio.Future[None]
+    ) -> None:
+        """Keep one variable of one session current until cancelled."""
+        session_id = session.session_id
+        try:
+            async with VariableMonitor(
+                connection, VariableScopes.SESSION, name, session_id
+            ) as monitor:
+                # Read the value after subscribing so no change is missed
+                self._set(session_id, name, await rpc(session.async_get_variable(name)))
+                started.set_result(None)
+                while True:
+                    self._set(session_id, name, await monitor.async_get())
+        except Exception as e:
+            if not started.done():
+                started.set_exception(e)
+            elif asyncio.current_task() in self._monitors.get(session_id, ()):
+                # A failed monitor would leave the value stale; forget the
+                # session so the next sync reads it again.
+                self._drop(session_id)
+        finally:
+            if not started.done():
+                started.cancel()
+
+
+class MonitoredIndex(Generic[IndexT]):
+    """An index kept current by following a few variables of every session.
+
+    Meant for long-running processes such as the MCP server: after
+    async_start, lookups need no RPC beyond syncing with the session list,
+    which only reads the variables of sessions not seen before.
+    """
+
+    def __init__(
+        self,
+        index: IndexT,
+        names: tuple[str, ...],
+        on_change: Callable[[str, Mapping[str, Any]], None],
+        on_remove: Callable[[str], None],
+    ) -> None:
+        """Initialize a stopped index.
+
+        Args:
+            index: The index to keep current
+            names: Session variables it is built from
+            on_change: Updates index with a session's variables
+            on_remove: Removes a session from index
+        """
+        self.index = index
+        self.variables = SessionVariables(names, on_change, on_remove)
+
+    @property
+    def running(self) -> bool:
+        """Whether sessions are being monitored."""
+        return self.variables.running
+
+    async def async_start(self, snapshot: TopologySnapshot) -> bool:
+        """Start monitoring the snapshot's sessions.
+
+        Returns:
+            Whether every session in the snapshot is being monitored
+        """
+        return await self.variables.async_start(snapshot)
+
+    async def async_sync(self, snapshot: TopologySnapshot) -> bool:
+        """Monitor new sessions and forget closed ones.
+
+        Returns:
+            Whether every session in the snapshot is being monitored
+        """
+        return await self.variables.async_sync(snapshot)
+
+    async def async_stop(self) -> None:
+        """Stop monitoring and empty the index."""
+        await self.variables.async_stop()
+
+    async def async_current(
+        self, snapshot: TopologySnapshot, deadline: float | None
+    ) -> IndexT | None:
+        """Return the index if it covers every session of the snapshot.
+
+        Returns:
+            The index, or None if it is not running or a session's monitors
+            failed, in which case the caller fetches the variables itself
+
+        Raises:
+            TimeoutError: If the deadline passes while syncing
+        """
+        if not self.running:
+            return None
+        async with asyncio.timeout_at(deadline):
+            complete = await self.async_sync(snapshot)
+        return self.index if complete else None
+
+    def _disconnected(self) -> None:
+        self.variables._disconnected()
+
+
+def _loop_running() -> bool:
+    """Whether this thread is running an event loop."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
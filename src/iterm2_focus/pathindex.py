@@ -0,0 +1,218 @@
+"""Find sessions by working directory."""
+
+import asyncio
+import itertools
+import os
+from collections.abc import Iterable
+from pathlib import PurePosixPath
+
+from .errors import FocusTimeoutError
+from .focus import _activate
+from .monitor import MonitoredIndex
+from .rpc import deadline_after, gather_until, rpc
+from .topology import TopologySnapshot, async_get_snapshot
+
+
+def _split(path: str) -> tuple[str, ...]:
+    """Split a path into normalized components."""
+    return PurePosixPath(os.path.normpath(os.path.expanduser(path))).parts
+
+
+class _Node:
+    __slots__ = ("children", "sessions")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _Node] = {}
+        # Session ID -> insertion stamp, for preferring recent changes
+        self.sessions: dict[str, int] = {}
+
+
+class PathTrie:
+    """Session IDs indexed by working directory, one node per path component.
+
+    Looking up the sessions under a directory only visits that directory's
+    subtree, regardless of how many sessions are elsewhere.
+    """
+
+    def __init__(self, paths: Iterable[tuple[str, str | None]] = ()) -> None:
+        """Initialize the trie.
+
+        Args:
+            paths: (session_id, path) pairs to insert
+        """
+        self._root = _Node()
+        self._paths: dict[str, tuple[str, ...]] = {}
+        self._stamps = itertools.count()
+        for session_id, path in paths:
+            self.insert(session_id, path)
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def __contains__(self, session_id: object) -> bool:
+        return session_id in self._paths
+
+    def insert(self, session_id: str, path: str | None) -> None:
+        """Set a session's directory, replacing the previous one.
+
+        A None or empty path removes the session.
+        """
+        self.remove(session_id)
+        if not path:
+            return
+        parts = _split(path)
+        node = self._root
+        for part in parts:
+            node = node.children.setdefault(part, _Node())
+        node.sessions[session_id] = next(self._stamps)
+        self._paths[session_id] = parts
+
+    def remove(self, session_id: str) -> None:
+        """Remove a session, if present."""
+        parts = self._paths.pop(session_id, None)
+        if parts is None:
+            return
+        trail = [self._root]
+        for part in parts:
+            trail.append(trail[-1].children[part])
+        del trail[-1].sessions[session_id]
+        # Prune nodes left without sessions or children
+        for part, node, parent in zip(
+            reversed(parts), reversed(trail[1:]), reversed(trail[:-1]), strict=True
+        ):
+            if node.sessions or node.children:
+                break
+            del parent.children[part]
+
+    def deepest_under(self, directory: str) -> str | None:
+        """Return the session in the deepest directory at or below directory.
+
+        Among sessions equally deep, the most recently inserted one wins.
+
+        Returns:
+            The session ID, or None if no session is under directory
+        """
+        node: _Node | None = self._root
+        for part in _split(directory):
+            node = node.children.get(part) if node is not None else None
+        if node is None:
+            return None
+
+        best: tuple[int, int, str] | None = None
+        stack = [(node, 0)]
+        while stack:
+            node, depth = stack.pop()
+            for session_id, stamp in node.sessions.items():
+                candidate = (depth, stamp, session_id)
+                if best is None or candidate > best:
+                    best = candidate
+            stack.extend((child, depth + 1) for child in node.children.values())
+        return best[2] if best is not None else None
+
+
+class PathIndex(MonitoredIndex[PathTrie]):
+    """A PathTrie kept current by monitoring each session's path variable."""
+
+    def __init__(self) -> None:
+        """Initialize a stopped index."""
+        trie = PathTrie()
+        super().__init__(
+            trie,
+            ("path",),
+            lambda session_id, values: trie.insert(session_id, values["path"]),
+            trie.remove,
+        )
+
+
+path_index = PathIndex()
+
+
+async def find_session_by_path(
+    directory: str,
+    timeout: float | None = None,
+    snapshot: TopologySnapshot | None = None,
+) -> str | None:
+    """Find the session in the deepest directory at or below directory.
+
+    While path_index is running and monitoring every session, its trie
+    answers the lookup. Otherwise the path of every session is fetched once,
+    concurrently.
+
+    Args:
+        directory: Absolute directory; "~" is expanded
+        timeout: Seconds to wait before giving up, or None to wait forever.
+            Sessions whose path has not arrived by the deadline are skipped.
+        snapshot: Topology to search, or None to fetch one
+
+    Returns:
+        The session ID, or None if no session is under directory
+
+    Raises:
+        FocusTimeoutError: If the deadline passes before iTerm2 answers
+    """
+    deadline = deadline_after(timeout)
+    try:
+        if snapshot is None:
+            snapshot = await async_get_snapshot(deadline)
+        if snapshot is None:
+            return None
+
+        trie = await path_index.async_current(snapshot, deadline)
+        if trie is not None:
+            return trie.deepest_under(directory)
+    except TimeoutError as e:
+        raise FocusTimeoutError(timeout) from e
+
+    sessions = list(snapshot.sessions.items())
+    paths = await gather_until(
+        (rpc(session.async_get_variable("path")) for _, (_, _, session) in sessions),
+        deadline,
+    )
+    trie = PathTrie(
+        (session_id, path)
+        for (session_id, _), path in zip(sessions, paths, strict=True)
+    )
+    return trie.deepest_under(directory)
+
+
+async def focus_session_by_path(
+    directory: str,
+    timeout: float | None = None,
+    snapshot: TopologySnapshot | None = None,
+    record: bool = True,
+) -> str | None:
+    """Focus the session in the deepest directory at or below directory.
+
+    Args:
+        directory: Absolute directory; "~" is expanded
+        timeout: Seconds to wait before giving up, or None to wait forever
+        snapshot: Topology to search, or None to fetch one
+        record: Add the focus to the focus history and frecency database
+
+    Returns:
+        The ID of the focused session, or None if no session is under
+        directory
+
+    Raises:
+        FocusTimeoutError: If the deadline passes
+    """
+    deadline = deadline_after(timeout)
+    try:
+        if snapshot is None:
+            snapshot = await async_get_snapshot(deadline)
+        if snapshot is None:
+            return None
+    except TimeoutError as e:
+        raise FocusTimeoutError(timeout) from e
+
+    session_id = await find_session_by_path(directory, timeout, snapshot)
+    entry = snapshot.find(session_id) if session_id is not None else None
+    if entry is None:
+        return None
+
+    try:
+        async with asyncio.timeout_at(deadline):
+            await _activate(*entry, record=record)
+    except TimeoutError as e:
+        raise FocusTimeoutError(timeout) from e
+    return session_id
@@ -0,0 +1,36 @@
+"""Locations of files iterm2-focus keeps between runs."""
+
+import os
+from pathlib import Path
+
+
+def cache_dir() -> Path:
+    """Return the per-user cache directory for iterm2-focus.
+
+    ``$ITERM2_FOCUS_CACHE_DIR`` takes precedence, then
+    ``$XDG_CACHE_HOME/iterm2-focus``, then ``~/.cache/iterm2-focus``. The
+    directory is not created here.
+    """
+    override = os.environ.get("ITERM2_FOCUS_CACHE_DIR")
+    if override:
+        return Path(override)
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return Path(base) / "iterm2-focus"
+
+
+def atomic_write_text(path: Path, text: str) -> None:
+    """Write a file so that readers never see it half-written.
+
+    The parent directory is created if needed.
+
+    Raises:
+        OSError: If the file cannot be written
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}")
+    try:
+        tmp.write_text(text)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
@@ -0,0 +1,231 @@
+"""Find the session that owns a terminal device or process."""
+
+import asyncio
+from collections.abc import Iterable, Mapping
+from typing import Any
+
+from .errors import FocusTimeoutError
+from .monitor import MonitoredIndex
+from .rpc import deadline_after, gather_until, rpc
+from .topology import TopologySnapshot, async_get_snapshot
+
+# Session variables the index is built from: the terminal device, the
+# shell's PID and the PID of the foreground job.
+PROCESS_VARIABLES = ("tty", "pid", "jobPid")
+
+# Ancestors followed when looking for a process's controlling terminal
+MAX_PROCESS_DEPTH = 32
+
+
+def normalize_tty(tty: str) -> str:
+    """Return a terminal device as a /dev path ("ttys003" -> "/dev/ttys003")."""
+    return tty if tty.startswith("/dev/") else f"/dev/{tty}"
+
+
+class ProcessIndex:
+    """Session IDs keyed by terminal device and by shell or job PID.
+
+    Lookups are dictionary hits. PIDs that are neither a session's shell
+    nor its foreground job are resolved through their controlling terminal.
+    """
+
+    def __init__(self, sessions: Iterable[tuple[str, Mapping[str, Any]]] = ()) -> None:
+        """Initialize the index.
+
+        Args:
+            sessions: (session_id, variables) pairs, with variables named as
+                in PROCESS_VARIABLES
+        """
+        self.by_tty: dict[str, str] = {}
+        self.by_pid: dict[int, str] = {}
+        self._keys: dict[str, tuple[str | None, tuple[int, ...]]] = {}
+        for session_id, values in sessions:
+            self.update(session_id, values)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def update(self, session_id: str, values: Mapping[str, Any]) -> None:
+        """Set a session's terminal device and PIDs, replacing earlier ones."""
+        self.remove(session_id)
+        tty = normalize_tty(values["tty"]) if values.get("tty") else None
+        pids: list[int] = []
+        for name in ("pid", "jobPid"):
+            # Unset variables are None; PIDs can also come back as strings
+            value = values.get(name)
+            if isinstance(value, int) and not isinstance(value, bool):
+                pids.append(value)
+            elif isinstance(value, str) and value.strip().isdigit():
+                pids.append(int(value))
+        if tty is not None:
+            self.by_tty[tty] = session_id
+        for pid in pids:
+            self.by_pid[pid] = session_id
+        self._keys[session_id] = (tty, tuple(pids))
+
+    def remove(self, session_id: str) -> None:
+        """Remove a session, if present."""
+        tty, pids = self._keys.pop(session_id, (None, ()))
+        if tty is not None and self.by_tty.get(tty) == session_id:
+            del self.by_tty[tty]
+        for pid in pids:
+            if self.by_pid.get(pid) == session_id:
+                del self.by_pid[pid]
+
+    def find_by_tty(self, tty: str) -> str | None:
+        """Return the session using a terminal device, or None."""
+        return self.by_tty.get(normalize_tty(tty))
+
+    async def find_by_pid(self, pid: int) -> str | None:
+        """Return the session a process runs in, or None.
+
+        A session's shell and foreground job are found directly; any other
+        process is looked up by its controlling terminal, or that of its
+        nearest ancestor that has one.
+        """
+        session_id = self.by_pid.get(pid)
+        if session_id is not None:
+            return session_id
+        tty = await async_controlling_tty(pid)
+        return self.find_by_tty(tty) if tty is not None else None
+
+
+class ProcessMonitor(MonitoredIndex[ProcessIndex]):
+    """A ProcessIndex kept current by monitoring each session's variables."""
+
+    def __init__(self) -> None:
+        """Initialize a stopped index."""
+        index = ProcessIndex()
+        super().__init__(index, PROCESS_VARIABLES, index.update, index.remove)
+
+
+process_monitor = ProcessMonitor()
+
+
+async def async_controlling_tty(pid: int) -> str | None:
+    """Return the controlling terminal of a process or its nearest ancestor.
+
+    Uses ps(1), so it works for processes of any user on macOS and Linux.
+
+    Returns:
+        The /dev path of the terminal, or None if the process does not exist
+        or neither it nor its ancestors have one
+    """
+    for _ in range(MAX_PROCESS_DEPTH):
+        try:
+            process = await asyncio.create_subprocess_exec(
+                "ps",
+                "-o",
+                "tty=,ppid=",
+                "-p",
+                str(pid),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+            output, _ = await process.communicate()
+        except OSError:
+            return None
+
+        fields = output.decode().split()
+        if len(fields) != 2 or not fields[1].isdigit():
+            return None
+        tty, parent = fields
+        # ps shows "?" (Linux) or "??" (macOS) for processes without one
+        if tty.strip("?-"):
+            return normalize_tty(tty)
+        pid = int(parent)
+        if pid <= 1:
+            return None
+    return None
+
+
+async def _process_index(
+    snapshot: TopologySnapshot, deadline: float | None
+) -> ProcessIndex:
+    """Return the running index, or build one by fetching every session."""
+    index = await process_monitor.async_current(snapshot, deadline)
+    if index is not None:
+        return index
+
+    sessions = list(snapshot.sessions.items())
+    values = await gather_until(
+        (_process_variables(session) for _, (_, _, session) in sessions), deadline
+    )
+    return ProcessIndex(
+        (session_id, variables)
+        for (session_id, _), variables in zip(sessions, values, strict=True)
+        if variables is not None
+    )
+
+
+async def _process_variables(session: Any) -> dict[str, Any]:
+    """Fetch the variables a ProcessIndex is built from."""
+    values = await asyncio.gather(
+        *(rpc(session.async_get_variable(name)) for name in PROCESS_VARIABLES)
+    )
+    return dict(zip(PROCESS_VARIABLES, values, strict=True))
+
+
+async def find_session_by_tty(
+    tty: str,
+    timeout: float | None = None,
+    snapshot: TopologySnapshot | None = None,
+) -> str | None:
+    """Find the session using a terminal device.
+
+    Args:
+        tty: Terminal device, with or without "/dev/" (e.g., "ttys003")
+        timeout: Seconds to wait before giving up, or None to wait forever
+        snapshot: Topology to search, or None to fetch one
+
+    Returns:
+        The session ID, or None if no session uses the device
+
+    Raises:
+        FocusTimeoutError: If the deadline passes before iTerm2 answers
+    """
+    deadline = deadline_after(timeout)
+    try:
+        if snapshot is None:
+            snapshot = await async_get_snapshot(deadline)
+        if snapshot is None:
+            return None
+        index = await _process_index(snapshot, deadline)
+    except TimeoutError as e:
+        raise FocusTimeoutError(timeout) from e
+
+    return index.find_by_tty(tty)
+
+
+async def find_session_by_pid(
+    pid: int,
+    timeout: float | None = None,
+    snapshot: TopologySnapshot | None = None,
+) -> str | None:
+    """Find the session a process runs in.
+
+    Shells and foreground jobs are matched by PID; other processes, such as
+    a job's children, by their controlling terminal.
+
+    Args:
+        pid: Process ID
+        timeout: Seconds to wait before giving up, or None to wait forever
+        snapshot: Topology to search, or None to fetch one
+
+    Returns:
+        The session ID, or None if the process is not in any session
+
+    Raises:
+        FocusTimeoutError: If the deadline passes before iTerm2 answers
+    """
+    deadline = deadline_after(timeout)
+    try:
+        if snapshot is None:
+            snapshot = await async_get_snapshot(deadline)
+        if snapshot is None:
+            return None
+        index = await _process_index(snapshot, deadline)
+    except TimeoutError as e:
+        raise FocusTimeoutError(timeout) from e
+
+    return await index.find_by_pid(pid)
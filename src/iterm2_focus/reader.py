@@ -0,0 +1,305 @@
+"""Read a window of a session's screen and scrollback, or wait for output."""
+
+import asyncio
+import base64
+import binascii
+import re
+import struct
+import zlib
+from dataclasses import dataclass
+from typing import Any
+
+from iterm2.screen import ScreenStreamer
+
+from .errors import FocusTimeoutError
+from .matcher import match_lines
+from .rpc import deadline_after, rpc
+from .search import DEFAULT_SCROLLBACK, WINDOW, Match
+from .topology import (
+    TopologySnapshot,
+    async_get_snapshot,
+    async_track_changes,
+    topology_tracker,
+)
+
+# Lines returned by default
+DEFAULT_READ_LINES = 50
+
+# Bump when the token layout changes; older tokens read as unknown
+TOKEN_FORMAT = 1
+
+_TOKEN_HEADER = struct.Struct(">BQ")
+
+
+@dataclass(frozen=True, slots=True)
+class OutputLine:
+    """One row of session output."""
+
+    line: int
+    text: str
+
+
+@dataclass(frozen=True, slots=True)
+class SessionOutput:
+    """A window of a session's rows, oldest first.
+
+    line numbers are absolute, as iTerm2 counts them (rows dropped from
+    full scrollback included), and end is the row after the session's last
+    row. Pass token as since to a later read to get only the rows that
+    changed. truncated means older rows in the requested range were left
+    out to respect the line limit; reset means since could not be used
+    (unknown token, or the buffer was cleared) and the newest rows were
+    read instead.
+    """
+
+    session_id: str
+    lines: tuple[OutputLine, ...]
+    end: int
+    token: str
+    truncated: bool = False
+    reset: bool = False
+
+
+def _encode_token(first: int, rows: list[str]) -> str:
+    """Encode the screen rows starting at first as a since token."""
+    checksums = [zlib.crc32(row.encode()) for row in rows]
+    raw = _TOKEN_HEADER.pack(TOKEN_FORMAT, first) + struct.pack(
+        f">{len(checksums)}I", *checksums
+    )
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_token(token: str) -> tuple[int, list[int]] | None:
+    """Return the first row and row checksums of a token, or None."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        version, first = _TOKEN_HEADER.unpack_from(raw)
+        body = raw[_TOKEN_HEADER.size :]
+        if version != TOKEN_FORMAT or len(body) % 4:
+            return None
+        return first, list(struct.unpack(f">{len(body) // 4}I", body))
+    except (binascii.Error, struct.error, ValueError):
+        return None
+
+
+async def _rows(session: Any, first: int, upper: int) -> list[str]:
+    """Fetch rows first to upper, WINDOW rows per request."""
+    rows: list[str] = []
+    while first + len(rows) < upper:
+        start = first + len(rows)
+        contents = await rpc(
+            session.async_get_contents(start, min(WINDOW, upper - start))
+        )
+        if not contents:
+            break
+        rows.extend(line.string for line in contents)
+    return rows
+
+
+async def read_session(
+    session_id: str,
+    lines: int = DEFAULT_READ_LINES,
+    before: int | None = None,
+    since: str | None = None,
+    timeout: float | None = None,
+    snapshot: TopologySnapshot | None = None,
+) -> SessionOutput | None:
+    """Read up to lines rows of a session's output.
+
+    Without before or since, the newest rows are read. before pages back
+    through the scrollback. since returns only the rows added or changed
+    after the read that produced the token, so polling a build costs only
+    its new output. The token is self-contained: it holds a checksum of
+    each row that was on screen, so no state is kept between calls.
+
+    Args:
+        session_id: The iTerm2 session ID
+        lines: Maximum number of rows returned
+        before: Return the rows just before this row number
+        since: Token from an earlier read of the same session
+        timeout: Seconds to wait before giving up, or None to wait forever
+        snapshot: Topology to look the session up in, or None to fetch one
+
+    Returns:
+        The rows, or None if the session does not exist
+
+    Raises:
+        ValueError: If both before and since are given, or lines is not
+            positive
+        FocusTimeoutError: If the deadline passes
+    """
+    if before is not None and since is not None:
+        raise ValueError("Give at most one of before and since.")
+    if lines < 1:
+        raise ValueError("lines must be at least 1.")
+
+    deadline = deadline_after(timeout)
+    try:
+        async with asyncio.timeout_at(deadline):
+            if snapshot is None:
+                snapshot = await async_get_snapshot(deadline)
+            entry = snapshot.find(session_id) if snapshot is not None else None
+            if entry is None:
+                return None
+            return await _read(entry[2], lines, before, since)
+    except TimeoutError as e:
+        raise FocusTimeoutError(timeout) from e
+
+
+async def _read(
+    session: Any, lines: int, before: int | None, since: str | None
+) -> SessionOutput:
+    """Read rows of a session; see read_session."""
+    info = await rpc(session.async_get_line_info())
+    screen = info.overflow + info.scrollback_buffer_height
+    end = screen + info.mutable_area_height
+
+    previous = _decode_token(since) if since is not None else None
+    # A token from beyond the end means the buffer was cleared since
+    reset = since is not None and (previous is None or previous[0] > screen)
+    if previous is not None and not reset:
+        old_first, checksums = previous
+        old_end = old_first + len(checksums)
+        # Rows after the old screen are new; rows on it may have changed
+        first = max(old_first, info.overflow, end - lines - len(checksums))
+        rows = await _rows(session, min(first, screen), end)
+        base = min(first, screen)
+        changed = [
+            OutputLine(number, text)
+            for number, text in enumerate(rows, base)
+            if number >= first
+            and (
+                number >= old_end
+                or zlib.crc32(text.encode()) != checksums[number - old_first]
+            )
+        ]
+        truncated = len(changed) > lines or first > max(old_first, info.overflow)
+        return SessionOutput(
+            session.session_id,
+            tuple(changed[-lines:]),
+            end,
+            _encode_token(screen, rows[screen - base :]),
+            truncated=truncated,
+        )
+
+    upper = end if before is None else max(info.overflow, min(before, end))
+    first = max(info.overflow, upper - lines)
+    rows = await _rows(session, first, upper)
+    if upper == end and first <= screen:
+        screen_rows = rows[screen - first :]
+    else:
+        # The token describes the screen, which this window does not cover
+        screen_rows = await _rows(session, screen, end)
+    return SessionOutput(
+        session.session_id,
+        tuple(OutputLine(number, text) for number, text in enumerate(rows, first)),
+        end,
+        _encode_token(screen, screen_rows),
+        truncated=first > info.overflow,
+        reset=reset,
+    )
+
+
+async def wait_for_output(
+    session_id: str,
+    pattern: str | re.Pattern[str],
+    timeout: float | None = None,
+    since: str | None = None,
+    snapshot: TopologySnapshot | None = None,
+) -> Match | None:
+    """Wait until a session prints a row matching a pattern.
+
+    Nothing is polled: the session's screen updates are streamed, and on
+    each one only the rows added or changed since the previous check are
+    fetched and matched. Output already on screen does not count unless
+    since is given, in which case the rows changed after the read that
+    produced the token are checked first, so output printed between a
+    read_session call and this one is not missed.
+
+    Args:
+        session_id: The iTerm2 session ID
+        pattern: Regular expression, searched in each row
+        timeout: Seconds to wait before giving up, or None to wait forever
+        since: Token from an earlier read_session of the same session
+        snapshot: Topology to look the session up in, or None to fetch one
+
+    Returns:
+        The first matching row, or None if the session does not exist or
+        closes first
+
+    Raises:
+        re.error: If pattern is not a valid regular expression
+        FocusTimeoutError: If the deadline passes
+    """
+    regex = re.compile(pattern) if isinstance(pattern, str) else pattern
+    deadline = deadline_after(timeout)
+    try:
+        async with asyncio.timeout_at(deadline):
+            if snapshot is None:
+                snapshot = await async_get_snapshot(deadline)
+            entry = snapshot.find(session_id) if snapshot is not None else None
+            if snapshot is None or entry is None:
+                return None
+            # Wakes the wait when the session closes
+            await async_track_changes(snapshot)
+            return await _wait(snapshot.app.connection, entry[2], regex, since)
+    except TimeoutError as e:
+        raise FocusTimeoutError(timeout) from e
+
+
+async def _wait(
+    connection: Any, session: Any, pattern: re.Pattern[str], since: str | None
+) -> Match | None:
+    """Match the rows of a session as they change; see wait_for_output."""
+    session_id = session.session_id
+    dirty = asyncio.Event()
+
+    async def listen(streamer: ScreenStreamer) -> None:
+        while True:
+            await streamer.async_get()
+            dirty.set()
+
+    async with ScreenStreamer(connection, session_id, want_contents=False) as streamer:
+        listener = asyncio.create_task(listen(streamer))
+        changed = asyncio.create_task(topology_tracker.wait_for_change(None))
+        try:
+            # Read after subscribing so no update is missed
+            if since is None:
+                since = (await _read(session, 1, None, None)).token
+            else:
+                dirty.set()
+            while True:
+                waiter = asyncio.create_task(dirty.wait())
+                await asyncio.wait(
+                    (waiter, listener, changed), return_when=asyncio.FIRST_COMPLETED
+                )
+                waiter.cancel()
+                if listener.done():
+                    listener.result()
+                if changed.done():
+                    snapshot = await async_get_snapshot()
+                    if snapshot is None or session_id not in snapshot:
+                        return None
+                    changed = asyncio.create_task(
+                        topology_tracker.wait_for_change(None)
+                    )
+                if not dirty.is_set():
+                    continue
+                dirty.clear()
+                output = await _read(session, DEFAULT_SCROLLBACK, None, since)
+                since = output.token
+                found = await match_lines(pattern, [line.text for line in output.lines])
+                if found:
+                    index, start, end = found[0]
+                    line = output.lines[index]
+                    return Match(
+                        session_id,
+                        line.line,
+                        output.end - 1 - line.line,
+                        line.text,
+                        start,
+                        end,
+                    )
+        finally:
+            listener.cancel()
+            changed.cancel()
@@ -0,0 +1,166 @@
+"""Concurrency limiting and deadlines for iTerm2 RPCs."""
+
+import asyncio
+import weakref
+from collections.abc import AsyncGenerator, Awaitable, Coroutine, Iterable
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+DEFAULT_MAX_CONCURRENT_RPCS = 16
+
+
+class RPCLimiter:
+    """Bound the number of iTerm2 RPCs in flight at once.
+
+    Large fan-outs (metadata for hundreds of sessions, screen contents for
+    every pane) would otherwise flood the API socket. Each event loop gets
+    its own semaphore, since the CLI runs every command in a fresh loop.
+    """
+
+    def __init__(self, limit: int = DEFAULT_MAX_CONCURRENT_RPCS) -> None:
+        self._limit = limit
+        self._semaphores: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, asyncio.Semaphore
+        ] = weakref.WeakKeyDictionary()
+
+    @property
+    def limit(self) -> int:
+        """Maximum number of RPCs in flight per event loop."""
+        return self._limit
+
+    @limit.setter
+    def limit(self, value: int) -> None:
+        if value < 1:
+            raise ValueError("RPC concurrency limit must be at least 1.")
+        self._limit = value
+        # Takes effect for loops that have not issued an RPC yet.
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    async def call(self, aw: Awaitable[T]) -> T:
+        """Await ``aw`` once a slot is free."""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self._limit)
+
+        try:
+            await semaphore.acquire()
+        except BaseException:
+            # Cancelled while queued: the RPC never starts.
+            if isinstance(aw, Coroutine):
+                aw.close()
+            raise
+        try:
+            return await aw
+        finally:
+            semaphore.release()
+
+
+# Process-wide limiter shared by every iTerm2 call in the package
+limiter = RPCLimiter()
+
+
+async def rpc(aw: Awaitable[T]) -> T:
+    """Await an iTerm2 RPC through the global limiter."""
+    return await limiter.call(aw)
+
+
+def set_rpc_concurrency(limit: int) -> None:
+    """Set the maximum number of iTerm2 RPCs in flight at once.
+
+    Args:
+        limit: The new limit (at least 1)
+    """
+    limiter.limit = limit
+
+
+def deadline_after(timeout: float | None) -> float | None:
+    """Convert a relative timeout into an absolute event loop deadline."""
+    if timeout is None:
+        return None
+    return asyncio.get_running_loop().time() + timeout
+
+
+def time_left(deadline: float | None) -> float | None:
+    """Convert an absolute event loop deadline back into a timeout."""
+    if deadline is None:
+        return None
+    return max(deadline - asyncio.get_running_loop().time(), 0.0)
+
+
+async def gather_until(
+    aws: Iterable[Awaitable[T]], deadline: float | None
+) -> list[T | None]:
+    """Run awaitables concurrently until ``deadline``.
+
+    Awaitables still running at the deadline are cancelled and awaited, so
+    no RPC outlives the call. Exceptions from finished awaitables propagate.
+
+    Args:
+        aws: The awaitables to run
+        deadline: Absolute event loop time, or None to wait for all
+
+    Returns:
+        Results in input order, with None for awaitables that did not finish
+    """
+    tasks: list[asyncio.Future[T]] = [asyncio.ensure_future(aw) for aw in aws]
+    if not tasks:
+        return []
+
+    timeout = None
+    if deadline is not None:
+        timeout = max(0.0, deadline - asyncio.get_running_loop().time())
+
+    try:
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+    except BaseException:
+        pending = {task for task in tasks if not task.done()}
+        await _cancel_all(pending)
+        raise
+
+    await _cancel_all(pending)
+    return [None if task in pending else task.result() for task in tasks]
+
+
+async def iter_until(
+    aws: Iterable[Awaitable[T]], deadline: float | None, ordered: bool = False
+) -> AsyncGenerator[T, None]:
+    """Run awaitables concurrently, yielding results as they arrive.
+
+    Iteration stops at ``deadline``. Awaitables still running when iteration
+    stops, including when the consumer stops early and the generator is
+    closed, are cancelled and awaited. Exceptions propagate.
+
+    Args:
+        aws: The awaitables to run
+        deadline: Absolute event loop time, or None to wait for all
+        ordered: Yield in input order instead of completion order
+
+    Yields:
+        The result of each awaitable that finished in time
+    """
+    tasks: list[asyncio.Future[T]] = [asyncio.ensure_future(aw) for aw in aws]
+
+    try:
+        for next_result in tasks if ordered else asyncio.as_completed(tasks):
+            timeout = asyncio.timeout_at(deadline)
+            try:
+                async with timeout:
+                    result = await next_result
+            except TimeoutError:
+                if timeout.expired():
+                    return
+                raise
+            yield result
+    finally:
+        await _cancel_all(task for task in tasks if not task.done())
+
+
+async def _cancel_all(tasks: Iterable[asyncio.Future[Any]]) -> None:
+    """Cancel tasks and wait until they have finished unwinding."""
+    tasks = list(tasks)
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,140 @@
+"""Focus scheduler that collapses bursts of focus requests."""
+
+import asyncio
+import itertools
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Literal
+
+from .focus import async_focus_session
+
+FocusStatus = Literal["applied", "coalesced", "preempted"]
+
+DEFAULT_FOCUS_WINDOW = 0.05
+
+
+@dataclass(frozen=True)
+class FocusOutcome:
+    """What happened to a scheduled focus request.
+
+    ``status`` is "applied" for the request that reached iTerm2, "coalesced"
+    for requests merged into an applied request for the same session, and
+    "preempted" for requests dropped in favour of another session.
+    ``applied_session_id`` is the session focused, or for a preempted request
+    the session that took its place.
+    """
+
+    session_id: str
+    status: FocusStatus
+    success: bool
+    applied_session_id: str | None = None
+
+
+@dataclass
+class _Request:
+    session_id: str
+    priority: int
+    seq: int
+    future: "asyncio.Future[FocusOutcome]"
+
+
+class FocusScheduler:
+    """Collapse bursts of focus requests to a single iTerm2 activation.
+
+    The first request opens a window of ``window`` seconds. Within the window
+    the highest-priority request wins, and among equal priorities the last
+    one wins. Superseded requests are answered immediately without touching
+    iTerm2; when the window closes only the winner is focused. Activations
+    never overlap, so focus cannot flip back and forth mid-activation.
+    """
+
+    def __init__(
+        self,
+        focus: Callable[[str], Awaitable[bool]] = async_focus_session,
+        window: float = DEFAULT_FOCUS_WINDOW,
+    ) -> None:
+        self.focus = focus
+        self.window = window
+        self._best: _Request | None = None
+        self._same_target: list[_Request] = []
+        self._flush_task: asyncio.Task[None] | None = None
+        self._apply_lock = asyncio.Lock()
+        self._seq = itertools.count()
+
+    async def submit(self, session_id: str, priority: int = 0) -> FocusOutcome:
+        """Request focus for ``session_id``.
+
+        Args:
+            session_id: The iTerm2 session ID to focus
+            priority: Higher priorities win over lower ones within a window
+
+        Returns:
+            The outcome of this particular request
+
+        Raises:
+            Whatever the focus function raises, for applied and coalesced
+            requests
+        """
+        loop = asyncio.get_running_loop()
+        request = _Request(session_id, priority, next(self._seq), loop.create_future())
+
+        best = self._best
+        if best is None or priority >= best.priority:
+            if best is not None:
+                self._supersede(best, session_id)
+            self._best = request
+        elif session_id == best.session_id:
+            # Lower priority, but the winner focuses this session anyway
+            self._same_target.append(request)
+        else:
+            _resolve(request, _preempted(request, best.session_id))
+
+        if self._flush_task is None:
+            self._flush_task = loop.create_task(self._flush_after_window())
+
+        return await request.future
+
+    def _supersede(self, previous: _Request, session_id: str) -> None:
+        """Retire the previous best request in favour of a new one."""
+        if previous.session_id == session_id:
+            # Same target: it will share the new request's result.
+            self._same_target.append(previous)
+            return
+
+        _resolve(previous, _preempted(previous, session_id))
+        for request in self._same_target:
+            _resolve(request, _preempted(request, session_id))
+        self._same_target = []
+
+    async def _flush_after_window(self) -> None:
+        """Apply the winning request once the window closes."""
+        await asyncio.sleep(self.window)
+        winner, coalesced = self._best, self._same_target
+        self._best, self._same_target, self._flush_task = None, [], None
+        if winner is None:
+            return
+
+        async with self._apply_lock:
+            try:
+                success = await self.focus(winner.session_id)
+            except Exception as e:
+                for request in (winner, *coalesced):
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                return
+
+        sid = winner.session_id
+        _resolve(winner, FocusOutcome(sid, "applied", success, sid))
+        for request in coalesced:
+            _resolve(request, FocusOutcome(sid, "coalesced", success, sid))
+
+
+def _preempted(request: _Request, winner: str) -> FocusOutcome:
+    """Return the outcome of a request dropped in favour of winner."""
+    return FocusOutcome(request.session_id, "preempted", False, winner)
+
+
+def _resolve(request: _Request, outcome: FocusOutcome) -> None:
+    """Complete a request unless its caller already gave up."""
+    if not request.future.done():
+        request.future.set_result(outcome)
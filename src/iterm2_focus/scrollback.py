@@ -0,0 +1,517 @@
+"""Searchable copy of session output, kept current by screen updates."""
+
+import asyncio
+import contextlib
+import itertools
+import re
+from collections import deque
+from collections.abc import Container, Iterable
+from typing import Any
+
+from iterm2.screen import ScreenStreamer
+
+from .connection import ConnectionBound
+from .matcher import match_lines
+from .rpc import rpc
+from .search import DEFAULT_SCROLLBACK, WINDOW, Match, _logical_lines
+from .topology import TopologySnapshot
+
+# Lines per index block. Postings point at blocks rather than lines, which
+# keeps them several times smaller; a hit costs scanning one block.
+BLOCK_LINES = 64
+
+# Lines kept across all sessions; the oldest blocks are evicted beyond this
+MAX_INDEXED_LINES = 50_000
+
+# Seconds between refreshes of a session, so bursts of output are fetched
+# together
+REFRESH_INTERVAL = 0.25
+
+_GRAM = 3
+
+
+def _grams(text: str) -> set[str]:
+    """Return the lower-case trigrams of text."""
+    text = text.lower()
+    return {text[i : i + _GRAM] for i in range(len(text) - _GRAM + 1)}
+
+
+def required_grams(pattern: re.Pattern[str]) -> set[str]:
+    """Return lower-case trigrams that every match of pattern contains.
+
+    Only literal runs outside alternations and optional parts count, so the
+    result may be empty; it never contains a trigram a match could lack.
+    """
+    try:
+        # Private, but the only parser of Python's own regex syntax
+        from re import _parser  # type: ignore[attr-defined]
+
+        parsed = _parser.parse(pattern.pattern, pattern.flags)
+    except Exception:
+        return set()
+
+    grams: set[str] = set()
+
+    def walk(items: Any) -> None:
+        run: list[str] = []
+        for op, arg in items:
+            if op == _parser.LITERAL:
+                run.append(chr(arg))
+                continue
+            grams.update(_grams("".join(run)))
+            run = []
+            if op == _parser.SUBPATTERN:
+                walk(arg[-1])
+            elif op in (_parser.MAX_REPEAT, _parser.MIN_REPEAT) and arg[0] >= 1:
+                walk(arg[2])
+        grams.update(_grams("".join(run)))
+
+    walk(parsed)
+    return grams
+
+
+class _Block:
+    __slots__ = ("block_id", "session_id", "lines", "postings")
+
+    def __init__(self, block_id: int, session_id: str) -> None:
+        self.block_id = block_id
+        self.session_id = session_id
+        self.lines: list[tuple[int, str]] = []
+        # Number of postings pointing at the block; 0 while it is filling
+        self.postings = 0
+
+
+class _SessionText:
+    __slots__ = ("blocks", "line_count", "screen", "next_row", "end", "evicted")
+
+    def __init__(self) -> None:
+        self.blocks: deque[_Block] = deque()
+        self.line_count = 0
+        # Lines still on screen, which can change; scanned on every search
+        self.screen: list[tuple[int, str]] = []
+        # First row not yet indexed, and the row after the last one
+        self.next_row = 0
+        self.end = 0
+        # Row before which lines were evicted; 0 while none were
+        self.evicted = 0
+
+
+class TextIndex:
+    """Lines of session output in a trigram inverted index.
+
+    Lines that scrolled off the screen are final and are collected in
+    blocks of BLOCK_LINES, which are indexed once full; the lines still on
+    screen and in unfilled blocks are scanned. A search intersects the
+    postings of the trigrams its pattern requires and runs the regex over
+    the candidate blocks only. Memory is bounded by a per-session and a
+    total line limit, beyond which the oldest blocks are evicted. A session
+    keeps at least its per-session limit of lines unless the total limit
+    evicts them; uncovered tells which sessions lost lines that way.
+    """
+
+    def __init__(
+        self,
+        max_lines: int = MAX_INDEXED_LINES,
+        session_lines: int = DEFAULT_SCROLLBACK,
+    ) -> None:
+        """Initialize an empty index.
+
+        Args:
+            max_lines: Lines kept across all sessions
+            session_lines: Lines kept per session
+        """
+        self.max_lines = max_lines
+        self.session_lines = session_lines
+        # Trigram -> IDs of the blocks containing it, in indexing order.
+        # Evicted IDs are skipped, and purged once they are half the entries.
+        self._postings: dict[str, list[int]] = {}
+        self._posting_count = 0
+        self._stale_postings = 0
+        self._blocks: dict[int, _Block] = {}
+        # Every block, oldest first; evicted ones are skipped lazily
+        self._order: deque[_Block] = deque()
+        self._sessions: dict[str, _SessionText] = {}
+        self._ids = itertools.count()
+        self._lines = 0
+
+    def __len__(self) -> int:
+        return self._lines
+
+    def __contains__(self, session_id: object) -> bool:
+        return session_id in self._sessions
+
+    def next_row(self, session_id: str) -> int | None:
+        """Return the first row of a session not yet indexed, or None."""
+        text = self._sessions.get(session_id)
+        return text.next_row if text is not None else None
+
+    def uncovered(self, scrollback: int = DEFAULT_SCROLLBACK) -> set[str]:
+        """Return the sessions missing evicted lines within scrollback.
+
+        Args:
+            scrollback: Newest lines a search would cover per session
+
+        Returns:
+            IDs of the sessions the index cannot search that far back
+        """
+        return {
+            session_id
+            for session_id, text in self._sessions.items()
+            if max(text.end - scrollback, 0) < text.evicted
+        }
+
+    def set_screen(
+        self, session_id: str, lines: list[tuple[int, str]], end: int
+    ) -> None:
+        """Replace the lines a session has on screen.
+
+        Args:
+            session_id: The session
+            lines: (row number, text) of the lines on screen
+            end: Row after the session's last row
+        """
+        text = self._sessions.setdefault(session_id, _SessionText())
+        text.screen = lines
+        text.end = end
+
+    def append(
+        self, session_id: str, lines: Iterable[tuple[int, str]], next_row: int
+    ) -> None:
+        """Add lines that left a session's screen, evicting old ones.
+
+        Args:
+            session_id: The session
+            lines: (row number, text) of the lines, oldest first
+            next_row: First row of the session after them
+        """
+        text = self._sessions.setdefault(session_id, _SessionText())
+        block = text.blocks[-1] if text.blocks else None
+        for line in lines:
+            if block is None or len(block.lines) >= BLOCK_LINES:
+                block = _Block(next(self._ids), session_id)
+                self._blocks[block.block_id] = block
+                self._order.append(block)
+                text.blocks.append(block)
+            block.lines.append(line)
+            if len(block.lines) == BLOCK_LINES:
+                self._seal(block)
+            text.line_count += 1
+            self._lines += 1
+        text.next_row = next_row
+
+        while (
+            len(text.blocks) > 1
+            and text.line_count - len(text.blocks[0].lines) >= self.session_lines
+        ):
+            self._drop_block(text.blocks[0], text)
+        while self._lines > self.max_lines and self._order:
+            oldest = self._order.popleft()
+            if oldest.block_id in self._blocks:
+                self._drop_block(oldest, self._sessions[oldest.session_id])
+
+    def remove(self, session_id: str) -> None:
+        """Forget a session, if present."""
+        text = self._sessions.pop(session_id, None)
+        if text is None:
+            return
+        while text.blocks:
+            self._drop_block(text.blocks[0], text)
+
+    def _seal(self, block: _Block) -> None:
+        """Index a full block."""
+        grams = _grams("\n".join(line for _, line in block.lines))
+        for gram in grams:
+            postings = self._postings.get(gram)
+            if postings is None:
+                self._postings[gram] = [block.block_id]
+            else:
+                postings.append(block.block_id)
+        block.postings = len(grams)
+        self._posting_count += len(grams)
+
+    def _drop_block(self, block: _Block, text: _SessionText) -> None:
+        if text.blocks[0] is block:
+            text.blocks.popleft()
+        else:
+            text.blocks.remove(block)
+        text.line_count -= len(block.lines)
+        self._lines -= len(block.lines)
+        del self._blocks[block.block_id]
+        block.lines = []
+        text.evicted = text.blocks[0].lines[0][0] if text.blocks else text.next_row
+
+        self._stale_postings += block.postings
+        if self._stale_postings * 2 > self._posting_count:
+            self._purge()
+        if len(self._order) > 2 * len(self._blocks) + BLOCK_LINES:
+            self._order = deque(b for b in self._order if b.block_id in self._blocks)
+
+    def _purge(self) -> None:
+        """Drop postings of evicted blocks."""
+        live = self._blocks
+        purged: dict[str, list[int]] = {}
+        for gram, postings in self._postings.items():
+            kept = [block_id for block_id in postings if block_id in live]
+            if kept:
+                purged[gram] = kept
+        self._postings = purged
+        self._posting_count -= self._stale_postings
+        self._stale_postings = 0
+
+    async def search(
+        self,
+        pattern: re.Pattern[str],
+        scrollback: int = DEFAULT_SCROLLBACK,
+        skip: Container[str] = (),
+    ) -> list[Match]:
+        """Return the indexed lines matching pattern.
+
+        Candidate lines are gathered synchronously, so later updates do not
+        affect the search, and matched with match_lines.
+
+        Args:
+            pattern: Compiled regular expression
+            scrollback: Newest lines searched per session
+            skip: IDs of sessions not to search
+
+        Returns:
+            One Match per matching line, newest first within a session
+        """
+        grams = required_grams(pattern)
+        if grams:
+            postings = sorted((self._postings.get(gram, []) for gram in grams), key=len)
+            candidates = set(postings[0])
+            for others in postings[1:]:
+                if not candidates:
+                    break
+                candidates.intersection_update(others)
+            blocks = [self._blocks[i] for i in candidates if i in self._blocks]
+            # Blocks still filling are not in the postings
+            blocks.extend(
+                text.blocks[-1]
+                for text in self._sessions.values()
+                if text.blocks and not text.blocks[-1].postings
+            )
+        else:
+            blocks = list(self._blocks.values())
+
+        lines: dict[str, list[tuple[int, str]]] = {}
+        for block in blocks:
+            lines.setdefault(block.session_id, []).extend(block.lines)
+
+        # (session ID, row number, text, row after the session's last row)
+        scanned: list[tuple[str, int, str, int]] = []
+        for session_id, text in self._sessions.items():
+            if session_id in skip:
+                continue
+            oldest = text.end - scrollback
+            session_lines = lines.get(session_id, []) + text.screen
+            session_lines.sort(reverse=True)
+            for number, line in session_lines:
+                if number < oldest:
+                    break
+                scanned.append((session_id, number, line, text.end))
+
+        found = await match_lines(pattern, [entry[2] for entry in scanned])
+        matches = []
+        for index, start, end in found:
+            session_id, number, line, session_end = scanned[index]
+            matches.append(
+                Match(session_id, number, session_end - 1 - number, line, start, end)
+            )
+        return matches
+
+
+class ScrollbackIndex(ConnectionBound):
+    """A TextIndex kept current by streaming each session's screen updates.
+
+    Meant for long-running processes such as the MCP server. Each session
+    is read once, then only the rows added since its last refresh are
+    fetched whenever its screen changes, so searches need no RPC beyond
+    syncing with the session list.
+    """
+
+    def __init__(
+        self,
+        max_lines: int = MAX_INDEXED_LINES,
+        session_lines: int = DEFAULT_SCROLLBACK,
+    ) -> None:
+        """Initialize a stopped index.
+
+        Args:
+            max_lines: Lines kept across all sessions
+            session_lines: Lines kept per session
+        """
+        self.index = TextIndex(max_lines, session_lines)
+        self._connection: Any | None = None
+        self._streams: dict[str, asyncio.Task[None]] = {}
+        # Resolved once a session's output has been read for the first time
+        self._ready: dict[str, asyncio.Future[None]] = {}
+
+    async def async_start(self, snapshot: TopologySnapshot) -> bool:
+        """Start following the snapshot's sessions.
+
+        Does nothing but sync if already running.
+
+        Returns:
+            Whether every session in the snapshot is indexed
+        """
+        if not self.running:
+            self._connection = snapshot.app.connection
+        return await self.async_sync(snapshot)
+
+    async def async_sync(self, snapshot: TopologySnapshot) -> bool:
+        """Follow new sessions and forget closed ones.
+
+        Returns once every session in the snapshot has been read, or failed
+        to be. Failed sessions are retried on the next sync.
+
+        Returns:
+            Whether every session in the snapshot is indexed
+        """
+        for session_id in [s for s in self._streams if s not in snapshot]:
+            self._drop(session_id)
+
+        loop = asyncio.get_running_loop()
+        for session_id, (_, _, session) in snapshot.sessions.items():
+            if session_id not in self._streams:
+                ready = self._ready[session_id] = loop.create_future()
+                self._streams[session_id] = asyncio.create_task(
+                    self._follow(self._connection, session, ready)
+                )
+
+        complete = True
+        for session_id in list(snapshot.sessions):
+            read = self._ready.get(session_id)
+            if read is None:
+                complete = False
+                continue
+            await asyncio.wait((read,))
+            if read.cancelled() or read.exception() is not None:
+                complete = False
+                self._drop(session_id)
+        return complete
+
+    async def async_stop(self) -> None:
+        """Stop following every session and empty the index."""
+        tasks = list(self._streams.values())
+        self._disconnected()
+        for task in tasks:
+            with contextlib.suppress(BaseException):
+                await task
+
+    def _disconnected(self) -> None:
+        # Updates are no longer seen, so the text cannot be trusted
+        for session_id in list(self._streams):
+            self._drop(session_id)
+        self._connection = None
+
+    def _drop(self, session_id: str) -> None:
+        task = self._streams.pop(session_id, None)
+        if task is not None and task is not _current_task():
+            task.cancel()
+        ready = self._ready.pop(session_id, None)
+        if ready is not None and not ready.done():
+            ready.cancel()
+        self.index.remove(session_id)
+
+    async def _follow(
+        self, connection: Any, session: Any, ready: asyncio.Future[None]
+    ) -> None:
+        """Keep one session's text current until cancelled."""
+        session_id = session.session_id
+        dirty = asyncio.Event()
+
+        async def listen(streamer: ScreenStreamer) -> None:
+            while True:
+                await streamer.async_get()
+                dirty.set()
+
+        try:
+            async with ScreenStreamer(
+                connection, session_id, want_contents=False
+            ) as streamer:
+                listener = asyncio.create_task(listen(streamer))
+                try:
+                    # Read after subscribing so no update is missed
+                    await self._refresh(session)
+                    ready.set_result(None)
+                    while True:
+                        waiter = asyncio.create_task(dirty.wait())
+                        await asyncio.wait(
+                            (waiter, listener), return_when=asyncio.FIRST_COMPLETED
+                        )
+                        waiter.cancel()
+                        if listener.done():
+                            listener.result()
+                        dirty.clear()
+                        await self._refresh(session)
+                        await asyncio.sleep(REFRESH_INTERVAL)
+                finally:
+                    listener.cancel()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            elif self._streams.get(session_id) is asyncio.current_task():
+                # Stale text would give wrong answers; read it again later
+                self._drop(session_id)
+
+    async def _refresh(self, session: Any) -> None:
+        """Fetch the rows added since the last refresh and the screen."""
+        session_id = session.session_id
+        info = await rpc(session.async_get_line_info())
+        history_end = info.overflow + info.scrollback_buffer_height
+        end = history_end + info.mutable_area_height
+
+        next_row = self.index.next_row(session_id)
+        if next_row is not None and next_row > history_end:
+            # The buffer was cleared; start over
+            self.index.remove(session_id)
+            next_row = None
+        first = max(
+            next_row or 0, info.overflow, history_end - self.index.session_lines
+        )
+
+        rows: list[Any] = []
+        while first + len(rows) < end:
+            upper = first + len(rows)
+            window = await rpc(
+                session.async_get_contents(upper, min(WINDOW, end - upper))
+            )
+            if not window:
+                break
+            rows.extend(window)
+
+        lines = _logical_lines(rows, first)
+        starts = [number for number, _, _ in lines] + [first + len(rows)]
+        # Lines that ended before the screen can no longer change
+        settled = 0
+        while (
+            settled < len(lines)
+            and lines[settled][2]
+            and starts[settled + 1] <= history_end
+        ):
+            settled += 1
+        self.index.set_screen(
+            session_id, [(number, text) for number, text, _ in lines[settled:]], end
+        )
+        # Indexing is CPU work; let other tasks run between blocks
+        for i in range(0, settled, BLOCK_LINES):
+            chunk = lines[i : min(i + BLOCK_LINES, settled)]
+            self.index.append(
+                session_id,
+                [(number, text) for number, text, _ in chunk],
+                starts[i + len(chunk)],
+            )
+            await asyncio.sleep(0)
+
+
+def _current_task() -> asyncio.Task[Any] | None:
+    """Return the running task, or None outside an event loop."""
+    try:
+        return asyncio.current_task()
+    except RuntimeError:
+        return None
+
+
+scrollback_index = ScrollbackIndex()
@@ -0,0 +1,238 @@
+"""Search the screen and scrollback of every session."""
+
+import asyncio
+import contextlib
+import json
+import re
+from collections.abc import AsyncGenerator, Awaitable, Callable, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+from .errors import FocusTimeoutError
+from .matcher import OFFLOAD_CHARS, match_lines
+from .rpc import DEFAULT_MAX_CONCURRENT_RPCS, _cancel_all, deadline_after, rpc
+from .topology import TopologySnapshot, async_get_snapshot
+
+# Newest lines searched per session by default
+DEFAULT_SCROLLBACK = 10_000
+
+# Lines fetched per contents request; bounds the memory each session needs
+WINDOW = 1000
+
+# Matches buffered ahead of a slow consumer before searching pauses
+QUEUE_SIZE = 1000
+
+
+@dataclass(frozen=True, slots=True)
+class Match:
+    """A line of session output matching a search.
+
+    Lines wrapped by the terminal are joined, so a match can span rows.
+    line is the absolute row number where the line starts, as iTerm2
+    counts them (rows dropped from full scrollback included), so it stays
+    valid while new output arrives. lines_below is the number of rows after
+    that row; the smaller it is, the more recent the output.
+    """
+
+    session_id: str
+    line: int
+    lines_below: int
+    text: str
+    start: int
+    end: int
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the match as a plain dictionary."""
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def to_json(self) -> str:
+        """Return the match as a JSON object."""
+        return json.dumps(self.to_dict())
+
+
+def best_match(matches: Sequence[Match]) -> Match | None:
+    """Return the most recent match, or None if there are none."""
+    return min(matches, key=lambda m: m.lines_below, default=None)
+
+
+def _logical_lines(rows: Sequence[Any], first: int) -> list[tuple[int, str, bool]]:
+    """Join wrapped rows into lines.
+
+    Args:
+        rows: LineContents, oldest first
+        first: Row number of rows[0]
+
+    Returns:
+        (row number, text, ended) for each line, oldest first; ended is False
+        for a last line that continues past the rows given
+    """
+    lines: list[tuple[int, str, bool]] = []
+    number, parts = first, []
+    for offset, row in enumerate(rows):
+        parts.append(row.string)
+        if row.hard_eol:
+            lines.append((number, "".join(parts), True))
+            number, parts = first + offset + 1, []
+    if parts:
+        lines.append((number, "".join(parts), False))
+    return lines
+
+
+async def _search_session(
+    session: Any,
+    pattern: re.Pattern[str],
+    scrollback: int,
+    emit: Callable[[Match], Awaitable[None]],
+) -> None:
+    """Search the newest lines of one session, newest first.
+
+    Lines are fetched WINDOW rows at a time from the bottom up. The first
+    line of a window may continue from the window above it, so it is held
+    back until that window shows where it starts. Windows are matched
+    together once they hold OFFLOAD_CHARS, so long searches reach the
+    process pool of match_lines instead of matching each window inline.
+    """
+    info = await rpc(session.async_get_line_info())
+    end = info.overflow + info.scrollback_buffer_height + info.mutable_area_height
+    start = max(info.overflow, end - scrollback)
+
+    # Lines fetched but not yet matched, newest first
+    pending: list[tuple[int, str]] = []
+    pending_chars = 0
+
+    async def check(lines: Sequence[tuple[int, str]]) -> None:
+        for index, match_start, match_end in await match_lines(
+            pattern, [text for _, text in lines]
+        ):
+            number, text = lines[index]
+            await emit(
+                Match(
+                    session.session_id,
+                    number,
+                    end - 1 - number,
+                    text,
+                    match_start,
+                    match_end,
+                )
+            )
+
+    head: tuple[int, str] | None = None
+    upper = end
+    while upper > start:
+        first = max(start, upper - WINDOW)
+        rows = await rpc(session.async_get_contents(first, upper - first))
+        if not rows:
+            break
+        # Fewer rows come back once the requested ones left the scrollback
+        more = first > start and len(rows) == upper - first
+        first = upper - len(rows)
+        lines = _logical_lines(rows, first)
+        if head is not None:
+            number, text, ended = lines[-1]
+            if ended:
+                lines.append((*head, True))
+            else:
+                lines[-1] = (number, text + head[1], True)
+        head = None
+        if more:
+            number, text, _ = lines.pop(0)
+            head = (number, text)
+        for number, text, _ in reversed(lines):
+            pending.append((number, text))
+            pending_chars += len(text)
+        if pending_chars >= OFFLOAD_CHARS:
+            await check(pending)
+            pending, pending_chars = [], 0
+        if not more:
+            break
+        upper = first
+
+    if head is not None:
+        pending.append(head)
+    await check(pending)
+
+
+async def search_sessions(
+    pattern: str | re.Pattern[str],
+    timeout: float | None = None,
+    snapshot: TopologySnapshot | None = None,
+    scrollback: int = DEFAULT_SCROLLBACK,
+    concurrency: int = DEFAULT_MAX_CONCURRENT_RPCS,
+) -> AsyncGenerator[Match, None]:
+    """Search the output of every session, yielding matches as they are found.
+
+    While scrollback_index is running and holds every session, its index
+    answers the search without fetching any text, except for sessions whose
+    older lines it had to evict to bound its memory. Other sessions are
+    searched concurrently, at most concurrency at a time, each from its
+    newest line back through its scrollback, one window of lines per
+    request. Every request goes through the RPC limiter. Sessions that
+    cannot be read, such as ones closed during the search, are skipped.
+
+    Args:
+        pattern: Regular expression, searched in each line
+        timeout: Seconds to search before giving up, or None to search all
+        snapshot: Topology to search, or None to fetch one
+        scrollback: Newest lines searched per session
+        concurrency: Sessions searched at once
+
+    Yields:
+        One Match per matching line, newest first within a session
+
+    Raises:
+        re.error: If pattern is not a valid regular expression
+        FocusTimeoutError: If the deadline passes; matches found before it
+            have been yielded
+    """
+    regex = re.compile(pattern) if isinstance(pattern, str) else pattern
+    deadline = deadline_after(timeout)
+    try:
+        if snapshot is None:
+            snapshot = await async_get_snapshot(deadline)
+        if snapshot is None:
+            return
+    except TimeoutError as e:
+        raise FocusTimeoutError(timeout) from e
+
+    # Imported here because the scrollback index builds on this module
+    from .scrollback import scrollback_index
+
+    sessions = [session for _, _, session in snapshot.sessions.values()]
+
+    if scrollback_index.running and scrollback <= scrollback_index.index.session_lines:
+        complete = False
+        with contextlib.suppress(Exception):
+            async with asyncio.timeout_at(deadline):
+                complete = await scrollback_index.async_sync(snapshot)
+        if complete:
+            index = scrollback_index.index
+            uncovered = index.uncovered(scrollback)
+            for hit in await index.search(regex, scrollback, skip=uncovered):
+                yield hit
+            sessions = [s for s in sessions if s.session_id in uncovered]
+
+    # None marks a session as done
+    queue: asyncio.Queue[Match | None] = asyncio.Queue(QUEUE_SIZE)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def search(session: Any) -> None:
+        async with semaphore:
+            with contextlib.suppress(Exception):
+                await _search_session(session, regex, scrollback, queue.put)
+        await queue.put(None)
+
+    tasks = [asyncio.ensure_future(search(session)) for session in sessions]
+    remaining = len(tasks)
+    try:
+        while remaining:
+            try:
+                async with asyncio.timeout_at(deadline):
+                    match = await queue.get()
+            except TimeoutError as e:
+                raise FocusTimeoutError(timeout) from e
+            if match is None:
+                remaining -= 1
+            else:
+                yield match
+    finally:
+        await _cancel_all(task for task in tasks if not task.done())
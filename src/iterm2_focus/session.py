@@ -0,0 +1,32 @@
+"""Session records shared by the library, CLI and MCP server."""
+
+import json
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass(frozen=True, slots=True)
+class Session:
+    """An immutable snapshot of one iTerm2 session.
+
+    Fields that were not fetched, or that iTerm2 does not know, are None.
+    Listings leave out tty; is_active is only filled in by the MCP tools.
+    """
+
+    session_id: str
+    window_id: str | None = None
+    tab_id: str | None = None
+    name: str | None = None
+    hostname: str | None = None
+    username: str | None = None
+    path: str | None = None
+    tty: str | None = None
+    is_active: bool | None = None
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the record as a plain dictionary."""
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def to_json(self) -> str:
+        """Return the record as a JSON object."""
+        return json.dumps(self.to_dict())
@@ -0,0 +1,118 @@
+"""Session listings saved to disk."""
+
+import contextlib
+import json
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+from .paths import atomic_write_text, cache_dir
+from .session import Session
+
+# Bump when the file layout changes incompatibly; older files are ignored.
+FORMAT = 1
+
+# Name of the cached listing inside the cache directory
+CACHE_FILE = "sessions.json"
+
+# Seconds after which a cached listing is reported as stale
+STALE_AFTER = 60.0
+
+
+@dataclass(frozen=True, slots=True)
+class SavedListing:
+    """A session listing read back from disk."""
+
+    sessions: tuple[Session, ...]
+    version: str | None
+    saved_at: float
+
+    @property
+    def age(self) -> float:
+        """Seconds since the listing was saved."""
+        return max(0.0, time.time() - self.saved_at)
+
+    @property
+    def stale(self) -> bool:
+        """Whether the listing is older than STALE_AFTER."""
+        return self.age > STALE_AFTER
+
+
+def save_listing(
+    path: Path, sessions: Iterable[Session], version: str | None = None
+) -> None:
+    """Atomically write a listing.
+
+    Sessions are stored as rows under a single field header, which keeps the
+    file compact and quick to parse.
+
+    Args:
+        path: File to write
+        sessions: The listing
+        version: Layout version (TopologySnapshot etag) of the listing
+
+    Raises:
+        OSError: If the file cannot be written
+    """
+    fields = Session.__slots__
+    data = {
+        "format": FORMAT,
+        "version": version,
+        "saved_at": time.time(),
+        "fields": list(fields),
+        "sessions": [[getattr(s, f) for f in fields] for s in sessions],
+    }
+    atomic_write_text(path, json.dumps(data, separators=(",", ":")))
+
+
+def load_listing(path: Path) -> SavedListing | None:
+    """Read a listing written by save_listing.
+
+    Returns:
+        The listing, or None if the file is missing, unreadable or was
+        written in another format
+    """
+    try:
+        data = json.loads(path.read_text())
+        if data.get("format") != FORMAT:
+            return None
+        fields = data["fields"]
+        known = [f in Session.__slots__ for f in fields]
+        sessions = tuple(
+            Session(**{f: v for f, v, k in zip(fields, row, known, strict=True) if k})
+            for row in data["sessions"]
+        )
+        return SavedListing(
+            sessions=sessions,
+            version=data.get("version"),
+            saved_at=float(data["saved_at"]),
+        )
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def cache_path() -> Path:
+    """Return the file holding the cached listing."""
+    return cache_dir() / CACHE_FILE
+
+
+def cache_listing(sessions: Iterable[Session], version: str | None = None) -> None:
+    """Replace the cached listing, ignoring write errors.
+
+    Only complete listings should be cached: readers treat the cache as the
+    full set of sessions.
+    """
+    # The cache is an optimization; failing to write it must not fail the
+    # listing that produced it.
+    with contextlib.suppress(OSError):
+        save_listing(cache_path(), sessions, version)
+
+
+def load_cached_listing() -> SavedListing | None:
+    """Read the cached listing without contacting iTerm2.
+
+    Returns:
+        The listing, or None if nothing has been cached yet
+    """
+    return load_listing(cache_path())
@@ -0,0 +1,292 @@
+"""Immutable snapshots of the iTerm2 window/tab/session tree."""
+
+import asyncio
+import contextlib
+import hashlib
+import itertools
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import Any
+
+from iterm2.notifications import (
+    async_subscribe_to_layout_change_notification,
+    async_subscribe_to_new_session_notification,
+    async_subscribe_to_terminate_session_notification,
+    async_unsubscribe,
+)
+
+from .connection import ConnectionBound, async_connect
+from .rpc import rpc
+
+# Process-wide source of snapshot versions; later snapshots compare greater.
+_versions = itertools.count(1)
+
+# Seconds between layout fetches while waiting for a session, used only when
+# change notifications cannot be subscribed to
+WAIT_FALLBACK_INTERVAL = 0.5
+
+
+@dataclass(frozen=True, slots=True)
+class TopologySnapshot:
+    """The session tree of one app fetch, indexed for constant-time lookups.
+
+    Build a snapshot once per operation and pass it to the helpers that
+    accept one, so that a compound operation (find, then focus, then report)
+    walks the tree once.
+
+    The etag identifies the window/tab/session layout: two snapshots of the
+    same layout have the same etag, even across processes.
+    """
+
+    app: Any
+    version: int
+    etag: str
+    sessions: dict[str, tuple[Any, Any, Any]]
+    window_tabs: dict[str, tuple[Any, ...]]
+    tab_sessions: dict[str, tuple[Any, ...]]
+
+    @classmethod
+    def from_app(cls, app: Any, version: int | None = None) -> "TopologySnapshot":
+        """Index the app's terminal windows in a single walk.
+
+        Args:
+            app: The iTerm2 App
+            version: Version to record, or None to take the next one
+
+        Returns:
+            The new snapshot
+        """
+        sessions: dict[str, tuple[Any, Any, Any]] = {}
+        window_tabs: dict[str, tuple[Any, ...]] = {}
+        tab_sessions: dict[str, tuple[Any, ...]] = {}
+        layout = hashlib.blake2b(digest_size=8)
+
+        for window in app.terminal_windows:
+            window_tabs[window.window_id] = tuple(window.tabs)
+            layout.update(f"w{window.window_id}\0".encode())
+            for tab in window.tabs:
+                tab_sessions[tab.tab_id] = tuple(tab.sessions)
+                layout.update(f"t{tab.tab_id}\0".encode())
+                for session in tab.sessions:
+                    sessions[session.session_id] = (window, tab, session)
+                    layout.update(f"s{session.session_id}\0".encode())
+
+        return cls(
+            app=app,
+            version=next(_versions) if version is None else version,
+            etag=layout.hexdigest(),
+            sessions=sessions,
+            window_tabs=window_tabs,
+            tab_sessions=tab_sessions,
+        )
+
+    def find(self, session_id: str) -> tuple[Any, Any, Any] | None:
+        """Return the (window, tab, session) of a session, or None."""
+        return self.sessions.get(session_id)
+
+    def entries(self) -> Iterator[tuple[Any, Any, Any]]:
+        """Iterate over every (window, tab, session) in tree order."""
+        return iter(self.sessions.values())
+
+    def __contains__(self, session_id: object) -> bool:
+        return session_id in self.sessions
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+
+class TopologyTracker(ConnectionBound):
+    """Track layout changes so unchanged topologies need not be refetched.
+
+    While running, the tracker is subscribed to iTerm2's layout-change,
+    new-session and session-termination notifications and bumps its
+    generation on each one. A snapshot taken at the current generation is
+    reused by async_get_snapshot without any RPC.
+    """
+
+    def __init__(self) -> None:
+        """Initialize a stopped tracker."""
+        self.generation = 0
+        self._connection: Any | None = None
+        self._tokens: list[Any] = []
+        self._snapshot: TopologySnapshot | None = None
+        self._snapshot_generation = -1
+        self._waiters: set[asyncio.Future[None]] = set()
+
+    def cached(self) -> TopologySnapshot | None:
+        """Return the remembered snapshot if the layout has not changed."""
+        if self.running and self._snapshot_generation == self.generation:
+            return self._snapshot
+        return None
+
+    def remember(self, snapshot: TopologySnapshot, generation: int) -> None:
+        """Remember a snapshot taken when the generation was `generation`."""
+        if self.running:
+            self._snapshot = snapshot
+            self._snapshot_generation = generation
+
+    async def async_start(self, connection: Any) -> None:
+        """Subscribe to change notifications on the connection.
+
+        Does nothing if already running. Returns once subscribed, so no
+        change after this call is missed.
+
+        Raises:
+            Exception: If subscribing fails
+        """
+        if self.running:
+            return
+
+        async def changed(_connection: Any, _message: Any) -> None:
+            self._changed()
+
+        tokens = []
+        try:
+            for subscribe in (
+                async_subscribe_to_layout_change_notification,
+                async_subscribe_to_new_session_notification,
+                async_subscribe_to_terminate_session_notification,
+            ):
+                tokens.append(await rpc(subscribe(connection, changed)))
+        except BaseException:
+            await _unsubscribe_all(connection, tokens)
+            raise
+
+        self._connection = connection
+        self._tokens = tokens
+
+    async def async_stop(self) -> None:
+        """Unsubscribe and forget the remembered snapshot."""
+        connection, tokens = self._connection, self._tokens
+        self._disconnected()
+        if connection is not None:
+            await _unsubscribe_all(connection, tokens)
+
+    async def wait_for_change(self, timeout: float | None) -> bool:
+        """Wait until the generation moves or the timeout passes.
+
+        Returns:
+            True if a change was seen, False on timeout. When the tracker is
+            not running this simply sleeps for the timeout.
+        """
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.add(waiter)
+        try:
+            async with asyncio.timeout(timeout):
+                await waiter
+        except TimeoutError:
+            return False
+        finally:
+            self._waiters.discard(waiter)
+        return True
+
+    def _disconnected(self) -> None:
+        # Changes are no longer seen, so the snapshot cannot be trusted
+        self._connection = None
+        self._tokens = []
+        self._changed()
+
+    def _changed(self) -> None:
+        self.generation += 1
+        self._snapshot = None
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+
+async def _unsubscribe_all(connection: Any, tokens: list[Any]) -> None:
+    """Unsubscribe from notifications, ignoring a closed connection."""
+    for token in tokens:
+        with contextlib.suppress(Exception):
+            await async_unsubscribe(connection, token)
+
+
+topology_tracker = TopologyTracker()
+
+
+async def async_track_changes(snapshot: TopologySnapshot) -> bool:
+    """Start topology_tracker on the snapshot's connection if possible.
+
+    Returns:
+        Whether the tracker is running. On failure callers still work, they
+        just refetch the layout every time.
+    """
+    with contextlib.suppress(Exception):
+        await topology_tracker.async_start(snapshot.app.connection)
+    return topology_tracker.running
+
+
+async def async_get_snapshot(deadline: float | None = None) -> TopologySnapshot | None:
+    """Connect to iTerm2 and snapshot its session tree.
+
+    While topology_tracker is running and no layout change has been seen,
+    the previous snapshot is returned without contacting iTerm2.
+
+    Args:
+        deadline: Absolute event loop time to give up at, or None
+
+    Returns:
+        The snapshot, or None if no app instance is available
+
+    Raises:
+        TimeoutError: If the deadline passes while connecting
+        ITerm2UnavailableError: If the circuit breaker is open
+    """
+    cached = topology_tracker.cached()
+    if cached is not None:
+        return cached
+
+    # Read the generation first: a change arriving during the fetch must
+    # invalidate this snapshot.
+    generation = topology_tracker.generation
+    app = await async_connect(deadline)
+    if app is None:
+        return None
+    snapshot = TopologySnapshot.from_app(app)
+    topology_tracker.remember(snapshot, generation)
+    return snapshot
+
+
+async def async_wait_for_session(
+    session_id: str,
+    deadline: float | None = None,
+    snapshot: TopologySnapshot | None = None,
+) -> TopologySnapshot | None:
+    """Wait until a session exists.
+
+    topology_tracker is started on the snapshot's connection, and the
+    layout is fetched again over that connection only when a new-session or
+    layout-change notification arrives, so a session is seen the moment
+    iTerm2 announces it. If notifications cannot be subscribed to, the
+    layout is fetched every WAIT_FALLBACK_INTERVAL seconds instead.
+
+    Args:
+        session_id: The iTerm2 session ID
+        deadline: Absolute event loop time to give up at, or None
+        snapshot: Latest topology, or None to fetch one
+
+    Returns:
+        A snapshot containing the session, or None if no app instance is
+        available
+
+    Raises:
+        TimeoutError: If the deadline passes first
+        ITerm2UnavailableError: If the circuit breaker is open
+    """
+    async with asyncio.timeout_at(deadline):
+        if snapshot is None:
+            snapshot = await async_get_snapshot(deadline)
+        seen = topology_tracker.generation if topology_tracker.running else None
+        while snapshot is not None and session_id not in snapshot:
+            if seen is None:
+                # Fetch again once subscribed: the session may have appeared
+                # before the subscription took effect
+                if not await async_track_changes(snapshot):
+                    await asyncio.sleep(WAIT_FALLBACK_INTERVAL)
+            elif topology_tracker.generation == seen:
+                await topology_tracker.wait_for_change(None)
+            seen = topology_tracker.generation if topology_tracker.running else None
+            app = snapshot.app
+            await rpc(app.async_refresh())
+            snapshot = TopologySnapshot.from_app(app)
+        return snapshot
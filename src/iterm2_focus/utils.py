@@ -1,139 +1,371 @@
 """Utility functions for iterm2-focus."""
 
 import asyncio
-from typing import Any
+from collections.abc import AsyncGenerator, Iterable
+from contextlib import aclosing
+from typing import Any, Literal, overload
 
-from iterm2.app import async_get_app
-from iterm2.connection import Connection
+from .coalesce import single_flight
+from .errors import FocusTimeoutError
+from .focus import _activate
+from .rpc import deadline_after, gather_until, iter_until, rpc
+from .session import Session
+from .topology import TopologySnapshot, async_get_snapshot
 
+SessionOrder = Literal["completion", "tree"]
 
-async def get_session_info(session_id: str) -> dict[str, Any] | None:
+
+async def get_session_info(
+    session_id: str,
+    timeout: float | None = None,
+    snapshot: TopologySnapshot | None = None,
+) -> Session | None:
     """Get detailed information about a session.
 
+    Concurrent calls for the same session share a single lookup and receive
+    the same record.
+
     Args:
         session_id: The iTerm2 session ID
+        timeout: Seconds to wait before giving up, or None to wait forever
+        snapshot: Topology to look the session up in, or None to fetch one
 
     Returns:
-        Dictionary with session information or None if not found
+        Session record, or None if not found
+
+    Raises:
+        FocusTimeoutError: If the deadline passes
     """
-    connection: Any | None = None
+    version = snapshot.version if snapshot is not None else None
+    return await single_flight.do(
+        ("get_session_info", session_id, timeout, version),
+        lambda: _get_session_info(session_id, timeout, snapshot),
+    )
+
+
+async def _get_session_info(
+    session_id: str, timeout: float | None, snapshot: TopologySnapshot | None
+) -> Session | None:
+    """Look up a session and fetch its metadata."""
+    deadline = deadline_after(timeout)
 
     try:
-        connection = await Connection.async_create()
-        app = await async_get_app(connection)
-        if app is None:
+        snapshot = await _resolve_snapshot(snapshot, deadline)
+        if snapshot is None:
             return None
 
-        for window in app.terminal_windows:
-            for tab in window.tabs:
-                for session in tab.sessions:
-                    if session.session_id == session_id:
-                        name: str | None = await session.async_get_variable(
-                            "session.name"
-                        )
-                        hostname: str | None = await session.async_get_variable(
-                            "hostname"
-                        )
-                        username: str | None = await session.async_get_variable(
-                            "username"
-                        )
-                        path: str | None = await session.async_get_variable("path")
-                        tty: str | None = await session.async_get_variable("tty")
-
-                        return {
-                            "id": session_id,
-                            "name": name,
-                            "hostname": hostname,
-                            "username": username,
-                            "path": path,
-                            "tty": tty,
-                            "window_id": window.window_id,
-                            "tab_id": tab.tab_id,
-                        }
-        return None
+        entry = snapshot.find(session_id)
+        if entry is None:
+            return None
+        async with asyncio.timeout_at(deadline):
+            return await _session_details(*entry)
+    except TimeoutError as e:
+        raise FocusTimeoutError(timeout) from e
     finally:
         # Connection will be closed automatically
         pass
 
 
-async def focus_session_by_name(name_pattern: str) -> bool:
+async def sessions_exist(
+    session_ids: Iterable[str],
+    timeout: float | None = None,
+    snapshot: TopologySnapshot | None = None,
+) -> dict[str, bool]:
+    """Check which of many sessions are still alive.
+
+    The session tree is read once and each ID is checked with a set lookup,
+    so no per-session metadata is fetched.
+
+    Args:
+        session_ids: iTerm2 session IDs to check
+        timeout: Seconds to wait before giving up, or None to wait forever
+        snapshot: Topology to check against, or None to fetch one
+
+    Returns:
+        Dictionary mapping each ID to whether the session exists
+
+    Raises:
+        FocusTimeoutError: If the deadline passes
+    """
+    deadline = deadline_after(timeout)
+
+    try:
+        snapshot = await _resolve_snapshot(snapshot, deadline)
+    except TimeoutError as e:
+        raise FocusTimeoutError(timeout) from e
+    if snapshot is None:
+        return dict.fromkeys(session_ids, False)
+    return {session_id: session_id in snapshot for session_id in session_ids}
+
+
+async def get_sessions_info(
+    session_ids: Iterable[str],
+    timeout: float | None = None,
+    snapshot: TopologySnapshot | None = None,
+) -> dict[str, Session | None]:
+    """Get detailed information about many sessions.
+
+    The session tree is read once; metadata is then fetched concurrently,
+    and only for the sessions that exist.
+
+    Args:
+        session_ids: iTerm2 session IDs to look up
+        timeout: Seconds to wait before giving up, or None to wait forever
+        snapshot: Topology to look the sessions up in, or None to fetch one
+
+    Returns:
+        Dictionary mapping each ID to its Session record, or None if the
+        session was not found
+
+    Raises:
+        FocusTimeoutError: If the deadline passes
+    """
+    deadline = deadline_after(timeout)
+    infos: dict[str, Session | None] = dict.fromkeys(session_ids)
+
+    try:
+        snapshot = await _resolve_snapshot(snapshot, deadline)
+        if snapshot is None:
+            return infos
+
+        live = [session_id for session_id in infos if session_id in snapshot]
+        async with asyncio.timeout_at(deadline):
+            details = await asyncio.gather(
+                *(_session_details(*snapshot.sessions[sid]) for sid in live)
+            )
+        infos.update(zip(live, details, strict=True))
+        return infos
+    except TimeoutError as e:
+        raise FocusTimeoutError(timeout) from e
+
+
+async def focus_session_by_name(
+    name_pattern: str,
+    timeout: float | None = None,
+    snapshot: TopologySnapshot | None = None,
+    record: bool = True,
+) -> bool:
     """Focus a session by name pattern (partial match).
 
     Args:
         name_pattern: Pattern to search in session names (case-insensitive)
+        timeout: Seconds to wait before giving up, or None to wait forever
+        snapshot: Topology to search, or None to fetch one
+        record: Add the focus to the focus history and frecency database
 
     Returns:
         True if a matching session was found and focused, False otherwise
+
+    Raises:
+        FocusTimeoutError: If the deadline passes
     """
-    connection: Any | None = None
+    deadline = deadline_after(timeout)
 
     try:
-        connection = await Connection.async_create()
-        app = await async_get_app(connection)
-        if app is None:
+        snapshot = await _resolve_snapshot(snapshot, deadline)
+        if snapshot is None:
             return False
 
-        name_lower = name_pattern.lower()
-
-        for window in app.terminal_windows:
-            for tab in window.tabs:
-                for session in tab.sessions:
-                    session_name: str | None = await session.async_get_variable(
-                        "session.name"
-                    )
-                    if session_name and name_lower in session_name.lower():
-                        await session.async_activate()
-                        await tab.async_select()
-                        await window.async_activate()
-                        return True
-
-        return False
+        async with asyncio.timeout_at(deadline):
+            name_lower = name_pattern.lower()
+
+            for window, tab, session in snapshot.entries():
+                session_name: str | None = await rpc(
+                    session.async_get_variable("session.name")
+                )
+                if session_name and name_lower in session_name.lower():
+                    await _activate(window, tab, session, record=record)
+                    return True
+
+            return False
+    except TimeoutError as e:
+        raise FocusTimeoutError(timeout) from e
     finally:
         # Connection will be closed automatically
         pass
 
 
-async def get_all_sessions() -> list[dict[str, Any]]:
+@overload
+async def get_all_sessions(
+    timeout: float | None = None,
+    snapshot: TopologySnapshot | None = None,
+    if_changed_since: None = None,
+) -> list[Session]: ...
+
+
+@overload
+async def get_all_sessions(
+    timeout: float | None,
+    snapshot: TopologySnapshot | None,
+    if_changed_since: str | None,
+) -> list[Session] | None: ...
+
+
+@overload
+async def get_all_sessions(
+    timeout: float | None = None,
+    snapshot: TopologySnapshot | None = None,
+    *,
+    if_changed_since: str | None,
+) -> list[Session] | None: ...
+
+
+async def get_all_sessions(
+    timeout: float | None = None,
+    snapshot: TopologySnapshot | None = None,
+    if_changed_since: str | None = None,
+) -> list[Session] | None:
     """Get information about all sessions.
 
+    Metadata for all sessions is fetched concurrently. Concurrent calls share
+    a single walk of the session tree and receive the same list.
+
+    Args:
+        timeout: Seconds to wait before giving up, or None to wait forever.
+            Sessions whose metadata has not arrived by the deadline are left
+            out, so a partial list may be returned.
+        snapshot: Topology to list, or None to fetch one
+        if_changed_since: Etag of a TopologySnapshot seen earlier. If the
+            layout still matches it, no metadata is fetched. Checking the
+            layout and listing it share the one timeout.
+
     Returns:
-        List of dictionaries with session information
+        List of Session records (without tty), or None if the layout still
+        matches if_changed_since (only ever None when it is given)
+
+    Raises:
+        FocusTimeoutError: If the deadline passes before iTerm2 answers at all
     """
-    connection: Any | None = None
+    deadline = deadline_after(timeout)
+    if if_changed_since is not None:
+        try:
+            snapshot = await _resolve_snapshot(snapshot, deadline)
+        except TimeoutError as e:
+            raise FocusTimeoutError(timeout) from e
+        if snapshot is not None and snapshot.etag == if_changed_since:
+            return None
+
+    version = snapshot.version if snapshot is not None else None
+    return await single_flight.do(
+        ("get_all_sessions", timeout, version),
+        lambda: _get_all_sessions(timeout, snapshot, deadline),
+    )
+
+
+async def iter_sessions(
+    order: SessionOrder = "completion",
+    timeout: float | None = None,
+    snapshot: TopologySnapshot | None = None,
+) -> AsyncGenerator[Session, None]:
+    """Yield information about each session as soon as it is fetched.
+
+    Unlike get_all_sessions, the first records are available before the
+    slowest session has answered. Breaking out of the loop cancels the
+    metadata requests still in flight; use contextlib.aclosing to have that
+    happen immediately rather than when the generator is garbage collected.
+
+    Args:
+        order: "completion" to yield sessions as their metadata arrives, or
+            "tree" to yield them in window/tab order
+        timeout: Seconds to wait before giving up, or None to wait forever.
+            Iteration stops at the deadline.
+        snapshot: Topology to list, or None to fetch one
+
+    Yields:
+        Session records, as from get_all_sessions
+
+    Raises:
+        FocusTimeoutError: If the deadline passes before iTerm2 answers at all
+    """
+    deadline = deadline_after(timeout)
 
     try:
-        connection = await Connection.async_create()
-        app = await async_get_app(connection)
-        if app is None:
+        snapshot = await _resolve_snapshot(snapshot, deadline)
+    except TimeoutError as e:
+        raise FocusTimeoutError(timeout) from e
+    if snapshot is None:
+        return
+
+    summaries = iter_until(
+        (_session_summary(*entry) for entry in snapshot.entries()),
+        deadline,
+        ordered=order == "tree",
+    )
+    async with aclosing(summaries):
+        async for summary in summaries:
+            yield summary
+
+
+async def _get_all_sessions(
+    timeout: float | None, snapshot: TopologySnapshot | None, deadline: float | None
+) -> list[Session]:
+    """Fetch metadata for every session in the topology."""
+    try:
+        try:
+            snapshot = await _resolve_snapshot(snapshot, deadline)
+        except TimeoutError as e:
+            raise FocusTimeoutError(timeout) from e
+        if snapshot is None:
             return []
 
-        sessions: list[dict[str, Any]] = []
-
-        for window in app.terminal_windows:
-            for tab in window.tabs:
-                for session in tab.sessions:
-                    name: str | None = await session.async_get_variable("session.name")
-                    hostname: str | None = await session.async_get_variable("hostname")
-                    username: str | None = await session.async_get_variable("username")
-                    path: str | None = await session.async_get_variable("path")
-
-                    sessions.append(
-                        {
-                            "id": session.session_id,
-                            "name": name or "Unnamed",
-                            "window_id": window.window_id,
-                            "tab_id": tab.tab_id,
-                            "hostname": hostname,
-                            "username": username,
-                            "path": path,
-                        }
-                    )
-        return sessions
+        results = await gather_until(
+            (_session_summary(*entry) for entry in snapshot.entries()), deadline
+        )
+        return [summary for summary in results if summary is not None]
     finally:
         # Connection will be closed automatically
         pass
 
 
+async def _session_summary(window: Any, tab: Any, session: Any) -> Session:
+    """Fetch the listing metadata of one session."""
+    name, hostname, username, path = await asyncio.gather(
+        rpc(session.async_get_variable("session.name")),
+        rpc(session.async_get_variable("hostname")),
+        rpc(session.async_get_variable("username")),
+        rpc(session.async_get_variable("path")),
+    )
+    return Session(
+        session_id=session.session_id,
+        window_id=window.window_id,
+        tab_id=tab.tab_id,
+        name=name,
+        hostname=hostname,
+        username=username,
+        path=path,
+    )
+
+
+async def _resolve_snapshot(
+    snapshot: TopologySnapshot | None, deadline: float | None
+) -> TopologySnapshot | None:
+    """Return the caller's snapshot, or take a new one."""
+    if snapshot is not None:
+        return snapshot
+    return await async_get_snapshot(deadline)
+
+
+async def _session_details(window: Any, tab: Any, session: Any) -> Session:
+    """Fetch the detailed metadata of one session."""
+    name, hostname, username, path, tty = await asyncio.gather(
+        rpc(session.async_get_variable("session.name")),
+        rpc(session.async_get_variable("hostname")),
+        rpc(session.async_get_variable("username")),
+        rpc(session.async_get_variable("path")),
+        rpc(session.async_get_variable("tty")),
+    )
+    return Session(
+        session_id=session.session_id,
+        window_id=window.window_id,
+        tab_id=tab.tab_id,
+        name=name,
+        hostname=hostname,
+        username=username,
+        path=path,
+        tty=tty,
+    )
+
+
 def run_async(coro: Any) -> Any:
     """Run an async coroutine in a sync context.
 
@@ -0,0 +1,122 @@
+"""Stream session list changes as they happen."""
+
+import contextlib
+from collections.abc import AsyncGenerator
+from pathlib import Path
+from typing import Any
+
+from iterm2.focus import FocusMonitor, FocusUpdateWindowChanged
+
+from .diff import SessionDiff, diff_sessions
+from .errors import FocusError, FocusTimeoutError
+from .frecency import record_visit
+from .history import load_history, save_history
+from .rpc import deadline_after
+from .session import Session
+from .store import save_listing
+from .topology import async_get_snapshot, async_track_changes, topology_tracker
+from .utils import get_all_sessions
+
+# Seconds between polls for changes iTerm2 sends no notification for
+DEFAULT_WATCH_INTERVAL = 2.0
+
+
+async def watch_sessions(
+    interval: float = DEFAULT_WATCH_INTERVAL,
+    timeout: float | None = None,
+    save_to: Path | None = None,
+) -> AsyncGenerator[SessionDiff, None]:
+    """Yield what changed each time the session list changes.
+
+    The first event reports every existing session as added. Sessions being
+    created, closed or moved are reported as soon as iTerm2 announces the
+    layout change; renames and other metadata changes are picked up by
+    polling every `interval` seconds.
+
+    Args:
+        interval: Seconds between polls
+        timeout: Seconds each listing may take, or None to wait forever.
+            A listing that misses sessions by then is skipped, not reported.
+        save_to: File to keep the latest listing in (see store.save_listing),
+            rewritten on every complete poll so its age shows it is current.
+            Write errors are ignored.
+
+    Yields:
+        A non-empty SessionDiff per change
+
+    Raises:
+        FocusTimeoutError: If a listing does not finish in time
+        FocusError: If iTerm2 cannot be reached
+    """
+    previous: list[Session] = []
+
+    while True:
+        try:
+            snapshot = await async_get_snapshot(deadline_after(timeout))
+        except TimeoutError as e:
+            raise FocusTimeoutError(timeout) from e
+        if snapshot is None:
+            raise FocusError("Failed to get iTerm2 app instance.")
+        await async_track_changes(snapshot)
+
+        sessions = await get_all_sessions(timeout, snapshot=snapshot)
+        # A partial listing would report the missing sessions as removed, so
+        # it counts as a timed-out poll and is retried on the next one
+        if len(sessions) < len(snapshot.sessions):
+            await topology_tracker.wait_for_change(interval)
+            continue
+        if save_to is not None:
+            with contextlib.suppress(OSError):
+                save_listing(save_to, sessions, snapshot.etag)
+        delta = diff_sessions(previous, sessions)
+        if delta:
+            yield delta
+        previous = sessions
+
+        await topology_tracker.wait_for_change(interval)
+
+
+async def record_focus_changes(app: Any, path: Path | None = None) -> None:
+    """Record every session that gains keyboard focus.
+
+    Each focus is added to the focus history and counted in the frecency
+    database. Runs until cancelled. The files are re-read for each change,
+    so visits recorded by other processes in the meantime are kept.
+
+    Args:
+        app: The iTerm2 App whose connection is monitored
+        path: History file, or None for history.history_path()
+    """
+    async with FocusMonitor(app.connection) as monitor:
+        while True:
+            update = await monitor.async_get_next_update()
+            session_id = _focused_session_id(app, update)
+            if session_id is None:
+                continue
+            history = load_history(path)
+            history.record(session_id)
+            with contextlib.suppress(OSError):
+                save_history(history, path)
+            record_visit(session_id)
+
+
+def _focused_session_id(app: Any, update: Any) -> str | None:
+    """Return the session a focus update moved keyboard focus to, if any."""
+    if update.active_session_changed is not None:
+        return str(update.active_session_changed.session_id)
+
+    # Switching tabs or windows only names the tab or window; the App is kept
+    # up to date by notifications, so its current session is the new one.
+    tab = None
+    if update.selected_tab_changed is not None:
+        tab = app.get_tab_by_id(update.selected_tab_changed.tab_id)
+    elif (
+        update.window_changed is not None
+        and update.window_changed.event
+        == FocusUpdateWindowChanged.Reason.TERMINAL_WINDOW_BECAME_KEY
+    ):
+        window = app.get_window_by_id(update.window_changed.window_id)
+        tab = window.current_tab if window is not None else None
+
+    session = tab.current_session if tab is not None else None
+    return str(session.session_id) if session is not None else None
@@ -1,8 +1,20 @@
 """Pytest configuration for iterm2-focus tests."""
 
+from collections.abc import Callable, Iterator
+from contextlib import AbstractAsyncContextManager
+from pathlib import Path
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock
+
 import pytest
 from pytest_mock import MockerFixture
 
+# Builds an app from session IDs mapped to their variables; see make_app
+AppFactory = Callable[[dict[str, dict[str, Any]]], MagicMock]
+
+# Opens a client session to the MCP server; see client_session
+ClientFactory = Callable[[], AbstractAsyncContextManager[Any]]
+
 # Check if MCP is available
 try:
     from mcp.shared.memory import create_connected_server_and_client_session
@@ -50,14 +62,13 @@ if MCP_TEST_AVAILABLE:
         mock_tab.tab_id = "t0"
         mock_tab.async_select = mocker.AsyncMock()
 
-        # Mock Session with Profile object
-        mock_profile = mocker.MagicMock()
-        mock_profile.name = "Session Name"
-
+        # Mock Session
         mock_session = mocker.MagicMock()
         mock_session.session_id = "w0t0p0:12345678-1234-1234-1234-123456789012"
         mock_session.async_activate = mocker.AsyncMock()
-        mock_session.async_get_profile = mocker.AsyncMock(return_value=mock_profile)
+        mock_session.async_get_variable = mocker.AsyncMock(
+            side_effect=lambda var: {"session.name": "Session Name"}.get(var)
+        )
 
         # Wire up the relationships
         mock_tab.sessions = [mock_session]
@@ -69,12 +80,8 @@ if MCP_TEST_AVAILABLE:
         mock_app.current_terminal_window = mock_window
 
         # Patch the individual imports in iterm_tools
-        mocker.patch(
-            "iterm2_focus.mcp.tools.iterm_tools.Connection", mock_connection_class
-        )
-        mocker.patch(
-            "iterm2_focus.mcp.tools.iterm_tools.async_get_app", mock_async_get_app
-        )
+        mocker.patch("iterm2_focus.connection.Connection", mock_connection_class)
+        mocker.patch("iterm2_focus.connection.async_get_app", mock_async_get_app)
 
         return mocker.MagicMock(
             Connection=mock_connection_class,
@@ -105,6 +112,63 @@ if MCP_TEST_AVAILABLE:
         return _client_session
 
 
+@pytest.fixture
+def make_app() -> AppFactory:
+    """Return a builder of apps with one tab of sessions.
+
+    The builder takes a mapping of session ID to the session's variables;
+    each session answers async_get_variable from its mapping.
+    """
+
+    def build(variables: dict[str, dict[str, Any]]) -> MagicMock:
+        sessions = []
+        for session_id, values in variables.items():
+            session = MagicMock()
+            session.session_id = session_id
+            session.async_activate = AsyncMock()
+            session.async_get_variable = AsyncMock(side_effect=values.get)
+            sessions.append(session)
+        tab = MagicMock()
+        tab.tab_id = "tab1"
+        tab.sessions = sessions
+        tab.async_select = AsyncMock()
+        window = MagicMock()
+        window.window_id = "window1"
+        window.tabs = [tab]
+        window.async_activate = AsyncMock()
+        app = MagicMock()
+        app.terminal_windows = [window]
+        return app
+
+    return build
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[None]:
+    """Keep persisted state in a per-test cache directory.
+
+    Also resets the process-wide circuit breaker, topology tracker and
+    session indexes so state from one test cannot leak into the next.
+    """
+    from iterm2_focus.connection import circuit_breaker
+    from iterm2_focus.jobindex import job_monitor
+    from iterm2_focus.pathindex import path_index
+    from iterm2_focus.procindex import process_monitor
+    from iterm2_focus.scrollback import scrollback_index
+    from iterm2_focus.topology import topology_tracker
+
+    monkeypatch.setenv("ITERM2_FOCUS_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr("iterm2_focus.history._origin_recorded", False)
+    circuit_breaker.reset()
+    yield
+    circuit_breaker.reset()
+    topology_tracker._disconnected()
+    path_index._disconnected()
+    process_monitor._disconnected()
+    job_monitor._disconnected()
+    scrollback_index._disconnected()
+
+
 @pytest.fixture(autouse=True)
 def mock_iterm2(mocker: MockerFixture, request):
     """Mock iTerm2 API for testing without real iTerm2.
@@ -157,8 +221,8 @@ def mock_iterm2(mocker: MockerFixture, request):
     mock_session = mocker.MagicMock()
     mock_session.session_id = "w0t0p0:12345678-1234-1234-1234-123456789012"
     mock_session.async_activate = mocker.AsyncMock()
-    mock_session.async_get_profile = mocker.AsyncMock(
-        return_value=mocker.MagicMock(name="Session Name")
+    mock_session.async_get_variable = mocker.AsyncMock(
+        side_effect=lambda var: {"session.name": "Session Name"}.get(var)
     )
 
     # Wire up the relationships
@@ -171,7 +235,7 @@ def mock_iterm2(mocker: MockerFixture, request):
     mock_app.current_terminal_window = mock_window
 
     # Patch the individual imports in cli module
-    mocker.patch("iterm2_focus.cli.Connection", mock_connection_class)
-    mocker.patch("iterm2_focus.cli.async_get_app", mock_async_get_app)
+    mocker.patch("iterm2_focus.connection.Connection", mock_connection_class)
+    mocker.patch("iterm2_focus.connection.async_get_app", mock_async_get_app)
 
     yield mock_connection_class
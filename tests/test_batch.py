@@ -0,0 +1,110 @@
+"""Tests for batch module."""
+
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from iterm2_focus.batch import run_batch
+
+
+def _mock_app() -> MagicMock:
+    """Build an app with two sessions in one window."""
+    sessions = []
+    for session_id, name in [("session1", "Build Server"), ("session2", "Editor")]:
+        session = MagicMock()
+        session.session_id = session_id
+        session.async_activate = AsyncMock()
+        session.async_get_variable = AsyncMock(
+            side_effect=lambda var, name=name: {
+                "session.name": name,
+                "hostname": "localhost",
+                "username": "user",
+                "path": "/home/user",
+                "tty": "/dev/ttys001",
+            }.get(var)
+        )
+        sessions.append(session)
+
+    tab = MagicMock()
+    tab.tab_id = "tab1"
+    tab.sessions = sessions
+    tab.async_select = AsyncMock()
+
+    window = MagicMock()
+    window.window_id = "window1"
+    window.tabs = [tab]
+    window.async_activate = AsyncMock()
+
+    app = MagicMock()
+    app.terminal_windows = [window]
+    return app
+
+
+async def _collect(lines: list[str]) -> list[dict[str, Any]]:
+    return [result async for result in run_batch(lines)]
+
+
+@pytest.mark.asyncio
+async def test_batch_runs_commands_over_one_connection() -> None:
+    """Test all commands share a single connection and app snapshot."""
+    app = _mock_app()
+    mock_create = AsyncMock()
+
+    with (
+        patch("iterm2_focus.connection.Connection.async_create", mock_create),
+        patch("iterm2_focus.connection.async_get_app", AsyncMock(return_value=app)),
+    ):
+        results = await _collect(
+            [
+                "exists session1\n",
+                "exists missing\n",
+                "\n",
+                "# comment\n",
+                "info w0t0p1:session2\n",
+                "find build\n",
+                "list\n",
+                "focus session2\n",
+            ]
+        )
+
+    mock_create.assert_awaited_once()
+    assert [r["line"] for r in results] == [1, 2, 5, 6, 7, 8]
+    assert all(r["ok"] for r in results)
+    assert results[0]["exists"] is True
+    assert results[1]["exists"] is False
+    assert results[2]["session"]["name"] == "Editor"
+    assert results[2]["session"]["tty"] == "/dev/ttys001"
+    assert [s["session_id"] for s in results[3]["sessions"]] == ["session1"]
+    assert [s["session_id"] for s in results[4]["sessions"]] == ["session1", "session2"]
+    assert results[5]["focused"] is True
+    session2 = app.terminal_windows[0].tabs[0].sessions[1]
+    session2.async_activate.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_batch_reports_invalid_commands() -> None:
+    """Test malformed lines produce error records without connecting."""
+    mock_create = AsyncMock()
+
+    with patch("iterm2_focus.connection.Connection.async_create", mock_create):
+        results = await _collect(["frobnicate x", "focus", "find"])
+
+    assert [r["ok"] for r in results] == [False, False, False]
+    assert results[0]["error"] == "Unknown command: frobnicate"
+    assert results[1]["error"] == "Missing session ID"
+    assert results[2]["error"] == "Missing name pattern"
+    mock_create.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_batch_reports_connection_failure() -> None:
+    """Test a connection failure is reported per command."""
+    with patch(
+        "iterm2_focus.connection.Connection.async_create",
+        AsyncMock(side_effect=ConnectionRefusedError("refused")),
+    ):
+        results = await _collect(["focus session1", "list"])
+
+    assert [r["ok"] for r in results] == [False, False]
+    assert "Failed to connect to iTerm2" in results[0]["error"]
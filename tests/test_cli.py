@@ -1,14 +1,34 @@
 """Tests for CLI module."""
 
+import asyncio
 import os
-from unittest.mock import patch
+import subprocess
+import sys
+import time
+from collections.abc import AsyncIterator, Callable, Coroutine, Iterable
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+from click.shell_completion import ShellComplete
 from click.testing import CliRunner
 
 from iterm2_focus import __version__
 from iterm2_focus.cli import main
 from iterm2_focus.focus import FocusError
+from iterm2_focus.frecency import FrecencyStore, load_frecency, save_frecency
+from iterm2_focus.history import FocusHistory, load_history, save_history
+from iterm2_focus.search import Match
+from iterm2_focus.session import Session
+from iterm2_focus.store import (
+    cache_listing,
+    load_cached_listing,
+    load_listing,
+    save_listing,
+)
+from tests.conftest import skip_if_no_mcp
 
 
 @pytest.fixture
@@ -17,6 +37,20 @@ def runner() -> CliRunner:
     return CliRunner()
 
 
+def _fake_run(
+    result: Any = None, error: BaseException | type[BaseException] | None = None
+) -> Callable[[Coroutine[Any, Any, Any]], Any]:
+    """Stand in for asyncio.run, closing the coroutine instead of running it."""
+
+    def run(coro: Coroutine[Any, Any, Any]) -> Any:
+        coro.close()
+        if error is not None:
+            raise error
+        return result
+
+    return run
+
+
 def test_version(runner: CliRunner) -> None:
     """Test --version flag."""
     result = runner.invoke(main, ["--version"])
@@ -41,7 +75,7 @@ def test_no_arguments(runner: CliRunner) -> None:
 
 def test_focus_session_success(runner: CliRunner) -> None:
     """Test successful session focus."""
-    with patch("iterm2_focus.cli.focus_session", return_value=True):
+    with patch("iterm2_focus.commands.focus_session", return_value=True):
         result = runner.invoke(main, ["test_session_id"])
 
     assert result.exit_code == 0
@@ -50,7 +84,7 @@ def test_focus_session_success(runner: CliRunner) -> None:
 
 def test_focus_session_quiet(runner: CliRunner) -> None:
     """Test quiet mode."""
-    with patch("iterm2_focus.cli.focus_session", return_value=True):
+    with patch("iterm2_focus.commands.focus_session", return_value=True):
         result = runner.invoke(main, ["test_session_id", "--quiet"])
 
     assert result.exit_code == 0
@@ -59,7 +93,7 @@ def test_focus_session_quiet(runner: CliRunner) -> None:
 
 def test_focus_session_not_found(runner: CliRunner) -> None:
     """Test session not found."""
-    with patch("iterm2_focus.cli.focus_session", return_value=False):
+    with patch("iterm2_focus.commands.focus_session", return_value=False):
         result = runner.invoke(main, ["test_session_id"])
 
     assert result.exit_code == 1
@@ -69,7 +103,8 @@ def test_focus_session_not_found(runner: CliRunner) -> None:
 def test_focus_session_error(runner: CliRunner) -> None:
     """Test focus error."""
     with patch(
-        "iterm2_focus.cli.focus_session", side_effect=FocusError("Connection failed")
+        "iterm2_focus.commands.focus_session",
+        side_effect=FocusError("Connection failed"),
     ):
         result = runner.invoke(main, ["test_session_id"])
 
@@ -84,7 +119,7 @@ def test_current_session_with_env(runner: CliRunner) -> None:
 
     with (
         patch.dict(os.environ, {"ITERM_SESSION_ID": test_session_id}),
-        patch("iterm2_focus.cli.focus_session", return_value=True),
+        patch("iterm2_focus.commands.focus_session", return_value=True),
     ):
         result = runner.invoke(main, ["--current"])
 
@@ -136,27 +171,29 @@ def test_get_current_without_env(runner: CliRunner) -> None:
 def test_list_sessions_success(runner: CliRunner) -> None:
     """Test listing sessions."""
     mock_sessions = [
-        {
-            "id": "session1",
-            "name": "Test Session 1",
-            "window": "window1",
-            "tab": "tab1",
-            "hostname": "localhost",
-            "username": "user",
-            "path": "/home/user",
-        },
-        {
-            "id": "session2",
-            "name": "Test Session 2",
-            "window": "window1",
-            "tab": "tab2",
-            "hostname": "remote.host",
-            "username": "user",
-            "path": "/var/www",
-        },
+        Session(
+            session_id="session1",
+            name="Test Session 1",
+            window_id="window1",
+            tab_id="tab1",
+            hostname="localhost",
+            username="user",
+            path="/home/user",
+        ),
+        Session(
+            session_id="session2",
+            name="Test Session 2",
+            window_id="window1",
+            tab_id="tab2",
+            hostname="remote.host",
+            username="user",
+            path="/var/www",
+        ),
     ]
 
-    with patch("iterm2_focus.cli.asyncio.run", return_value=mock_sessions):
+    with patch(
+        "iterm2_focus.commands.asyncio.run", side_effect=_fake_run(mock_sessions)
+    ):
         result = runner.invoke(main, ["--list"])
 
     assert result.exit_code == 0
@@ -169,7 +206,7 @@ def test_list_sessions_success(runner: CliRunner) -> None:
 
 def test_list_sessions_empty(runner: CliRunner) -> None:
     """Test listing sessions when none found."""
-    with patch("iterm2_focus.cli.asyncio.run", return_value=[]):
+    with patch("iterm2_focus.commands.asyncio.run", side_effect=_fake_run([])):
         result = runner.invoke(main, ["--list"])
 
     assert result.exit_code == 0
@@ -179,7 +216,8 @@ def test_list_sessions_empty(runner: CliRunner) -> None:
 def test_list_sessions_error(runner: CliRunner) -> None:
     """Test listing sessions error."""
     with patch(
-        "iterm2_focus.cli.asyncio.run", side_effect=Exception("Connection failed")
+        "iterm2_focus.commands.asyncio.run",
+        side_effect=_fake_run(error=Exception("Connection failed")),
     ):
         result = runner.invoke(main, ["--list"])
 
@@ -189,10 +227,10 @@ def test_list_sessions_error(runner: CliRunner) -> None:
 
 def test_focus_session_with_prefix(runner: CliRunner) -> None:
     """Test handling session ID with prefix format."""
-    with patch("iterm2_focus.cli.focus_session", return_value=True) as mock_focus:
+    with patch("iterm2_focus.commands.focus_session", return_value=True) as mock_focus:
         result = runner.invoke(main, ["w0t5p1:test_session_id"])
 
-    mock_focus.assert_called_once_with("test_session_id")
+    mock_focus.assert_called_once_with("test_session_id", timeout=None, wait=False)
     assert result.exit_code == 0
     assert "Focused session: test_session_id" in result.output
 
@@ -201,11 +239,11 @@ def test_current_session_with_prefix(runner: CliRunner) -> None:
     """Test --current with prefixed ITERM_SESSION_ID."""
     with (
         patch.dict(os.environ, {"ITERM_SESSION_ID": "w0t5p1:test_session_id"}),
-        patch("iterm2_focus.cli.focus_session", return_value=True) as mock_focus,
+        patch("iterm2_focus.commands.focus_session", return_value=True) as mock_focus,
     ):
         result = runner.invoke(main, ["--current"])
 
-    mock_focus.assert_called_once_with("test_session_id")
+    mock_focus.assert_called_once_with("test_session_id", timeout=None, wait=False)
     assert result.exit_code == 0
     assert "Focused session: test_session_id" in result.output
 
@@ -222,29 +260,31 @@ def test_get_current_with_prefix(runner: CliRunner) -> None:
 def test_list_sessions_without_path(runner: CliRunner) -> None:
     """Test listing sessions where some have no path."""
     mock_sessions = [
-        {
-            "id": "session1",
-            "name": "Session with path",
-            "window": "window1",
-            "tab": "tab1",
-            "hostname": "localhost",
-            "username": "user",
-            "path": "/home/user",
-            "tty": "/dev/ttys001",
-        },
-        {
-            "id": "session2",
-            "name": "Session without path",
-            "window": "window1",
-            "tab": "tab2",
-            "hostname": "localhost",
-            "username": "user",
-            "path": None,  # No path
-            "tty": "/dev/ttys002",
-        },
+        Session(
+            session_id="session1",
+            name="Session with path",
+            window_id="window1",
+            tab_id="tab1",
+            hostname="localhost",
+            username="user",
+            path="/home/user",
+            tty="/dev/ttys001",
+        ),
+        Session(
+            session_id="session2",
+            name="Session without path",
+            window_id="window1",
+            tab_id="tab2",
+            hostname="localhost",
+            username="user",
+            path=None,  # No path
+            tty="/dev/ttys002",
+        ),
     ]
 
-    with patch("iterm2_focus.cli.asyncio.run", return_value=mock_sessions):
+    with patch(
+        "iterm2_focus.commands.asyncio.run", side_effect=_fake_run(mock_sessions)
+    ):
         result = runner.invoke(main, ["--list"])
 
     assert result.exit_code == 0
@@ -260,3 +300,603 @@ def test_list_sessions_without_path(runner: CliRunner) -> None:
         "Path:" in lines[i]
         for i in range(session2_index, min(session2_index + 5, len(lines)))
     )
+
+
+@skip_if_no_mcp
+def test_mcp_http_transport_options(runner: CliRunner) -> None:
+    """Test --mcp with HTTP transport options."""
+    with (
+        patch("iterm2_focus.commands.MCP_AVAILABLE", True),
+        patch("iterm2_focus.mcp.__main__.main") as mock_mcp_main,
+    ):
+        result = runner.invoke(
+            main,
+            [
+                "--mcp",
+                "--mcp-transport",
+                "streamable-http",
+                "--mcp-port",
+                "9000",
+                "--mcp-client-concurrency",
+                "2",
+            ],
+        )
+
+    assert result.exit_code == 0
+    mock_mcp_main.assert_called_once_with(
+        "streamable-http", port=9000, client_concurrency=2
+    )
+
+
+def test_focus_session_timeout(runner: CliRunner) -> None:
+    """Test --timeout is passed through and reported."""
+    from iterm2_focus.focus import FocusTimeoutError
+
+    with patch(
+        "iterm2_focus.commands.focus_session", side_effect=FocusTimeoutError(0.5)
+    ) as mock_focus:
+        result = runner.invoke(main, ["test_session_id", "--timeout", "0.5"])
+
+    mock_focus.assert_called_once_with("test_session_id", timeout=0.5, wait=False)
+    assert result.exit_code == 1
+    assert "Error: Timed out after 0.5 seconds" in result.output
+
+
+def test_focus_session_wait(runner: CliRunner) -> None:
+    """Test --wait waits for the session, up to its own value or --timeout."""
+    from iterm2_focus.focus import FocusTimeoutError
+
+    with patch("iterm2_focus.commands.focus_session", return_value=True) as mock_focus:
+        bare = runner.invoke(main, ["test_session_id", "--wait", "-t", "9"])
+        limited = runner.invoke(main, ["test_session_id", "--wait", "3"])
+
+    assert bare.exit_code == 0
+    assert limited.exit_code == 0
+    assert mock_focus.call_args_list[0].kwargs == {"timeout": 9.0, "wait": True}
+    assert mock_focus.call_args_list[1].kwargs == {"timeout": 3.0, "wait": True}
+
+    with patch(
+        "iterm2_focus.commands.focus_session", side_effect=FocusTimeoutError(3.0)
+    ):
+        result = runner.invoke(main, ["test_session_id", "--wait", "3"])
+
+    assert result.exit_code == 1
+    assert "Error: Session did not appear within 3.0 seconds" in result.output
+
+
+def test_focus_session_wait_usage_errors(runner: CliRunner) -> None:
+    """Test --wait SECONDS with --timeout, or before the ID, is rejected."""
+    with patch("iterm2_focus.commands.focus_session") as mock_focus:
+        both = runner.invoke(main, ["test_session_id", "--wait", "3", "-t", "9"])
+        swapped = runner.invoke(main, ["--wait", "w0t0p0:ABC"])
+        negative = runner.invoke(main, ["test_session_id", "--wait", "0"])
+
+    mock_focus.assert_not_called()
+    assert both.exit_code == 2
+    assert "--wait SECONDS and --timeout" in both.output
+    assert swapped.exit_code == 2
+    assert "Put SESSION_ID before --wait" in swapped.output
+    assert negative.exit_code == 2
+
+
+def test_batch(runner: CliRunner) -> None:
+    """Test --batch prints one JSON record per command."""
+    import json
+
+    async def fake_run_batch(
+        lines: Iterable[str], timeout: float | None
+    ) -> AsyncIterator[dict[str, Any]]:
+        for number, line in enumerate(lines, start=1):
+            yield {"line": number, "command": line.split()[0], "ok": True}
+
+    with patch("iterm2_focus.commands.run_batch", fake_run_batch):
+        result = runner.invoke(main, ["--batch"], input="list\nexists abc\n")
+
+    assert result.exit_code == 0
+    records = [json.loads(line) for line in result.output.splitlines()]
+    assert [r["command"] for r in records] == ["list", "exists"]
+
+
+def test_batch_failure_exit_code(runner: CliRunner) -> None:
+    """Test --batch exits with status 1 when a command failed."""
+
+    async def fake_run_batch(
+        lines: Iterable[str], timeout: float | None
+    ) -> AsyncIterator[dict[str, Any]]:
+        yield {"line": 1, "command": "focus", "ok": False, "error": "boom"}
+
+    with patch("iterm2_focus.commands.run_batch", fake_run_batch):
+        result = runner.invoke(main, ["--batch"], input="focus x\n")
+
+    assert result.exit_code == 1
+    assert '"error": "boom"' in result.output
+
+
+def test_exists(runner: CliRunner) -> None:
+    """Test --exists reports each ID read from stdin."""
+    with patch(
+        "iterm2_focus.commands.sessions_exist",
+        AsyncMock(return_value={"session1": True, "session2": False}),
+    ) as mock_exist:
+        result = runner.invoke(
+            main, ["--exists"], input="w0t0p0:session1\n\nsession2\n"
+        )
+
+    assert list(mock_exist.call_args.args[0]) == ["session1", "session2"]
+    assert result.exit_code == 1
+    assert result.output.splitlines() == [
+        "w0t0p0:session1\texists",
+        "session2\tmissing",
+    ]
+
+
+def test_exists_all_alive_quiet(runner: CliRunner) -> None:
+    """Test --exists --quiet only reports through the exit status."""
+    with patch(
+        "iterm2_focus.commands.sessions_exist",
+        AsyncMock(return_value={"session1": True}),
+    ):
+        result = runner.invoke(main, ["--exists", "-q"], input="session1\n")
+
+    assert result.exit_code == 0
+    assert result.output == ""
+
+
+def test_list_sessions_unchanged(runner: CliRunner) -> None:
+    """Test --list --if-changed-since with an unchanged layout."""
+    with patch("iterm2_focus.commands.asyncio.run", side_effect=_fake_run(None)):
+        result = runner.invoke(main, ["--list", "--if-changed-since", "abc123"])
+
+    assert result.exit_code == 0
+    assert result.output.strip() == "Unchanged since version abc123."
+
+
+def test_list_since_reports_changes_and_saves(
+    runner: CliRunner, tmp_path: Path
+) -> None:
+    """Test --list --since prints the diff and saves the new listing."""
+    path = tmp_path / "listing.json"
+    save_listing(
+        path,
+        [
+            Session(session_id="session1", name="Build", window_id="w1", tab_id="t1"),
+            Session(session_id="session2", name="Old", window_id="w1", tab_id="t1"),
+        ],
+    )
+    current = [
+        Session(session_id="session2", name="Editor", window_id="w1", tab_id="t2"),
+        Session(session_id="session3", name="Logs", window_id="w1", tab_id="t1"),
+    ]
+
+    with patch(
+        "iterm2_focus.commands.asyncio.run", side_effect=_fake_run((current, "etag2"))
+    ):
+        result = runner.invoke(main, ["--list", "--since", str(path)])
+
+    assert result.exit_code == 0
+    assert result.output.splitlines() == [
+        "+ session3  Logs",
+        "- session1  Build",
+        "> session2  window w1, tab t1 -> window w1, tab t2",
+        "~ session2  Old -> Editor",
+    ]
+    saved = load_listing(path)
+    assert saved is not None
+    assert saved.sessions == tuple(current)
+    assert saved.version == "etag2"
+
+    with patch(
+        "iterm2_focus.commands.asyncio.run", side_effect=_fake_run((current, "etag2"))
+    ):
+        result = runner.invoke(main, ["--list", "--since", str(path)])
+
+    assert result.output == "No changes.\n"
+
+
+def test_list_since_does_not_save_on_error(runner: CliRunner, tmp_path: Path) -> None:
+    """Test a failed listing leaves the saved file alone."""
+    path = tmp_path / "listing.json"
+
+    with patch(
+        "iterm2_focus.commands.asyncio.run", side_effect=_fake_run(error=TimeoutError)
+    ):
+        result = runner.invoke(main, ["--list", "--since", str(path), "-t", "1"])
+
+    assert result.exit_code == 1
+    assert "timed out after 1.0 seconds" in result.output
+    assert not path.exists()
+
+
+def test_list_cached(runner: CliRunner) -> None:
+    """Test --list --cached prints the cache without connecting."""
+    cache_listing([Session(session_id="session1", name="Build")], "etag1")
+
+    with patch("iterm2_focus.commands.asyncio.run") as mock_run:
+        result = runner.invoke(main, ["--list", "--cached"])
+
+    mock_run.assert_not_called()
+    assert result.exit_code == 0
+    assert "Cached iTerm2 sessions (as of 0s ago):" in result.output
+    assert "ID: session1" in result.output
+    assert "Version: etag1" in result.output
+
+
+def test_list_cached_warns_when_stale(runner: CliRunner) -> None:
+    """Test an old cache is printed with a warning."""
+    cache_listing([Session(session_id="session1")])
+
+    with patch("iterm2_focus.store.time.time", return_value=time.time() + 600):
+        result = runner.invoke(main, ["--list", "--cached"])
+
+    assert result.exit_code == 0
+    assert "Warning: the cached listing is 10m old" in result.output
+    assert "ID: session1" in result.output
+
+
+def test_list_cached_missing(runner: CliRunner) -> None:
+    """Test --list --cached fails when nothing has been cached."""
+    result = runner.invoke(main, ["--list", "--cached"])
+
+    assert result.exit_code == 1
+    assert "Error: No cached listing" in result.output
+
+
+def _complete(incomplete: str) -> list[tuple[str, str | None]]:
+    """Run click's completion for the session_id argument."""
+    completion = ShellComplete(main, {}, "iterm2-focus", "_ITERM2_FOCUS_COMPLETE")
+    return [(c.value, c.help) for c in completion.get_completions([], incomplete)]
+
+
+def test_complete_session_id_from_cache() -> None:
+    """Test session IDs are completed from the cache, with name and path."""
+    cache_listing(
+        [
+            Session(session_id="abc-1", name="Build", path="/src/app"),
+            Session(session_id="abd-2", name="Editor"),
+            Session(session_id="xyz-3", name="Logs", path="/var/log/abc"),
+        ]
+    )
+
+    with patch("iterm2_focus.commands.asyncio.run") as mock_run:
+        assert _complete("abd") == [("abd-2", "Editor")]
+        assert _complete("w0t0p0:abc-") == [("abc-1", "Build /src/app")]
+        # Name and path matches come after ID matches
+        assert _complete("abc") == [
+            ("abc-1", "Build /src/app"),
+            ("xyz-3", "Logs /var/log/abc"),
+        ]
+        assert _complete("edit") == [("abd-2", "Editor")]
+
+    mock_run.assert_not_called()
+
+
+def test_complete_session_id_without_cache() -> None:
+    """Test completion offers nothing before anything was cached."""
+    assert _complete("") == []
+
+
+def test_complete_session_id_over_many_cached_sessions() -> None:
+    """Test completion over hundreds of cached sessions never asks iTerm2."""
+    cache_listing(
+        Session(session_id=f"session-{i}", name=f"Shell {i}", path=f"/home/{i}")
+        for i in range(500)
+    )
+
+    with patch("iterm2_focus.commands.asyncio.run") as mock_run:
+        completions = _complete("session-4")
+
+    mock_run.assert_not_called()
+    assert len(completions) == 111
+
+
+_COMPLETE_SCRIPT = """
+import sys
+from iterm2_focus.cli import main
+try:
+    main(prog_name="iterm2-focus")
+finally:
+    print("iterm2" in sys.modules, "asyncio" in sys.modules)
+"""
+
+
+def test_complete_session_id_process_skips_heavy_imports() -> None:
+    """Test a completion run loads neither iTerm2's API nor asyncio."""
+    cache_listing(Session(session_id=f"session-{i}") for i in range(500))
+
+    src = str(Path(__file__).parent.parent / "src")
+    result = subprocess.run(
+        [sys.executable, "-c", _COMPLETE_SCRIPT],
+        capture_output=True,
+        text=True,
+        env={
+            **os.environ,
+            "PYTHONPATH": src,
+            "_ITERM2_FOCUS_COMPLETE": "bash_complete",
+            "COMP_WORDS": "iterm2-focus session-49",
+            "COMP_CWORD": "1",
+        },
+    )
+    output = result.stdout.splitlines()
+
+    assert output[-1] == "False False"
+    assert "plain,session-49" in output
+
+
+def _mock_app_with_sessions(*session_ids: str) -> MagicMock:
+    """Build an app with one tab holding the given sessions."""
+    sessions = []
+    for session_id in session_ids:
+        session = MagicMock()
+        session.session_id = session_id
+        session.async_activate = AsyncMock()
+        session.async_get_variable = AsyncMock(return_value=None)
+        sessions.append(session)
+    tab = MagicMock()
+    tab.tab_id = "tab1"
+    tab.sessions = sessions
+    tab.async_select = AsyncMock()
+    window = MagicMock()
+    window.window_id = "window1"
+    window.tabs = [tab]
+    window.async_activate = AsyncMock()
+    app = MagicMock()
+    app.terminal_windows = [window]
+    return app
+
+
+def test_list_sessions_partial(runner: CliRunner) -> None:
+    """Test a listing cut short by --timeout warns and is not cached."""
+    app = _mock_app_with_sessions("fast", "slow")
+
+    async def stall(name: str) -> None:
+        await asyncio.sleep(5)
+
+    app.terminal_windows[0].tabs[0].sessions[1].async_get_variable = stall
+
+    with (
+        patch("iterm2_focus.connection.Connection.async_create", AsyncMock()),
+        patch("iterm2_focus.connection.async_get_app", AsyncMock(return_value=app)),
+    ):
+        result = runner.invoke(main, ["--list", "-t", "0.1"])
+
+    assert result.exit_code == 0
+    assert "ID: fast" in result.output
+    assert "ID: slow" not in result.output
+    assert "showing 1 of 2 sessions" in result.output
+    assert load_cached_listing() is None
+
+
+def test_focus_records_history(runner: CliRunner) -> None:
+    """Test a successful focus records the origin and the target."""
+    app = _mock_app_with_sessions("target")
+
+    with (
+        patch.dict(os.environ, {"ITERM_SESSION_ID": "w0t0p0:origin"}),
+        patch("iterm2_focus.connection.Connection.async_create", AsyncMock()),
+        patch("iterm2_focus.connection.async_get_app", AsyncMock(return_value=app)),
+    ):
+        result = runner.invoke(main, ["target"])
+
+    assert result.exit_code == 0
+    assert load_history().entries == ("origin", "target")
+    entry = load_frecency().get("target")
+    assert entry is not None and entry.visits == 1
+
+
+def test_back_forward_and_mru_skip_terminated(runner: CliRunner) -> None:
+    """Test history navigation focuses by ID and skips closed sessions."""
+    save_history(FocusHistory(["a", "closed", "b", "c"]))
+    app = _mock_app_with_sessions("a", "b", "c")
+
+    def run(*args: str, origin: str) -> str:
+        """Run the CLI from a shell in the origin session."""
+        env = {"ITERM_SESSION_ID": f"w0t0p0:{origin}"}
+        return runner.invoke(main, list(args), env=env).output
+
+    with (
+        patch("iterm2_focus.connection.Connection.async_create", AsyncMock()),
+        patch("iterm2_focus.connection.async_get_app", AsyncMock(return_value=app)),
+    ):
+        back = run("--back", origin="c")
+        back_again = run("-b", origin="b")
+        forward = run("--forward", origin="a")
+        mru = run("--mru", "2", origin="b")
+
+    assert back == "Focused session: b\n"
+    assert back_again == "Focused session: a\n"
+    assert forward == "Focused session: b\n"
+    # --mru records a new visit, dropping the entries after the cursor
+    assert mru == "Focused session: a\n"
+    assert load_history().entries == ("a", "b", "a")
+
+    sessions = app.terminal_windows[0].tabs[0].sessions
+    assert sessions[0].async_activate.await_count == 2
+    assert sessions[1].async_activate.await_count == 2
+
+
+def test_back_with_empty_history(runner: CliRunner) -> None:
+    """Test --back fails when there is nowhere to go."""
+    app = _mock_app_with_sessions("a")
+
+    with (
+        patch.dict(os.environ, {"ITERM_SESSION_ID": ""}),
+        patch("iterm2_focus.connection.Connection.async_create", AsyncMock()),
+        patch("iterm2_focus.connection.async_get_app", AsyncMock(return_value=app)),
+    ):
+        result = runner.invoke(main, ["--back"])
+
+    assert result.exit_code == 1
+    assert "Error: No such session in the focus history." in result.output
+
+
+def test_jump_focuses_best_open_match(runner: CliRunner) -> None:
+    """Test --jump skips closed sessions and records the visit."""
+    store = FrecencyStore()
+    for _ in range(3):
+        store.visit("closed", name="api old")
+    store.visit("b", name="api server")
+    store.visit("c", name="api tests", now=0)
+    save_frecency(store)
+    app = _mock_app_with_sessions("b", "c")
+
+    with (
+        patch.dict(os.environ, {"ITERM_SESSION_ID": ""}),
+        patch("iterm2_focus.connection.Connection.async_create", AsyncMock()),
+        patch("iterm2_focus.connection.async_get_app", AsyncMock(return_value=app)),
+    ):
+        result = runner.invoke(main, ["--jump", "api"])
+        unknown = runner.invoke(main, ["-j", "nothing"])
+
+    assert result.exit_code == 0
+    assert result.output == "Focused session: b\n"
+    app.terminal_windows[0].tabs[0].sessions[0].async_activate.assert_awaited_once()
+    saved = load_frecency()
+    assert saved.get("closed") is None
+    entry = saved.get("b")
+    assert entry is not None and entry.visits == 2
+    assert load_history().entries == ("b",)
+
+    assert unknown.exit_code == 1
+    assert "Error: No visited session matches: nothing" in unknown.output
+
+
+def test_cwd_uses_fresh_cache(runner: CliRunner) -> None:
+    """Test --cwd resolves from the cached listing without fetching paths."""
+    cache_listing(
+        [
+            Session(session_id="a", path="/src/api"),
+            Session(session_id="b", path="/src/api/server"),
+            Session(session_id="gone", path="/src/api/server/deeper"),
+        ]
+    )
+    app = _mock_app_with_sessions("a", "b")
+
+    with (
+        patch("iterm2_focus.connection.Connection.async_create", AsyncMock()),
+        patch("iterm2_focus.connection.async_get_app", AsyncMock(return_value=app)),
+    ):
+        result = runner.invoke(main, ["--cwd", "/src/api"])
+        sessions = app.terminal_windows[0].tabs[0].sessions
+        sessions[1].async_get_variable.assert_not_called()
+        # Directories the cache knows nothing about are looked up live
+        missing = runner.invoke(main, ["--cwd", "/elsewhere"])
+
+    assert result.output == "Focused session: b\n"
+    sessions[1].async_activate.assert_awaited_once()
+    assert load_history().entries[-1] == "b"
+
+    assert missing.exit_code == 1
+    assert "Error: No session under /elsewhere" in missing.output
+
+
+def test_tty_and_pid(runner: CliRunner) -> None:
+    """Test --tty and --pid focus the session owning the device or process."""
+    app = _mock_app_with_sessions("a", "b")
+    variables = {"tty": "/dev/ttys002", "pid": 200, "jobPid": 250}
+    app.terminal_windows[0].tabs[0].sessions[1].async_get_variable = AsyncMock(
+        side_effect=lambda var: variables.get(var)
+    )
+
+    with (
+        patch("iterm2_focus.connection.Connection.async_create", AsyncMock()),
+        patch("iterm2_focus.connection.async_get_app", AsyncMock(return_value=app)),
+        patch(
+            "iterm2_focus.procindex.async_controlling_tty",
+            AsyncMock(return_value=None),
+        ),
+    ):
+        by_tty = runner.invoke(main, ["--tty", "ttys002"])
+        by_pid = runner.invoke(main, ["--pid", "250"])
+        unknown = runner.invoke(main, ["--pid", "999"])
+
+    assert by_tty.output == "Focused session: b\n"
+    assert by_pid.output == "Focused session: b\n"
+    assert unknown.exit_code == 1
+    assert "Error: Process 999 does not run in any session" in unknown.output
+
+
+def test_job(runner: CliRunner) -> None:
+    """Test --job focuses the session running a matching job."""
+    app = _mock_app_with_sessions("a", "b")
+    variables = {"jobName": "Python", "commandLine": "python -m pytest tests"}
+    app.terminal_windows[0].tabs[0].sessions[1].async_get_variable = AsyncMock(
+        side_effect=lambda var: variables.get(var)
+    )
+
+    with (
+        patch("iterm2_focus.connection.Connection.async_create", AsyncMock()),
+        patch("iterm2_focus.connection.async_get_app", AsyncMock(return_value=app)),
+    ):
+        found = runner.invoke(main, ["--job", "pytest"])
+        missing = runner.invoke(main, ["--job", "cargo"])
+
+    assert found.output == "Focused session: b\n"
+    assert missing.exit_code == 1
+    assert "Error: No session is running cargo" in missing.output
+
+
+def _give_output(session: MagicMock, *rows: str) -> None:
+    """Make a mocked session show the given rows of output."""
+    contents = [SimpleNamespace(string=row, hard_eol=True) for row in rows]
+    session.async_get_line_info = AsyncMock(
+        return_value=SimpleNamespace(
+            overflow=0, scrollback_buffer_height=len(rows), mutable_area_height=0
+        )
+    )
+    session.async_get_contents = AsyncMock(
+        side_effect=lambda first, count: contents[first : first + count]
+    )
+
+
+def test_grep(runner: CliRunner) -> None:
+    """Test --grep prints matches and --focus-best focuses the newest one."""
+    app = _mock_app_with_sessions("a", "b")
+    a, b = app.terminal_windows[0].tabs[0].sessions
+    _give_output(a, "Traceback (most recent call last):", "ValueError", "$", "$")
+    _give_output(b, "$ pytest", "ValueError: bad", "$")
+
+    with (
+        patch("iterm2_focus.connection.Connection.async_create", AsyncMock()),
+        patch("iterm2_focus.connection.async_get_app", AsyncMock(return_value=app)),
+    ):
+        found = runner.invoke(main, ["--grep", "ValueError", "--focus-best"])
+        missing = runner.invoke(main, ["--grep", "KeyError"])
+        invalid = runner.invoke(main, ["--grep", "("])
+
+    assert sorted(found.output.splitlines()[:2]) == [
+        "a:1: ValueError",
+        "b:1: ValueError: bad",
+    ]
+    assert found.output.splitlines()[2] == "Focused session: b"
+    b.async_activate.assert_awaited_once()
+    assert missing.exit_code == 1
+    assert "Error: No session output matches KeyError" in missing.output
+    assert invalid.exit_code == 1
+    assert "Invalid regular expression" in invalid.output
+
+
+def test_wait_for(runner: CliRunner) -> None:
+    """Test --wait-for prints the match and focuses a named session only."""
+    app = _mock_app_with_sessions("a", "b")
+    a = app.terminal_windows[0].tabs[0].sessions[0]
+    match = Match("a", 7, 1, "5 passed", 2, 8)
+    wait = AsyncMock(side_effect=[match, match, None])
+
+    with (
+        patch("iterm2_focus.connection.Connection.async_create", AsyncMock()),
+        patch("iterm2_focus.connection.async_get_app", AsyncMock(return_value=app)),
+        patch("iterm2_focus.commands.wait_for_output", wait),
+    ):
+        named = runner.invoke(main, ["w0t0p0:a", "--wait-for", "passed"])
+        current = runner.invoke(
+            main, ["--wait-for", "passed"], env={"ITERM_SESSION_ID": "w0t0p0:a"}
+        )
+        closed = runner.invoke(main, ["b", "--wait-for", "passed"])
+
+    assert named.output == "a:7: 5 passed\nFocused session: a\n"
+    session_id, regex = wait.await_args_list[0].args[:2]
+    assert (session_id, regex.pattern) == ("a", "passed")
+    a.async_activate.assert_awaited_once()
+    assert current.output == "a:7: 5 passed\n"
+    assert closed.exit_code == 1
+    assert "Error: Session not found or closed: b" in closed.output
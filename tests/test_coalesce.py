@@ -0,0 +1,108 @@
+"""Tests for coalesce module."""
+
+import asyncio
+
+import pytest
+
+from iterm2_focus.coalesce import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_share_one_execution() -> None:
+    """Test concurrent callers with the same key share one call."""
+    flight = SingleFlight()
+    calls = 0
+
+    async def fetch() -> list[str]:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return ["session1"]
+
+    results = await asyncio.gather(*[flight.do(("list",), fetch) for _ in range(5)])
+
+    assert calls == 1
+    assert all(result is results[0] for result in results)
+    assert flight.stats() == {"list": {"executed": 1, "coalesced": 4}}
+
+
+@pytest.mark.asyncio
+async def test_different_keys_are_not_coalesced() -> None:
+    """Test calls with different keys run separately."""
+    flight = SingleFlight()
+
+    async def fetch(value: str) -> str:
+        await asyncio.sleep(0.01)
+        return value
+
+    results = await asyncio.gather(
+        flight.do(("info", "a"), lambda: fetch("a")),
+        flight.do(("info", "b"), lambda: fetch("b")),
+    )
+
+    assert list(results) == ["a", "b"]
+    assert flight.stats() == {"info": {"executed": 2, "coalesced": 0}}
+
+
+@pytest.mark.asyncio
+async def test_sequential_calls_execute_again() -> None:
+    """Test a finished call is not reused by later callers."""
+    flight = SingleFlight()
+    calls = 0
+
+    async def fetch() -> int:
+        nonlocal calls
+        calls += 1
+        return calls
+
+    assert await flight.do(("count",), fetch) == 1
+    assert await flight.do(("count",), fetch) == 2
+
+
+@pytest.mark.asyncio
+async def test_exception_is_shared() -> None:
+    """Test all waiting callers receive the call's exception."""
+    flight = SingleFlight()
+
+    async def fail() -> None:
+        await asyncio.sleep(0.01)
+        raise ConnectionError("iTerm2 not running")
+
+    results = await asyncio.gather(
+        flight.do(("list",), fail), flight.do(("list",), fail), return_exceptions=True
+    )
+
+    assert all(isinstance(result, ConnectionError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_others() -> None:
+    """Test cancelling the first caller leaves the shared call running."""
+    flight = SingleFlight()
+
+    async def fetch() -> str:
+        await asyncio.sleep(0.02)
+        return "done"
+
+    first = asyncio.create_task(flight.do(("list",), fetch))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(flight.do(("list",), fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == "done"
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+
+def test_reset_stats() -> None:
+    """Test resetting the counters."""
+    flight = SingleFlight()
+
+    async def fetch() -> None:
+        return None
+
+    asyncio.run(flight.do(("list",), fetch))
+    flight.reset_stats()
+
+    assert flight.stats() == {}
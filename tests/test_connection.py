@@ -0,0 +1,245 @@
+"""Tests for connection module."""
+
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from iterm2.app import App
+
+from iterm2_focus.connection import (
+    CircuitBreaker,
+    async_connect,
+    circuit_breaker,
+    connection_alive,
+)
+from iterm2_focus.errors import FocusError, ITerm2UnavailableError
+
+
+def test_breaker_opens_after_threshold(tmp_path: Path) -> None:
+    """Test the breaker opens after consecutive failures."""
+    breaker = CircuitBreaker(failure_threshold=2, state_path=tmp_path / "c.json")
+
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.before_call()
+
+    breaker.record_failure()
+    assert breaker.state == "open"  # type: ignore[comparison-overlap]
+    with pytest.raises(ITerm2UnavailableError) as exc_info:
+        breaker.before_call()
+
+    assert isinstance(exc_info.value, FocusError)
+    assert "iTerm2 API unavailable" in str(exc_info.value)
+
+
+def test_breaker_success_resets_failures(tmp_path: Path) -> None:
+    """Test a success clears the failure count."""
+    breaker = CircuitBreaker(failure_threshold=2, state_path=tmp_path / "c.json")
+
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+
+    assert breaker.state == "closed"
+
+
+def test_breaker_half_open_allows_single_probe(tmp_path: Path) -> None:
+    """Test one probe is let through once the reset timeout has passed."""
+    breaker = CircuitBreaker(
+        failure_threshold=1, reset_timeout=5.0, state_path=tmp_path / "c.json"
+    )
+
+    with patch("iterm2_focus.connection.time.time", return_value=100.0):
+        breaker.record_failure()
+
+    with patch("iterm2_focus.connection.time.time", return_value=106.0):
+        assert breaker.state == "half-open"
+        breaker.before_call()  # the probe
+        with pytest.raises(ITerm2UnavailableError):
+            breaker.before_call()  # concurrent callers still fail fast
+
+        breaker.record_success()
+        assert breaker.state == "closed"  # type: ignore[comparison-overlap]
+
+
+def test_breaker_failed_probe_reopens(tmp_path: Path) -> None:
+    """Test a failed probe keeps the breaker open for another period."""
+    breaker = CircuitBreaker(
+        failure_threshold=1, reset_timeout=5.0, state_path=tmp_path / "c.json"
+    )
+
+    with patch("iterm2_focus.connection.time.time", return_value=100.0):
+        breaker.record_failure()
+    with patch("iterm2_focus.connection.time.time", return_value=106.0):
+        breaker.before_call()
+        breaker.record_failure()
+        assert breaker.state == "open"
+
+
+def test_breaker_state_is_shared_through_file(tmp_path: Path) -> None:
+    """Test a new breaker (e.g. another CLI process) sees persisted failures."""
+    path = tmp_path / "c.json"
+    CircuitBreaker(failure_threshold=1, state_path=path).record_failure()
+
+    assert CircuitBreaker(failure_threshold=1, state_path=path).state == "open"
+
+
+def test_breaker_without_persistence(tmp_path: Path) -> None:
+    """Test persist=False keeps the state in memory only."""
+    path = tmp_path / "c.json"
+    CircuitBreaker(failure_threshold=1, state_path=path, persist=False).record_failure()
+
+    assert not path.exists()
+
+
+@pytest.mark.asyncio
+async def test_async_connect_fails_fast_when_open() -> None:
+    """Test no connection is attempted while the breaker is open."""
+    mock_create = AsyncMock(side_effect=ConnectionRefusedError("refused"))
+
+    with patch("iterm2_focus.connection.Connection.async_create", mock_create):
+        for _ in range(circuit_breaker.failure_threshold):
+            with pytest.raises(ConnectionRefusedError):
+                await async_connect()
+
+        with pytest.raises(ITerm2UnavailableError):
+            await async_connect()
+
+    assert mock_create.await_count == circuit_breaker.failure_threshold
+
+
+@pytest.mark.asyncio
+async def test_async_connect_caller_deadline_is_not_a_failure() -> None:
+    """Test only a connect that times out on its own counts as a failure."""
+    import asyncio
+
+    async def hang() -> None:
+        await asyncio.sleep(10)
+
+    with patch("iterm2_focus.connection.Connection.async_create", hang):
+        for _ in range(circuit_breaker.failure_threshold):
+            with pytest.raises(TimeoutError):
+                await async_connect(asyncio.get_running_loop().time() + 0.01)
+    assert circuit_breaker.state == "closed"
+
+    mock_create = AsyncMock(side_effect=TimeoutError)
+    with patch("iterm2_focus.connection.Connection.async_create", mock_create):
+        for _ in range(circuit_breaker.failure_threshold):
+            with pytest.raises(TimeoutError):
+                await async_connect(asyncio.get_running_loop().time() + 10)
+        with pytest.raises(ITerm2UnavailableError):
+            await async_connect()
+
+
+@pytest.mark.asyncio
+async def test_async_connect_returns_app() -> None:
+    """Test a successful connection returns the app and closes the breaker."""
+    mock_app = MagicMock()
+    circuit_breaker.record_failure()
+
+    with (
+        patch("iterm2_focus.connection.Connection.async_create", AsyncMock()),
+        patch(
+            "iterm2_focus.connection.async_get_app", AsyncMock(return_value=mock_app)
+        ),
+    ):
+        app = await async_connect()
+
+    assert app is mock_app
+    assert circuit_breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_focus_session_reports_open_breaker() -> None:
+    """Test async_focus_session surfaces the breaker error unchanged."""
+    from iterm2_focus.focus import async_focus_session
+
+    for _ in range(circuit_breaker.failure_threshold):
+        circuit_breaker.record_failure()
+
+    with pytest.raises(ITerm2UnavailableError):
+        await async_focus_session("test_session_id")
+
+
+@pytest.mark.asyncio
+async def test_async_connect_replaces_app_on_closed_connection() -> None:
+    """Test the cached App is rebuilt once its connection has closed."""
+    dead = MagicMock()
+    dead.connection = SimpleNamespace(websocket=SimpleNamespace(open=False))
+    built = MagicMock()
+
+    async def get_app(connection: Any) -> Any:
+        # iterm2 reuses App.instance if set; it must have been cleared
+        return App.instance or built
+
+    with (
+        patch.object(App, "instance", dead),
+        patch("iterm2_focus.connection.Connection.async_create", AsyncMock()),
+        patch("iterm2_focus.connection.async_get_app", get_app),
+    ):
+        assert await async_connect() is built
+
+
+def _fake_connection() -> SimpleNamespace:
+    """A connection whose websocket can be closed."""
+    websocket = SimpleNamespace(open=True)
+
+    async def close() -> None:
+        websocket.open = False
+
+    websocket.close = close
+    return SimpleNamespace(websocket=websocket)
+
+
+@pytest.mark.asyncio
+async def test_reconnects_leave_one_live_connection() -> None:
+    """Test the open connection is reused and a replaced one is closed."""
+    created: list[SimpleNamespace] = []
+
+    async def create() -> SimpleNamespace:
+        created.append(_fake_connection())
+        return created[-1]
+
+    async def get_app(connection: Any) -> Any:
+        if App.instance is None:
+            App.instance = MagicMock(connection=connection)
+        return App.instance
+
+    with (
+        patch.object(App, "instance", None),
+        patch("iterm2_focus.connection.Connection.async_create", create),
+        patch("iterm2_focus.connection.async_get_app", get_app),
+    ):
+        for _ in range(3):
+            await async_connect()
+        assert len(created) == 1
+
+        # iTerm2 restarted
+        created[0].websocket.open = False
+        for _ in range(3):
+            app = await async_connect()
+        assert app is not None
+        assert app.connection is created[1]
+        assert [connection_alive(c) for c in created] == [False, True]
+
+        # A connection abandoned half-way is closed too
+        created[1].websocket.open = False
+        with (
+            patch(
+                "iterm2_focus.connection.async_get_app", AsyncMock(side_effect=OSError)
+            ),
+            pytest.raises(OSError),
+        ):
+            await async_connect()
+
+    assert len(created) == 3
+    assert [connection_alive(c) for c in created] == [False, False, False]
+
+
+def test_connection_alive() -> None:
+    """Test a connection counts as alive only while its websocket is open."""
+    assert connection_alive(SimpleNamespace(websocket=SimpleNamespace(open=True)))
+    assert not connection_alive(SimpleNamespace(websocket=SimpleNamespace(open=False)))
+    assert not connection_alive(SimpleNamespace(websocket=None))
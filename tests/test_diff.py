@@ -0,0 +1,76 @@
+"""Tests for diff module."""
+
+from typing import Any
+
+from iterm2_focus.diff import diff_sessions
+from iterm2_focus.session import Session
+
+
+def _session(session_id: str, **fields: Any) -> Session:
+    defaults = {"window_id": "window1", "tab_id": "tab1", "name": session_id}
+    return Session(session_id=session_id, **{**defaults, **fields})
+
+
+def test_diff_identical_listings_is_empty() -> None:
+    """Test equal listings produce an empty, falsy diff."""
+    listing = [_session("session1"), _session("session2")]
+
+    delta = diff_sessions(listing, list(listing))
+
+    assert not delta
+    assert delta.to_dict() == {
+        "added": [],
+        "removed": [],
+        "moved": [],
+        "renamed": [],
+        "updated": [],
+    }
+
+
+def test_diff_added_and_removed() -> None:
+    """Test sessions only in one listing are added or removed."""
+    delta = diff_sessions(
+        [_session("session1"), _session("session2")],
+        [_session("session2"), _session("session3")],
+    )
+
+    assert [s.session_id for s in delta.added] == ["session3"]
+    assert [s.session_id for s in delta.removed] == ["session1"]
+    assert not delta.moved and not delta.renamed and not delta.updated
+
+
+def test_diff_moved_renamed_and_updated() -> None:
+    """Test changed sessions are classified by the fields that changed."""
+    delta = diff_sessions(
+        [
+            _session("moved"),
+            _session("renamed"),
+            _session("both"),
+            _session("cd", path="/tmp"),
+        ],
+        [
+            _session("moved", tab_id="tab2"),
+            _session("renamed", name="Editor"),
+            _session("both", window_id="window2", name="Logs"),
+            _session("cd", path="/var/log"),
+        ],
+    )
+
+    assert [c.after.session_id for c in delta.moved] == ["moved", "both"]
+    assert [c.after.session_id for c in delta.renamed] == ["renamed", "both"]
+    assert [c.after.session_id for c in delta.updated] == ["cd"]
+    assert delta.moved[1].fields == ("window_id", "name")
+    assert delta.updated[0].to_dict() == {
+        "session_id": "cd",
+        "fields": ["path"],
+        "before": {"path": "/tmp"},
+        "after": {"path": "/var/log"},
+    }
+
+
+def test_diff_ignores_focus() -> None:
+    """Test is_active changes are not reported."""
+    before = [Session(session_id="session1", is_active=True)]
+    after = [Session(session_id="session1", is_active=False)]
+
+    assert not diff_sessions(before, after)
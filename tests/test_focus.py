@@ -4,7 +4,12 @@ from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
-from iterm2_focus.focus import FocusError, async_focus_session, focus_session
+from iterm2_focus.focus import (
+    FocusError,
+    FocusTimeoutError,
+    async_focus_session,
+    focus_session,
+)
 
 
 @pytest.mark.asyncio
@@ -30,9 +35,10 @@ async def test_async_focus_session_success() -> None:
 
     with (
         patch(
-            "iterm2_focus.focus.Connection.async_create", return_value=mock_connection
+            "iterm2_focus.connection.Connection.async_create",
+            return_value=mock_connection,
         ),
-        patch("iterm2_focus.focus.async_get_app", return_value=mock_app),
+        patch("iterm2_focus.connection.async_get_app", return_value=mock_app),
     ):
         result = await async_focus_session("test_session_id")
 
@@ -61,9 +67,10 @@ async def test_async_focus_session_not_found() -> None:
 
     with (
         patch(
-            "iterm2_focus.focus.Connection.async_create", return_value=mock_connection
+            "iterm2_focus.connection.Connection.async_create",
+            return_value=mock_connection,
         ),
-        patch("iterm2_focus.focus.async_get_app", return_value=mock_app),
+        patch("iterm2_focus.connection.async_get_app", return_value=mock_app),
     ):
         result = await async_focus_session("test_session_id")
 
@@ -92,7 +99,9 @@ def test_focus_session_success() -> None:
         result = focus_session("test_session_id")
 
     assert result is True
-    mock_async.assert_called_once_with("test_session_id")
+    mock_async.assert_called_once_with(
+        "test_session_id", timeout=None, wait=False, record=True
+    )
 
 
 def test_focus_session_not_found() -> None:
@@ -103,7 +112,9 @@ def test_focus_session_not_found() -> None:
         result = focus_session("test_session_id")
 
     assert result is False
-    mock_async.assert_called_once_with("test_session_id")
+    mock_async.assert_called_once_with(
+        "test_session_id", timeout=None, wait=False, record=True
+    )
 
 
 def test_focus_session_error() -> None:
@@ -137,3 +148,37 @@ async def test_async_focus_session_connection_error_specific() -> None:
     assert "Make sure iTerm2 is running and Python API is enabled" in str(
         exc_info.value
     )
+
+
+@pytest.mark.asyncio
+async def test_async_focus_session_timeout() -> None:
+    """Test a stalled activation is cancelled at the deadline."""
+    import asyncio
+
+    async def stall() -> None:
+        await asyncio.sleep(10)
+
+    mock_session = MagicMock()
+    mock_session.session_id = "test_session_id"
+    mock_session.async_activate = stall
+
+    mock_tab = MagicMock()
+    mock_tab.sessions = [mock_session]
+
+    mock_window = MagicMock()
+    mock_window.tabs = [mock_tab]
+
+    mock_app = MagicMock()
+    mock_app.terminal_windows = [mock_window]
+
+    with (
+        patch(
+            "iterm2_focus.connection.Connection.async_create", return_value=AsyncMock()
+        ),
+        patch("iterm2_focus.connection.async_get_app", return_value=mock_app),
+        pytest.raises(FocusTimeoutError) as exc_info,
+    ):
+        await async_focus_session("test_session_id", timeout=0.01)
+
+    assert "Timed out after 0.01 seconds" in str(exc_info.value)
+    assert isinstance(exc_info.value, FocusError)
@@ -0,0 +1,87 @@
+"""Tests for frecency module."""
+
+from pathlib import Path
+from unittest.mock import patch
+
+from iterm2_focus.frecency import (
+    HALF_LIFE,
+    MAX_ENTRIES,
+    FrecencyStore,
+    Visits,
+    frecency_path,
+    load_frecency,
+    record_visit,
+    save_frecency,
+)
+from iterm2_focus.session import Session
+from iterm2_focus.store import cache_listing
+
+
+def test_visit_decays_older_visits() -> None:
+    """Test repeated visits add up and age halves their weight."""
+    store = FrecencyStore()
+    store.visit("a", name="Build", now=0)
+    entry = store.visit("a", now=HALF_LIFE)
+
+    assert entry.visits == 2
+    assert entry.score == 1.5
+    assert entry.name == "Build"
+    assert entry.frecency(3 * HALF_LIFE) == 1.5 / 4
+
+
+def test_rank_prefers_frequent_and_recent() -> None:
+    """Test ranking weighs visit counts against recency."""
+    store = FrecencyStore()
+    for _ in range(3):
+        store.visit("often", name="api server", path="/src/api", now=0)
+    store.visit("recent", name="api tests", path="/src/api", now=4 * HALF_LIFE)
+    store.visit("other", name="Editor", now=4 * HALF_LIFE)
+
+    ranked = store.rank("API", now=4 * HALF_LIFE)
+    assert [e.session_id for e in ranked] == ["recent", "often"]
+    assert [e.session_id for e in store.rank("api server", now=0)] == ["often"]
+    assert [e.session_id for e in store.rank("/src tests")] == ["recent"]
+
+
+def test_store_is_bounded() -> None:
+    """Test the lowest ranked session is dropped past MAX_ENTRIES."""
+    store = FrecencyStore()
+    for i in range(MAX_ENTRIES + 1):
+        store.visit(f"session{i}", now=float(i))
+
+    assert len(store) == MAX_ENTRIES
+    assert store.get("session0") is None
+
+
+def test_save_load_and_record_visit(tmp_path: Path) -> None:
+    """Test visits are persisted with the name and path from the cache."""
+    cache_listing([Session(session_id="a", name="Build", path="/src")])
+
+    record_visit("a")
+    record_visit("a")
+    store = load_frecency()
+
+    assert frecency_path() == tmp_path / "cache" / "frecency.json"
+    entry = store.get("a")
+    assert entry is not None
+    assert entry.visits == 2
+    assert (entry.name, entry.path) == ("Build", "/src")
+
+    save_frecency(FrecencyStore())
+    assert len(load_frecency()) == 0
+
+
+def test_rank_uses_a_bounded_store_of_prepared_texts() -> None:
+    """Test a full store stays bounded and ranks without rebuilding texts."""
+    store = FrecencyStore()
+    for i in range(MAX_ENTRIES + 10):
+        store.visit(f"session{i}", name=f"Shell {i}", path=f"/home/{i}", now=i)
+
+    with patch.object(Visits, "search_text", side_effect=AssertionError):
+        ranked = store.rank("shell 49", now=MAX_ENTRIES)
+
+    assert len(store) == MAX_ENTRIES
+    assert store.get("session0") is None
+    assert [entry.session_id for entry in ranked] == [
+        f"session{i}" for i in [*range(499, 489, -1), 449, 349, 249, 149, 49]
+    ]
@@ -0,0 +1,111 @@
+"""Tests for history module."""
+
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from iterm2_focus.frecency import load_frecency
+from iterm2_focus.history import (
+    FocusHistory,
+    async_record_focus,
+    history_path,
+    load_history,
+    record_focus,
+    save_history,
+)
+
+
+def test_record_back_and_forward() -> None:
+    """Test moving through visits like a browser history."""
+    history = FocusHistory()
+    for session_id in ["a", "b", "b", "c"]:
+        history.record(session_id)
+
+    assert history.entries == ("a", "b", "c")
+    assert history.back() == "b"
+    assert history.back() == "a"
+    assert history.back() is None
+    assert history.forward() == "b"
+
+    # A new visit drops the entries after the cursor
+    history.record("d")
+    assert history.entries == ("a", "b", "d")
+    assert history.forward() is None
+
+
+def test_ring_buffer_drops_oldest() -> None:
+    """Test only the newest visits are kept."""
+    history = FocusHistory(size=3)
+    for session_id in ["a", "b", "c", "d"]:
+        history.record(session_id)
+
+    assert history.entries == ("b", "c", "d")
+    assert history.current == "d"
+
+
+def test_mru_counts_sessions_once() -> None:
+    """Test mru skips the current session and repeated visits."""
+    history = FocusHistory(["a", "b", "a", "c", "b"])
+
+    assert history.mru(1) == "c"
+    assert history.mru(2) == "a"
+    assert history.mru(3) is None
+
+
+def test_forget_keeps_cursor_on_remaining_visit() -> None:
+    """Test removing terminated sessions keeps the cursor in place."""
+    history = FocusHistory(["a", "b", "c", "b", "d"], position=3)
+
+    history.forget(lambda session_id: session_id == "c")
+
+    assert history.entries == ("a", "b", "d")
+    assert history.current == "b"
+
+    history.forget(lambda session_id: session_id in ("a", "b"))
+    assert list(history.entries) == ["d"]
+    assert history.current == "d"
+
+
+def test_save_and_load(tmp_path: Path) -> None:
+    """Test the history round-trips through the cache directory."""
+    assert load_history().entries == ()
+
+    save_history(FocusHistory(["a", "b", "c"], position=1))
+    history = load_history()
+
+    assert history_path() == tmp_path / "cache" / "history.json"
+    assert history.entries == ("a", "b", "c")
+    assert history.current == "b"
+
+    history_path().write_text("[]")
+    assert load_history().entries == ()
+
+
+def test_record_focus_records_origin_once(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test repeated focuses by one process record its session only once."""
+    monkeypatch.setenv("ITERM_SESSION_ID", "w0t0p0:origin")
+
+    record_focus("a")
+    record_focus("b")
+
+    history = load_history()
+    assert history.entries == ("origin", "a", "b")
+    assert history.back() == "a"
+    entry = load_frecency().get("b")
+    assert entry is not None and entry.visits == 1
+
+
+@pytest.mark.asyncio
+async def test_async_record_focus_runs_off_the_event_loop() -> None:
+    """Test the file I/O of recording happens in a worker thread."""
+    threads: list[int] = []
+
+    with patch(
+        "iterm2_focus.history.record_focus",
+        side_effect=lambda *args: threads.append(threading.get_ident()),
+    ):
+        await async_record_focus("a")
+
+    assert threads and threads[0] != threading.get_ident()
@@ -74,14 +74,12 @@ def test_list_real_sessions():
 
     # Verify session structure
     for session in sessions:
-        assert "id" in session
-        assert "name" in session
-        assert "window" in session
-        assert "tab" in session
+        assert session.window_id
+        assert session.tab_id
 
         # Session ID should be non-empty
-        assert session["id"]
-        assert isinstance(session["id"], str)
+        assert session.session_id
+        assert isinstance(session.session_id, str)
 
 
 @pytest.mark.integration
@@ -92,12 +90,11 @@ def test_get_real_session_info():
         pytest.skip("No sessions available")
 
     # Get info for the first session
-    session_id = sessions[0]["id"]
+    session_id = sessions[0].session_id
     info = get_session_info(session_id)
 
     assert info is not None
-    assert info["id"] == session_id
-    assert "name" in info
+    assert info.session_id == session_id
     assert "hostname" in info
     assert "username" in info
     assert "tty" in info
@@ -206,7 +203,7 @@ async def test_concurrent_operations():
         pytest.skip("Need at least 2 sessions for concurrent test")
 
     # Try to get info for multiple sessions concurrently
-    session_ids = [s["id"] for s in sessions[:3]]
+    session_ids = [s.session_id for s in sessions[:3]]
 
     async def get_info_async(session_id):
         """Wrapper to run get_session_info asynchronously."""
@@ -219,7 +216,7 @@ async def test_concurrent_operations():
     # Verify all succeeded
     for i, result in enumerate(results):
         assert result is not None
-        assert result["id"] == session_ids[i]
+        assert result.session_id == session_ids[i]
 
 
 # Add a fixture to ensure we're in the right environment
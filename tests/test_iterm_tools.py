@@ -1,10 +1,14 @@
 """Tests for iTerm2-specific MCP tools."""
 
-from unittest.mock import AsyncMock, MagicMock
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
-from tests.conftest import MCP_TEST_AVAILABLE, skip_if_no_mcp
+from iterm2_focus.errors import FocusTimeoutError
+from iterm2_focus.search import Match
+from tests.conftest import MCP_TEST_AVAILABLE, ClientFactory, skip_if_no_mcp
 
 if MCP_TEST_AVAILABLE:
     pass
@@ -23,9 +27,9 @@ class TestITermTools:
             # Should return structured content with list of sessions
             assert result.isError is False
             assert result.structuredContent is not None
-            assert "result" in result.structuredContent
+            assert result.structuredContent["changed"] is True
 
-            sessions = result.structuredContent["result"]
+            sessions = result.structuredContent["sessions"]
             assert isinstance(sessions, list)
             assert len(sessions) == 1
 
@@ -37,7 +41,6 @@ class TestITermTools:
             assert session["window_id"] == "w0"
             assert session["tab_id"] == "t0"
             assert session["is_active"] is True
-            assert session["title"] is None
             assert session["name"] == "Session Name"
 
     @skip_if_no_mcp
@@ -50,11 +53,9 @@ class TestITermTools:
         mock_app = await mock_iterm2_for_mcp.async_get_app()
 
         # Add more sessions to the mock
-        mock_profile2 = MagicMock()
-        mock_profile2.name = "Session 2"
         session2 = MagicMock()
         session2.session_id = "w0t0p1:another-session"
-        session2.async_get_profile = AsyncMock(return_value=mock_profile2)
+        session2.async_get_variable = AsyncMock(return_value="Session 2")
 
         # Add second session to the same tab
         mock_app.terminal_windows[0].tabs[0].sessions.append(session2)
@@ -62,7 +63,7 @@ class TestITermTools:
         async with client_session() as client:
             result = await client.call_tool("list_sessions", {})
 
-            sessions = result.structuredContent["result"]
+            sessions = result.structuredContent["sessions"]
             assert len(sessions) == 2
 
             # Check both sessions
@@ -218,7 +219,7 @@ class TestITermTools:
             # Test list_sessions returns array
             result = await client.call_tool("list_sessions", {})
             assert result.structuredContent is not None
-            sessions = result.structuredContent["result"]
+            sessions = result.structuredContent["sessions"]
             assert isinstance(sessions, list)
 
             # Test focus_session returns object
@@ -237,3 +238,295 @@ class TestITermTools:
             assert result.structuredContent is not None
             current = result.structuredContent["result"]
             assert current is None or isinstance(current, dict)
+
+    @skip_if_no_mcp
+    @pytest.mark.anyio
+    async def test_focus_session_burst_is_collapsed(
+        self,
+        mcp_server: Any,
+        client_session: ClientFactory,
+        mock_iterm2_for_mcp: MagicMock,
+    ) -> None:
+        """Test concurrent focus requests are collapsed to one activation."""
+        import asyncio
+
+        session_id = "w0t0p0:12345678-1234-1234-1234-123456789012"
+        async with client_session() as client:
+            results = await asyncio.gather(
+                client.call_tool("focus_session", {"session_id": "other-session"}),
+                client.call_tool(
+                    "focus_session", {"session_id": session_id, "priority": 1}
+                ),
+            )
+
+            statuses = {
+                r.structuredContent["session_id"]: r.structuredContent["status"]
+                for r in results
+            }
+            assert statuses == {"other-session": "preempted", session_id: "applied"}
+
+            mock_app = await mock_iterm2_for_mcp.async_get_app()
+            mock_app.terminal_windows[0].async_activate.assert_called_once()
+
+    @skip_if_no_mcp
+    @pytest.mark.anyio
+    async def test_list_sessions_if_changed_since(
+        self,
+        mcp_server: Any,
+        client_session: ClientFactory,
+        mock_iterm2_for_mcp: MagicMock,
+    ) -> None:
+        """Test an unchanged layout returns a short unchanged result."""
+        async with client_session() as client:
+            result = await client.call_tool("list_sessions", {})
+            version = result.structuredContent["version"]
+
+            result = await client.call_tool(
+                "list_sessions", {"if_changed_since": version}
+            )
+            assert result.structuredContent == {
+                "changed": False,
+                "version": version,
+                "sessions": [],
+            }
+
+            result = await client.call_tool(
+                "list_sessions", {"if_changed_since": "stale"}
+            )
+            assert result.structuredContent["changed"] is True
+            assert len(result.structuredContent["sessions"]) == 1
+
+
+class TestFocusSessionByDirectory:
+    """Test the focus_session_by_directory tool."""
+
+    @skip_if_no_mcp
+    @pytest.mark.anyio
+    async def test_focuses_deepest_session(
+        self,
+        mcp_server: Any,
+        client_session: ClientFactory,
+        mock_iterm2_for_mcp: MagicMock,
+    ) -> None:
+        """Test the session under the directory is focused."""
+        mock_app = await mock_iterm2_for_mcp.async_get_app()
+        session = mock_app.terminal_windows[0].tabs[0].sessions[0]
+        session.async_get_variable = AsyncMock(
+            side_effect=lambda var: "/src/api/server" if var == "path" else None
+        )
+
+        async with client_session() as client:
+            found = await client.call_tool(
+                "focus_session_by_directory", {"directory": "/src/api"}
+            )
+            missing = await client.call_tool(
+                "focus_session_by_directory", {"directory": "/elsewhere"}
+            )
+
+        assert found.structuredContent["success"] is True
+        assert found.structuredContent["session_id"] == session.session_id
+        session.async_activate.assert_awaited()
+        assert missing.structuredContent["success"] is False
+        assert missing.structuredContent["message"] == "No session under /elsewhere"
+
+
+class TestFocusSessionByProcess:
+    """Test the focus_session_by_process tool."""
+
+    @skip_if_no_mcp
+    @pytest.mark.anyio
+    async def test_focuses_session_by_tty_and_validates_arguments(
+        self,
+        mcp_server: Any,
+        client_session: ClientFactory,
+        mock_iterm2_for_mcp: MagicMock,
+    ) -> None:
+        """Test the owning session is focused and bad arguments are rejected."""
+        mock_app = await mock_iterm2_for_mcp.async_get_app()
+        session = mock_app.terminal_windows[0].tabs[0].sessions[0]
+        session.async_get_variable = AsyncMock(
+            side_effect=lambda var: {"tty": "/dev/ttys004", "pid": 40}.get(var)
+        )
+
+        async with client_session() as client:
+            found = await client.call_tool(
+                "focus_session_by_process", {"tty": "ttys004"}
+            )
+            invalid = await client.call_tool("focus_session_by_process", {})
+
+        assert found.structuredContent["success"] is True
+        assert found.structuredContent["session_id"] == session.session_id
+        assert invalid.structuredContent["success"] is False
+        assert invalid.structuredContent["message"] == "Give exactly one of pid or tty"
+
+
+class TestFocusSessionByJob:
+    """Test the focus_session_by_job tool."""
+
+    @skip_if_no_mcp
+    @pytest.mark.anyio
+    async def test_focuses_session_running_job(
+        self,
+        mcp_server: Any,
+        client_session: ClientFactory,
+        mock_iterm2_for_mcp: MagicMock,
+    ) -> None:
+        """Test the session running the job is focused."""
+        mock_app = await mock_iterm2_for_mcp.async_get_app()
+        session = mock_app.terminal_windows[0].tabs[0].sessions[0]
+        session.async_get_variable = AsyncMock(
+            side_effect=lambda var: {"jobName": "make", "commandLine": "make"}.get(var)
+        )
+
+        async with client_session() as client:
+            found = await client.call_tool("focus_session_by_job", {"job": "make"})
+            missing = await client.call_tool("focus_session_by_job", {"job": "npm"})
+
+        assert found.structuredContent["success"] is True
+        assert found.structuredContent["session_id"] == session.session_id
+        assert missing.structuredContent["success"] is False
+        assert missing.structuredContent["message"] == "No session is running npm"
+
+
+class TestSearchScrollback:
+    """Test the search_scrollback tool."""
+
+    @skip_if_no_mcp
+    @pytest.mark.anyio
+    async def test_returns_matches_and_focuses_best(
+        self,
+        mcp_server: Any,
+        client_session: ClientFactory,
+        mock_iterm2_for_mcp: MagicMock,
+    ) -> None:
+        """Test matching lines are returned and the best one focused."""
+        mock_app = await mock_iterm2_for_mcp.async_get_app()
+        session = mock_app.terminal_windows[0].tabs[0].sessions[0]
+        rows = [
+            SimpleNamespace(string=text, hard_eol=True)
+            for text in ("error: one", "ok", "error: two")
+        ]
+        session.async_get_line_info = AsyncMock(
+            return_value=SimpleNamespace(
+                overflow=0, scrollback_buffer_height=3, mutable_area_height=0
+            )
+        )
+        session.async_get_contents = AsyncMock(
+            side_effect=lambda first, count: rows[first : first + count]
+        )
+
+        async with client_session() as client:
+            result = await client.call_tool(
+                "search_scrollback",
+                {"pattern": "error", "max_matches": 1, "focus_best": True},
+            )
+
+        content = result.structuredContent
+        assert [m["text"] for m in content["matches"]] == ["error: two"]
+        assert content["complete"] is False
+        assert content["focused"]["success"] is True
+        assert content["focused"]["session_id"] == session.session_id
+
+
+class TestReadSession:
+    """Test the read_session tool."""
+
+    @skip_if_no_mcp
+    @pytest.mark.anyio
+    async def test_reads_lines_and_follows_with_since(
+        self,
+        mcp_server: Any,
+        client_session: ClientFactory,
+        mock_iterm2_for_mcp: MagicMock,
+    ) -> None:
+        """Test lines are returned and a repeat read returns only new ones."""
+        mock_app = await mock_iterm2_for_mcp.async_get_app()
+        session = mock_app.terminal_windows[0].tabs[0].sessions[0]
+        rows = ["$ make", "ok"]
+        session.async_get_line_info = AsyncMock(
+            side_effect=lambda: SimpleNamespace(
+                overflow=0, scrollback_buffer_height=0, mutable_area_height=len(rows)
+            )
+        )
+        session.async_get_contents = AsyncMock(
+            side_effect=lambda first, count: [
+                SimpleNamespace(string=row) for row in rows[first : first + count]
+            ]
+        )
+
+        async with client_session() as client:
+            first = await client.call_tool(
+                "read_session", {"session_id": session.session_id}
+            )
+            rows.append("done")
+            second = await client.call_tool(
+                "read_session",
+                {
+                    "session_id": session.session_id,
+                    "since": first.structuredContent["result"]["token"],
+                },
+            )
+
+        lines = first.structuredContent["result"]["lines"]
+        assert [line["text"] for line in lines] == ["$ make", "ok"]
+        assert second.structuredContent["result"]["lines"] == [
+            {"line": 2, "text": "done"}
+        ]
+
+
+class TestWaitForOutput:
+    """Test the wait_for_output tool."""
+
+    @skip_if_no_mcp
+    @pytest.mark.anyio
+    async def test_returns_match_and_focuses(
+        self,
+        mcp_server: Any,
+        client_session: ClientFactory,
+        mock_iterm2_for_mcp: MagicMock,
+    ) -> None:
+        """Test the match is returned and the session focused on request."""
+        mock_app = await mock_iterm2_for_mcp.async_get_app()
+        session = mock_app.terminal_windows[0].tabs[0].sessions[0]
+        match = Match(session.session_id, 4, 0, "12 passed", 3, 9)
+
+        with patch(
+            "iterm2_focus.mcp.tools.iterm_tools.wait_for_session_output",
+            AsyncMock(return_value=match),
+        ):
+            async with client_session() as client:
+                result = await client.call_tool(
+                    "wait_for_output",
+                    {
+                        "session_id": session.session_id,
+                        "pattern": "passed|failed",
+                        "focus": True,
+                    },
+                )
+
+        content = result.structuredContent
+        assert content["matched"] is True
+        assert content["match"]["text"] == "12 passed"
+        assert content["focused"]["success"] is True
+        session.async_activate.assert_awaited_once()
+
+    @skip_if_no_mcp
+    @pytest.mark.anyio
+    async def test_reports_timeout(
+        self, mcp_server: Any, client_session: ClientFactory
+    ) -> None:
+        """Test a wait that times out reports no match."""
+        with patch(
+            "iterm2_focus.mcp.tools.iterm_tools.wait_for_session_output",
+            AsyncMock(side_effect=FocusTimeoutError(1.0)),
+        ):
+            async with client_session() as client:
+                result = await client.call_tool(
+                    "wait_for_output",
+                    {"session_id": "abc", "pattern": "done", "timeout": 1.0},
+                )
+
+        content = result.structuredContent
+        assert content["matched"] is False
+        assert content["match"] is None
+        assert "No output matched done" in content["message"]
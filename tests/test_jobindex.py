@@ -0,0 +1,124 @@
+"""Tests for jobindex module."""
+
+import asyncio
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from iterm2_focus.errors import FocusTimeoutError
+from iterm2_focus.jobindex import JobIndex, find_session_by_job, job_monitor
+from iterm2_focus.topology import TopologySnapshot
+from tests.conftest import AppFactory
+
+
+def test_index_matches_names_substrings_and_globs() -> None:
+    """Test queries match job names exactly, else command lines."""
+    index = JobIndex(
+        [
+            ("a", {"jobName": "Python", "commandLine": "python -m pytest -x"}),
+            ("b", {"jobName": "make", "commandLine": "make integration-test"}),
+            ("c", {"jobName": "zsh", "commandLine": "-zsh"}),
+        ]
+    )
+
+    assert index.find("make") == "b"
+    assert index.find("python") == "a"
+    assert index.find("PYTEST") == "a"
+    assert index.find("make *test") == "b"
+    assert index.find("cargo") is None
+    assert index.find("  ") is None
+
+
+def test_index_prefers_the_latest_job() -> None:
+    """Test the session whose job changed most recently wins."""
+    index = JobIndex(
+        [
+            ("a", {"jobName": "pytest", "commandLine": "pytest tests"}),
+            ("b", {"jobName": "pytest", "commandLine": "pytest -x"}),
+        ]
+    )
+    assert index.find("pytest") == "b"
+
+    # Same job again (e.g., only one variable was re-read): no reordering
+    index.update("b", {"jobName": "pytest", "commandLine": "pytest -x"})
+    assert index.find("pytest") == "b"
+
+    index.update("a", {"jobName": "pytest", "commandLine": "pytest tests -k slow"})
+    assert index.find("pytest") == "a"
+
+    index.update("a", {"jobName": "zsh", "commandLine": "-zsh"})
+    index.remove("b")
+    assert index.find("pytest") is None
+    assert index.by_name == {"zsh": {"a": 3}}
+
+
+@pytest.mark.asyncio
+async def test_find_session_by_job_fetches_once(make_app: AppFactory) -> None:
+    """Test a lookup without the monitor fetches every session once."""
+    app = make_app(
+        {
+            "a": {"jobName": "zsh", "commandLine": "-zsh"},
+            "b": {"jobName": "cargo", "commandLine": "cargo build --release"},
+        }
+    )
+    snapshot = TopologySnapshot.from_app(app)
+
+    assert await find_session_by_job("cargo", snapshot=snapshot) == "b"
+    assert await find_session_by_job("npm", snapshot=snapshot) is None
+
+
+@pytest.mark.asyncio
+async def test_job_monitor_follows_job_changes(make_app: AppFactory) -> None:
+    """Test a running monitor answers from the jobs it follows."""
+    app = make_app({"a": {"jobName": "zsh", "commandLine": "-zsh"}})
+    snapshot = TopologySnapshot.from_app(app)
+    changes: dict[str, asyncio.Queue[str]] = {
+        "jobName": asyncio.Queue(),
+        "commandLine": asyncio.Queue(),
+    }
+
+    def monitor(connection: Any, scope: Any, name: str, session_id: str) -> MagicMock:
+        mock = MagicMock()
+        mock.__aenter__ = AsyncMock(return_value=mock)
+        mock.__aexit__ = AsyncMock(return_value=False)
+        mock.async_get = changes[name].get
+        return mock
+
+    with patch("iterm2_focus.monitor.VariableMonitor", side_effect=monitor):
+        assert await job_monitor.async_start(snapshot) is True
+        try:
+            assert await find_session_by_job("pytest", snapshot=snapshot) is None
+
+            await changes["jobName"].put("Python")
+            await changes["commandLine"].put("python -m pytest")
+            await asyncio.sleep(0)
+
+            assert await find_session_by_job("pytest", snapshot=snapshot) == "a"
+            session = app.terminal_windows[0].tabs[0].sessions[0]
+            assert session.async_get_variable.await_count == 2
+        finally:
+            await job_monitor.async_stop()
+
+    assert len(job_monitor.index) == 0
+
+
+@pytest.mark.asyncio
+async def test_job_monitor_timeout_is_not_retried(make_app: AppFactory) -> None:
+    """Test a sync that misses the deadline times out instead of refetching."""
+    app = make_app({"a": {"jobName": "pytest", "commandLine": "pytest"}})
+    snapshot = TopologySnapshot.from_app(app)
+    job_monitor.variables._connection = app.connection
+
+    async def hang(snapshot: TopologySnapshot) -> bool:
+        await asyncio.Event().wait()
+        return True
+
+    with (
+        patch.object(job_monitor, "async_sync", hang),
+        pytest.raises(FocusTimeoutError),
+    ):
+        await find_session_by_job("pytest", timeout=0.01, snapshot=snapshot)
+
+    session = app.terminal_windows[0].tabs[0].sessions[0]
+    session.async_get_variable.assert_not_called()
@@ -0,0 +1,62 @@
+"""Tests for matcher module."""
+
+import asyncio
+import re
+from unittest.mock import patch
+
+import pytest
+
+from iterm2_focus import matcher
+from iterm2_focus.matcher import _chunks, match_lines
+
+LINES = [f"{i}: {'error' if i % 7 == 0 else 'ok'} in step {i}" for i in range(200)]
+EXPECTED = [(i, len(str(i)) + 2, len(str(i)) + 7) for i in range(0, 200, 7)]
+
+
+def test_chunks_cover_every_line_once() -> None:
+    """Test lines are split into newline-joined chunks at their boundaries."""
+    with patch("iterm2_focus.matcher.CHUNK_CHARS", 100):
+        chunks = _chunks(LINES)
+
+    assert len(chunks) > 1
+    rebuilt = [line for _, text in chunks for line in text.split("\n")]
+    assert rebuilt == LINES
+    assert [base for base, _ in chunks] == sorted({base for base, _ in chunks})
+
+
+@pytest.mark.asyncio
+async def test_small_inputs_are_matched_inline() -> None:
+    """Test matching below the threshold does not start workers."""
+    with patch("iterm2_focus.matcher._get_pool") as get_pool:
+        assert await match_lines(re.compile("error"), LINES) == EXPECTED
+        assert await match_lines(re.compile(""), []) == []
+
+    get_pool.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_large_inputs_are_matched_in_worker_processes() -> None:
+    """Test chunks matched in the process pool are merged in line order."""
+    try:
+        with (
+            patch("iterm2_focus.matcher.OFFLOAD_CHARS", 0),
+            patch("iterm2_focus.matcher.CHUNK_CHARS", 1000),
+        ):
+            assert await match_lines(re.compile("error"), LINES) == EXPECTED
+    finally:
+        matcher._discard_pool()
+
+
+@pytest.mark.asyncio
+async def test_falls_back_to_a_thread_without_worker_processes() -> None:
+    """Test matching still works when processes cannot be started."""
+    with (
+        patch("iterm2_focus.matcher.OFFLOAD_CHARS", 0),
+        patch("iterm2_focus.matcher._get_pool", side_effect=OSError("no sem_open")),
+        patch(
+            "iterm2_focus.matcher.asyncio.to_thread", wraps=asyncio.to_thread
+        ) as to_thread,
+    ):
+        assert await match_lines(re.compile("error"), LINES) == EXPECTED
+
+    to_thread.assert_awaited()
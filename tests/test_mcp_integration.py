@@ -1,8 +1,11 @@
 """Integration tests for iterm2-focus MCP server."""
 
+from typing import Any
+from unittest.mock import MagicMock
+
 import pytest
 
-from tests.conftest import MCP_TEST_AVAILABLE, skip_if_no_mcp
+from tests.conftest import MCP_TEST_AVAILABLE, ClientFactory, skip_if_no_mcp
 
 if MCP_TEST_AVAILABLE:
     from iterm2_focus.mcp.__main__ import main as mcp_main
@@ -18,11 +21,11 @@ class TestMCPIntegration:
         async with client_session() as client:
             # Step 1: List all sessions
             result = await client.list_tools()
-            assert len(result.tools) == 3
+            assert len(result.tools) == 9
 
             # Step 2: Get list of sessions
             result = await client.call_tool("list_sessions", {})
-            sessions = result.structuredContent["result"]
+            sessions = result.structuredContent["sessions"]
             assert len(sessions) > 0
 
             # Remember the first session
@@ -68,9 +71,7 @@ class TestMCPIntegration:
         session2 = mock_iterm2_for_mcp.MagicMock()
         session2.session_id = "w1t0p0:second-window-session"
         session2.async_activate = AsyncMock()
-        session2.async_get_profile = AsyncMock(
-            return_value={"Title": "Window 2 Session", "Name": "W2S1"}
-        )
+        session2.async_get_variable = AsyncMock(return_value="W2S1")
 
         tab2.sessions = [session2]
         window2.tabs = [tab2]
@@ -83,7 +84,7 @@ class TestMCPIntegration:
         async with client_session() as client:
             # List all sessions across windows
             result = await client.call_tool("list_sessions", {})
-            sessions = result.structuredContent["result"]
+            sessions = result.structuredContent["sessions"]
 
             # Should have sessions from both windows
             assert len(sessions) == 2
@@ -111,7 +112,7 @@ class TestMCPIntegration:
         async with client_session() as client:
             # First call succeeds
             result = await client.call_tool("list_sessions", {})
-            sessions = result.structuredContent["result"]
+            sessions = result.structuredContent["sessions"]
             assert len(sessions) == 1
 
             # Make connection fail for next call
@@ -121,7 +122,7 @@ class TestMCPIntegration:
 
             # List sessions should return empty list
             result = await client.call_tool("list_sessions", {})
-            sessions = result.structuredContent["result"]
+            sessions = result.structuredContent["sessions"]
             assert sessions == []
 
             # Focus should fail gracefully
@@ -140,7 +141,7 @@ class TestMCPIntegration:
 
             # Should work again
             result = await client.call_tool("list_sessions", {})
-            sessions = result.structuredContent["result"]
+            sessions = result.structuredContent["sessions"]
             assert len(sessions) == 1
 
     @skip_if_no_mcp
@@ -189,7 +190,7 @@ class TestMCPIntegration:
         async with client_session() as client:
             # List sessions should return empty
             result = await client.call_tool("list_sessions", {})
-            sessions = result.structuredContent["result"]
+            sessions = result.structuredContent["sessions"]
             assert sessions == []
 
             # Get current should return None
@@ -204,3 +205,22 @@ class TestMCPIntegration:
             focus_result = result.structuredContent
             assert focus_result["success"] is False
             assert "not found" in focus_result["message"]
+
+    @skip_if_no_mcp
+    @pytest.mark.anyio
+    async def test_coalescing_stats_resource(
+        self,
+        mcp_server: Any,
+        client_session: ClientFactory,
+        mock_iterm2_for_mcp: MagicMock,
+    ) -> None:
+        """Test coalescing counters are exposed as a resource."""
+        import json
+
+        async with client_session() as client:
+            await client.call_tool("list_sessions", {})
+            result = await client.read_resource("iterm2-focus://stats/coalescing")
+
+            stats = json.loads(result.contents[0].text)
+            assert stats["mcp.list_sessions"]["executed"] >= 1
+            assert "coalesced" in stats["mcp.list_sessions"]
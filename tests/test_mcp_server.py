@@ -1,8 +1,11 @@
 """Tests for the iterm2-focus MCP server."""
 
+from typing import Any
+from unittest.mock import MagicMock
+
 import pytest
 
-from tests.conftest import MCP_TEST_AVAILABLE, skip_if_no_mcp
+from tests.conftest import MCP_TEST_AVAILABLE, ClientFactory, skip_if_no_mcp
 
 if MCP_TEST_AVAILABLE:
     from iterm2_focus.mcp import MCP_AVAILABLE
@@ -32,12 +35,22 @@ class TestMCPServer:
         async with client_session() as client:
             tools = await client.list_tools()
 
-            # Check that we have exactly 3 tools
-            assert len(tools.tools) == 3
+            # Check that we have exactly 9 tools
+            assert len(tools.tools) == 9
 
             # Check tool names
             tool_names = {tool.name for tool in tools.tools}
-            expected_tools = {"list_sessions", "focus_session", "get_current_session"}
+            expected_tools = {
+                "list_sessions",
+                "focus_session",
+                "focus_session_by_directory",
+                "focus_session_by_process",
+                "focus_session_by_job",
+                "search_scrollback",
+                "read_session",
+                "wait_for_output",
+                "get_current_session",
+            }
             assert tool_names == expected_tools
 
     @skip_if_no_mcp
@@ -111,9 +124,13 @@ class TestMCPServer:
             # Should return empty list on error via structured content
             assert (
                 result.isError is False
-            )  # Tool returns [] on error, not an error result
+            )  # Tool returns no sessions on error, not an error result
             assert result.structuredContent is not None
-            assert result.structuredContent == {"result": []}
+            assert result.structuredContent == {
+                "changed": True,
+                "version": None,
+                "sessions": [],
+            }
 
     @skip_if_no_mcp
     @pytest.mark.anyio
@@ -130,3 +147,33 @@ class TestMCPServer:
                 "unknown tool" in error_content.text.lower()
                 or "not found" in error_content.text.lower()
             )
+
+    @skip_if_no_mcp
+    @pytest.mark.anyio
+    async def test_tool_error_when_breaker_open(
+        self,
+        mcp_server: Any,
+        client_session: ClientFactory,
+        mock_iterm2_for_mcp: MagicMock,
+    ) -> None:
+        """Test tools fail fast with a clear error while iTerm2 is down."""
+        from iterm2_focus.connection import circuit_breaker
+
+        for _ in range(circuit_breaker.failure_threshold):
+            circuit_breaker.record_failure()
+
+        async with client_session() as client:
+            result = await client.call_tool("list_sessions", {})
+            assert result.isError is True
+            assert "iTerm2 API unavailable" in result.content[0].text
+
+            result = await client.call_tool("get_current_session", {})
+            assert result.isError is True
+
+            result = await client.call_tool(
+                "focus_session", {"session_id": "any-session"}
+            )
+            assert result.structuredContent["success"] is False
+            assert "iTerm2 API unavailable" in result.structuredContent["message"]
+
+        mock_iterm2_for_mcp.Connection.async_create.assert_not_called()
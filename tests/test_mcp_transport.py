@@ -0,0 +1,272 @@
+"""Tests for the MCP HTTP transports."""
+
+import asyncio
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+
+from tests.conftest import MCP_TEST_AVAILABLE, skip_if_no_mcp
+
+if MCP_TEST_AVAILABLE:
+    from mcp.server.fastmcp import FastMCP
+    from mcp.shared.memory import create_connected_server_and_client_session
+    from mcp.types import TextContent
+
+    from iterm2_focus.mcp.__main__ import main as mcp_main
+    from iterm2_focus.mcp.transport import (
+        ConcurrencyLimiter,
+        ConcurrencyLimitMiddleware,
+        limit_tool_calls,
+        run_http,
+    )
+
+
+def _http_scope(session_id: str | None = None, method: str = "POST") -> dict[str, Any]:
+    """Build a minimal ASGI HTTP scope."""
+    headers: list[tuple[bytes, bytes]] = []
+    if session_id is not None:
+        headers.append((b"mcp-session-id", session_id.encode()))
+    return {
+        "type": "http",
+        "method": method,
+        "headers": headers,
+        "query_string": b"",
+        "client": ("127.0.0.1", 50000),
+    }
+
+
+async def _receive() -> dict[str, Any]:
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+class TestConcurrencyLimitMiddleware:
+    """Test the connection-level concurrency limits."""
+
+    @skip_if_no_mcp
+    @pytest.mark.anyio
+    async def test_global_limit(self) -> None:
+        """Never more than max_concurrency requests run at once."""
+        running = 0
+        peak = 0
+
+        async def app(scope: Any, receive: Any, send: Any) -> None:
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        async def send(message: Any) -> None:
+            pass
+
+        middleware = ConcurrencyLimitMiddleware(
+            app, max_concurrency=2, client_concurrency=2, request_timeout=None
+        )
+        await asyncio.gather(
+            *[middleware(_http_scope(f"client-{i}"), _receive, send) for i in range(6)]
+        )
+
+        assert peak == 2
+
+    @skip_if_no_mcp
+    @pytest.mark.anyio
+    async def test_per_client_limit(self) -> None:
+        """A busy client cannot take more than its share of slots."""
+        running: dict[str, int] = {}
+        peak: dict[str, int] = {}
+
+        async def app(scope: Any, receive: Any, send: Any) -> None:
+            client = dict(scope["headers"])[b"mcp-session-id"].decode()
+            running[client] = running.get(client, 0) + 1
+            peak[client] = max(peak.get(client, 0), running[client])
+            await asyncio.sleep(0.01)
+            running[client] -= 1
+
+        async def send(message: Any) -> None:
+            pass
+
+        middleware = ConcurrencyLimitMiddleware(
+            app, max_concurrency=8, client_concurrency=1, request_timeout=None
+        )
+        await asyncio.gather(
+            *[middleware(_http_scope("greedy"), _receive, send) for _ in range(4)],
+            middleware(_http_scope("other"), _receive, send),
+        )
+
+        assert peak == {"greedy": 1, "other": 1}
+        # Idle clients are forgotten
+        assert middleware.limiter._clients == {}
+
+    @skip_if_no_mcp
+    @pytest.mark.anyio
+    async def test_request_timeout(self) -> None:
+        """Requests exceeding the timeout get a 504."""
+        sent: list[dict[str, Any]] = []
+
+        async def app(scope: Any, receive: Any, send: Any) -> None:
+            await asyncio.sleep(1)
+
+        async def send(message: Any) -> None:
+            sent.append(message)
+
+        middleware = ConcurrencyLimitMiddleware(app, request_timeout=0.01)
+        await middleware(_http_scope("client"), _receive, send)
+
+        assert sent[0]["type"] == "http.response.start"
+        assert sent[0]["status"] == 504
+        assert sent[1]["body"] == b"Request timed out"
+
+    @skip_if_no_mcp
+    @pytest.mark.anyio
+    async def test_streams_are_not_limited(self) -> None:
+        """GET event streams bypass the limits and the timeout."""
+        calls = 0
+
+        async def app(scope: Any, receive: Any, send: Any) -> None:
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.02)
+
+        async def send(message: Any) -> None:
+            pass
+
+        middleware = ConcurrencyLimitMiddleware(
+            app, max_concurrency=1, client_concurrency=1, request_timeout=0.01
+        )
+        await asyncio.gather(
+            middleware(_http_scope("client", method="GET"), _receive, send),
+            middleware(_http_scope("client", method="GET"), _receive, send),
+        )
+
+        assert calls == 2
+
+    @skip_if_no_mcp
+    def test_invalid_limits(self) -> None:
+        """Limits below one are rejected."""
+
+        async def app(scope: Any, receive: Any, send: Any) -> None:
+            pass
+
+        with pytest.raises(ValueError):
+            ConcurrencyLimitMiddleware(app, max_concurrency=0)
+
+
+class TestRunServer:
+    """Test transport selection."""
+
+    @skip_if_no_mcp
+    def test_stdio_is_default(self) -> None:
+        """main() runs the stdio transport by default."""
+        with (
+            patch("iterm2_focus.mcp.__main__.mcp.run") as mock_run,
+            patch("iterm2_focus.mcp.__main__.run_http") as mock_http,
+        ):
+            mcp_main()
+
+        mock_run.assert_called_once_with()
+        mock_http.assert_not_called()
+
+    @skip_if_no_mcp
+    def test_http_transport(self) -> None:
+        """main() hands HTTP transports to run_http with the limits."""
+        with patch("iterm2_focus.mcp.__main__.run_http") as mock_http:
+            mcp_main("streamable-http", port=9000, max_concurrency=3)
+
+        mock_http.assert_called_once()
+        assert mock_http.call_args.args == ("streamable-http",)
+        assert mock_http.call_args.kwargs["port"] == 9000
+        assert mock_http.call_args.kwargs["max_concurrency"] == 3
+
+    @skip_if_no_mcp
+    def test_http_wraps_app_with_limits(self) -> None:
+        """run_http serves streamable HTTP wrapped in the concurrency middleware."""
+        with patch("uvicorn.run") as mock_uvicorn:
+            run_http("streamable-http", port=9001, client_concurrency=2)
+
+        app = mock_uvicorn.call_args.args[0]
+        assert isinstance(app, ConcurrencyLimitMiddleware)
+        assert app.limiter.client_concurrency == 2
+        assert mock_uvicorn.call_args.kwargs["host"] == "127.0.0.1"
+        assert mock_uvicorn.call_args.kwargs["port"] == 9001
+
+    @skip_if_no_mcp
+    def test_sse_limits_tool_calls(self) -> None:
+        """run_http limits SSE tool calls, whose POSTs return before they run."""
+        with (
+            patch("uvicorn.run") as mock_uvicorn,
+            patch("iterm2_focus.mcp.transport.limit_tool_calls") as mock_limit,
+        ):
+            run_http("sse", max_concurrency=3, request_timeout=5)
+
+        app = mock_uvicorn.call_args.args[0]
+        assert not isinstance(app, ConcurrencyLimitMiddleware)
+        limiter = mock_limit.call_args.args[1]
+        assert limiter.max_concurrency == 3
+        assert mock_limit.call_args.args[2] == 5
+
+    @skip_if_no_mcp
+    def test_non_loopback_host_rejected(self) -> None:
+        """HTTP transports refuse to bind to non-loopback addresses."""
+        with pytest.raises(ValueError, match="loopback"):
+            run_http("streamable-http", host="0.0.0.0")
+
+
+class TestLimitToolCalls:
+    """Test the limits applied around tool dispatch."""
+
+    @skip_if_no_mcp
+    @pytest.mark.anyio
+    async def test_limits_tool_calls_per_session(self) -> None:
+        """Tool calls of one MCP session are bounded while they run."""
+        server = FastMCP("test")
+        running = 0
+        peak = 0
+
+        @server.tool()
+        async def slow() -> str:
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return "done"
+
+        limiter = ConcurrencyLimiter(max_concurrency=4, client_concurrency=1)
+        limit_tool_calls(server, limiter, request_timeout=None)
+        # Applying the limits again replaces them rather than nesting
+        limit_tool_calls(server, limiter, request_timeout=None)
+
+        async with create_connected_server_and_client_session(
+            server._mcp_server
+        ) as client:
+            results = await asyncio.gather(
+                *[client.call_tool("slow", {}) for _ in range(3)]
+            )
+
+        assert [result.isError for result in results] == [False] * 3
+        assert peak == 1
+        assert limiter._clients == {}
+
+    @skip_if_no_mcp
+    @pytest.mark.anyio
+    async def test_slow_tool_call_times_out(self) -> None:
+        """A tool call exceeding the timeout returns a tool error."""
+        server = FastMCP("test")
+
+        @server.tool()
+        async def hang() -> str:
+            await asyncio.sleep(1)
+            return "done"
+
+        limit_tool_calls(server, ConcurrencyLimiter(), request_timeout=0.01)
+
+        async with create_connected_server_and_client_session(
+            server._mcp_server
+        ) as client:
+            result = await client.call_tool("hang", {})
+
+        assert result.isError is True
+        content = result.content[0]
+        assert isinstance(content, TextContent)
+        assert content.text == "Request timed out"
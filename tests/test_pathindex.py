@@ -0,0 +1,137 @@
+"""Tests for pathindex module."""
+
+import asyncio
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from iterm2_focus.pathindex import (
+    PathTrie,
+    find_session_by_path,
+    focus_session_by_path,
+    path_index,
+)
+from iterm2_focus.topology import TopologySnapshot
+from tests.conftest import AppFactory
+
+
+def test_deepest_under_prefers_deeper_then_recent() -> None:
+    """Test the deepest session wins, then the most recently inserted."""
+    trie = PathTrie(
+        [
+            ("root", "/src/api"),
+            ("server", "/src/api/server"),
+            ("web", "/src/web/app/deep/er"),
+            ("tests", "/src/api/tests"),
+        ]
+    )
+
+    assert trie.deepest_under("/src/api") == "tests"
+    assert trie.deepest_under("/src/api/") == "tests"
+    assert trie.deepest_under("/src") == "web"
+    assert trie.deepest_under("/src/api/server") == "server"
+    assert trie.deepest_under("/src/ap") is None
+    assert trie.deepest_under("/other") is None
+
+
+def test_insert_moves_and_remove_prunes() -> None:
+    """Test a changed path replaces the old one and empty nodes are pruned."""
+    trie = PathTrie([("a", "/src/api/server"), ("b", "/src/api")])
+
+    trie.insert("a", "/tmp")
+    assert trie.deepest_under("/src/api") == "b"
+    assert trie.deepest_under("/tmp") == "a"
+
+    trie.remove("b")
+    trie.insert("a", None)
+    assert len(trie) == 0
+    assert "a" not in trie
+    assert trie._root.children == {}
+
+
+@pytest.mark.asyncio
+async def test_focus_session_by_path_fetches_paths_once(make_app: AppFactory) -> None:
+    """Test a lookup without the index fetches every path concurrently."""
+    app = make_app(
+        {
+            "a": {"path": "/src/api"},
+            "b": {"path": "/src/api/server"},
+            "c": {"path": "/tmp"},
+        }
+    )
+    snapshot = TopologySnapshot.from_app(app)
+
+    focused = await focus_session_by_path("/src/api", snapshot=snapshot)
+    missing = await find_session_by_path("/nowhere", snapshot=snapshot)
+
+    assert focused == "b"
+    assert missing is None
+    sessions = app.terminal_windows[0].tabs[0].sessions
+    sessions[1].async_activate.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_path_index_follows_path_changes(make_app: AppFactory) -> None:
+    """Test monitored path changes are reflected without refetching."""
+    app = make_app({"a": {"path": "/src/api"}, "b": {"path": "/src/web"}})
+    snapshot = TopologySnapshot.from_app(app)
+    changes: dict[str, asyncio.Queue[str]] = {
+        "a": asyncio.Queue(),
+        "b": asyncio.Queue(),
+    }
+
+    def monitor(connection: Any, scope: Any, name: str, session_id: str) -> MagicMock:
+        mock = MagicMock()
+        mock.__aenter__ = AsyncMock(return_value=mock)
+        mock.__aexit__ = AsyncMock(return_value=False)
+        mock.async_get = changes[session_id].get
+        return mock
+
+    with patch("iterm2_focus.monitor.VariableMonitor", side_effect=monitor):
+        await path_index.async_start(snapshot)
+        try:
+            assert await find_session_by_path("/src", snapshot=snapshot) == "b"
+
+            await changes["a"].put("/src/web/app")
+            await asyncio.sleep(0)
+            assert await find_session_by_path("/src/web", snapshot=snapshot) == "a"
+
+            # Closed sessions are dropped on the next sync
+            app.terminal_windows[0].tabs[0].sessions.pop(0)
+            smaller = TopologySnapshot.from_app(app)
+            assert await find_session_by_path("/src", snapshot=smaller) == "b"
+            assert "a" not in path_index.index
+
+            sessions = app.terminal_windows[0].tabs[0].sessions
+            assert sessions[0].async_get_variable.await_count == 1
+        finally:
+            await path_index.async_stop()
+
+    assert not path_index.running
+
+
+@pytest.mark.asyncio
+async def test_path_index_dropped_when_connection_closes(make_app: AppFactory) -> None:
+    """Test a closed connection empties the index without a callback."""
+    app = make_app({"a": {"path": "/src/api"}})
+    app.connection.websocket = SimpleNamespace(open=True)
+    snapshot = TopologySnapshot.from_app(app)
+
+    def monitor(connection: Any, scope: Any, name: str, session_id: str) -> MagicMock:
+        mock = MagicMock()
+        mock.__aenter__ = AsyncMock(return_value=mock)
+        mock.__aexit__ = AsyncMock(return_value=False)
+        mock.async_get = asyncio.Event().wait
+        return mock
+
+    with patch("iterm2_focus.monitor.VariableMonitor", side_effect=monitor):
+        await path_index.async_start(snapshot)
+        assert "a" in path_index.index
+
+        app.connection.websocket.open = False
+        assert not path_index.running
+        assert "a" not in path_index.index
+        # The fallback fetches the paths again
+        assert await find_session_by_path("/src", snapshot=snapshot) == "a"
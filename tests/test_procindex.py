@@ -0,0 +1,156 @@
+"""Tests for procindex module."""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from iterm2_focus.errors import FocusTimeoutError
+from iterm2_focus.procindex import (
+    ProcessIndex,
+    async_controlling_tty,
+    find_session_by_pid,
+    find_session_by_tty,
+    process_monitor,
+)
+from iterm2_focus.topology import TopologySnapshot
+from tests.conftest import AppFactory
+
+
+def test_index_by_tty_and_pid() -> None:
+    """Test sessions are found by device and by shell or job PID."""
+    index = ProcessIndex(
+        [
+            ("a", {"tty": "/dev/ttys001", "pid": 100, "jobPid": 150}),
+            ("b", {"tty": "ttys002", "pid": "200", "jobPid": None}),
+        ]
+    )
+
+    assert index.find_by_tty("ttys001") == "a"
+    assert index.find_by_tty("/dev/ttys002") == "b"
+    assert index.by_pid == {100: "a", 150: "a", 200: "b"}
+
+    # A new foreground job replaces the old one
+    index.update("a", {"tty": "/dev/ttys001", "pid": 100, "jobPid": 160})
+    assert 150 not in index.by_pid
+    assert index.by_pid[160] == "a"
+
+    index.remove("b")
+    assert index.find_by_tty("ttys002") is None
+    assert len(index) == 1
+
+
+def test_index_skips_unset_and_non_numeric_pids() -> None:
+    """Test PIDs that are unset or not numbers are left out."""
+    index = ProcessIndex(
+        [("a", {"tty": None, "pid": "unknown", "jobPid": True}), ("b", {"pid": " 7"})]
+    )
+
+    assert len(index) == 2
+    assert index.by_tty == {}
+    assert index.by_pid == {7: "b"}
+
+
+def _ps(table: dict[int, str]) -> Callable[..., Awaitable[MagicMock]]:
+    """Fake create_subprocess_exec answering `ps -o tty=,ppid= -p PID`."""
+
+    async def create(*args: Any, **kwargs: Any) -> MagicMock:
+        process = MagicMock()
+        output = table.get(int(args[-1]), "")
+        process.communicate = AsyncMock(return_value=(output.encode(), b""))
+        return process
+
+    return create
+
+
+@pytest.mark.asyncio
+async def test_controlling_tty_follows_parents() -> None:
+    """Test processes without a terminal are resolved through their parents."""
+    table = {
+        300: "?? 250\n",
+        250: "  ?   200\n",
+        200: "ttys002   1\n",
+        400: "?? 1\n",
+        500: "pts/3 1\n",
+    }
+
+    with patch(
+        "iterm2_focus.procindex.asyncio.create_subprocess_exec", side_effect=_ps(table)
+    ):
+        assert await async_controlling_tty(300) == "/dev/ttys002"
+        assert await async_controlling_tty(400) is None
+        assert await async_controlling_tty(500) == "/dev/pts/3"
+        assert await async_controlling_tty(999) is None
+
+
+@pytest.mark.asyncio
+async def test_find_session_by_pid_and_tty(make_app: AppFactory) -> None:
+    """Test lookups fetch the variables of every session once."""
+    app = make_app(
+        {
+            "a": {"tty": "/dev/ttys001", "pid": 100, "jobPid": 150},
+            "b": {"tty": "/dev/ttys002", "pid": 200, "jobPid": 200},
+        }
+    )
+    snapshot = TopologySnapshot.from_app(app)
+
+    with patch(
+        "iterm2_focus.procindex.asyncio.create_subprocess_exec",
+        side_effect=_ps({300: "ttys002 200\n"}),
+    ):
+        assert await find_session_by_pid(150, snapshot=snapshot) == "a"
+        assert await find_session_by_pid(300, snapshot=snapshot) == "b"
+        assert await find_session_by_pid(999, snapshot=snapshot) is None
+    assert await find_session_by_tty("ttys001", snapshot=snapshot) == "a"
+
+
+@pytest.mark.asyncio
+async def test_process_monitor_follows_job_changes(make_app: AppFactory) -> None:
+    """Test a running monitor answers from variables it follows."""
+    app = make_app({"a": {"tty": "/dev/ttys001", "pid": 100, "jobPid": 100}})
+    snapshot = TopologySnapshot.from_app(app)
+    job_changes: asyncio.Queue[int] = asyncio.Queue()
+
+    def monitor(connection: Any, scope: Any, name: str, session_id: str) -> MagicMock:
+        mock = MagicMock()
+        mock.__aenter__ = AsyncMock(return_value=mock)
+        mock.__aexit__ = AsyncMock(return_value=False)
+        mock.async_get = job_changes.get if name == "jobPid" else asyncio.Event().wait
+        return mock
+
+    with patch("iterm2_focus.monitor.VariableMonitor", side_effect=monitor):
+        assert await process_monitor.async_start(snapshot) is True
+        try:
+            await job_changes.put(175)
+            await asyncio.sleep(0)
+
+            assert await find_session_by_pid(175, snapshot=snapshot) == "a"
+            session = app.terminal_windows[0].tabs[0].sessions[0]
+            assert session.async_get_variable.await_count == 3
+        finally:
+            await process_monitor.async_stop()
+
+    assert len(process_monitor.index) == 0
+
+
+@pytest.mark.asyncio
+async def test_process_monitor_timeout_is_not_retried(make_app: AppFactory) -> None:
+    """Test a sync that misses the deadline times out instead of refetching."""
+    app = make_app({"a": {"tty": "/dev/ttys001", "pid": 100, "jobPid": 100}})
+    snapshot = TopologySnapshot.from_app(app)
+    process_monitor.variables._connection = app.connection
+
+    async def hang(snapshot: TopologySnapshot) -> bool:
+        await asyncio.Event().wait()
+        return True
+
+    with (
+        patch.object(process_monitor, "async_sync", hang),
+        pytest.raises(FocusTimeoutError),
+    ):
+        await find_session_by_tty("ttys001", timeout=0.01, snapshot=snapshot)
+
+    session = app.terminal_windows[0].tabs[0].sessions[0]
+    session.async_get_variable.assert_not_called()
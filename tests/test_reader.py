@@ -0,0 +1,218 @@
+"""Tests for reader module."""
+
+import asyncio
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from iterm2_focus.reader import (
+    OutputLine,
+    SessionOutput,
+    read_session,
+    wait_for_output,
+)
+from iterm2_focus.topology import TopologySnapshot, topology_tracker
+
+
+class _FakeSession:
+    """A session showing rows, the last screen of which are mutable."""
+
+    def __init__(self, rows: list[str], screen: int = 3, overflow: int = 0) -> None:
+        self.session_id = "abc"
+        self.rows = rows
+        self.screen = screen
+        self.overflow = overflow
+        self.async_get_line_info = AsyncMock(side_effect=self._line_info)
+        self.async_get_contents = AsyncMock(side_effect=self._contents)
+
+    async def _line_info(self) -> SimpleNamespace:
+        return SimpleNamespace(
+            overflow=self.overflow,
+            scrollback_buffer_height=len(self.rows) - self.screen,
+            mutable_area_height=self.screen,
+        )
+
+    async def _contents(self, first: int, count: int) -> list[SimpleNamespace]:
+        first -= self.overflow
+        return [SimpleNamespace(string=row) for row in self.rows[first : first + count]]
+
+
+def _snapshot(*sessions: _FakeSession) -> TopologySnapshot:
+    tab = MagicMock()
+    tab.tab_id = "tab1"
+    tab.sessions = list(sessions)
+    window = MagicMock()
+    window.window_id = "window1"
+    window.tabs = [tab]
+    app = MagicMock()
+    app.terminal_windows = [window]
+    return TopologySnapshot.from_app(app)
+
+
+def _texts(output: SessionOutput) -> list[str]:
+    return [line.text for line in output.lines]
+
+
+@pytest.mark.asyncio
+async def test_reads_newest_rows_and_pages_back() -> None:
+    """Test the newest rows are read and before pages through scrollback."""
+    session = _FakeSession([f"row {i}" for i in range(10)], overflow=100)
+    snapshot = _snapshot(session)
+
+    newest = await read_session("abc", lines=4, snapshot=snapshot)
+    assert newest is not None
+    assert newest.lines[0] == OutputLine(106, "row 6")
+    assert _texts(newest) == ["row 6", "row 7", "row 8", "row 9"]
+    assert newest.end == 110
+    assert newest.truncated is True
+
+    older = await read_session("abc", lines=4, before=106, snapshot=snapshot)
+    assert older is not None
+    assert _texts(older) == ["row 2", "row 3", "row 4", "row 5"]
+
+    oldest = await read_session("abc", lines=4, before=102, snapshot=snapshot)
+    assert oldest is not None
+    assert _texts(oldest) == ["row 0", "row 1"]
+    assert oldest.truncated is False
+
+    assert await read_session("missing", snapshot=snapshot) is None
+
+
+@pytest.mark.asyncio
+async def test_since_returns_only_new_and_changed_rows() -> None:
+    """Test repeat reads with since return only what changed."""
+    session = _FakeSession(["$ make", "building", "[  0%]", ""])
+    snapshot = _snapshot(session)
+
+    first = await read_session("abc", snapshot=snapshot)
+    assert first is not None
+    unchanged = await read_session("abc", since=first.token, snapshot=snapshot)
+    assert unchanged is not None
+    assert unchanged.lines == ()
+
+    # A progress line is rewritten in place and output scrolls the screen
+    session.rows[2] = "[100%]"
+    session.rows[3:] = ["done", "$", ""]
+    changed = await read_session("abc", since=unchanged.token, snapshot=snapshot)
+    assert changed is not None
+
+    assert [(line.line, line.text) for line in changed.lines] == [
+        (2, "[100%]"),
+        (3, "done"),
+        (4, "$"),
+        (5, ""),
+    ]
+    assert changed.truncated is False
+
+    session.rows += [f"line {i}" for i in range(10)]
+    limited = await read_session("abc", lines=3, since=changed.token, snapshot=snapshot)
+    assert limited is not None
+    assert _texts(limited) == ["line 7", "line 8", "line 9"]
+    assert limited.truncated is True
+
+
+@pytest.mark.asyncio
+async def test_unusable_tokens_reset_and_arguments_are_checked() -> None:
+    """Test a bad or outdated token falls back to the newest rows."""
+    session = _FakeSession([f"row {i}" for i in range(6)])
+    snapshot = _snapshot(session)
+    initial = await read_session("abc", snapshot=snapshot)
+    assert initial is not None
+    token = initial.token
+
+    garbage = await read_session("abc", lines=2, since="not a token", snapshot=snapshot)
+    assert garbage is not None
+    assert garbage.reset is True
+    assert _texts(garbage) == ["row 4", "row 5"]
+
+    session.rows = ["$"] * 3  # cleared
+    cleared = await read_session("abc", since=token, snapshot=snapshot)
+    assert cleared is not None
+    assert cleared.reset is True
+    assert _texts(cleared) == ["$"] * 3
+
+    with pytest.raises(ValueError):
+        await read_session("abc", before=3, since=token, snapshot=snapshot)
+    with pytest.raises(ValueError):
+        await read_session("abc", lines=0, snapshot=snapshot)
+
+
+def _streamer(updates: asyncio.Queue[None]) -> Any:
+    """Patch ScreenStreamer to deliver an update per item put in updates."""
+
+    def streamer(connection: Any, session_id: str, want_contents: bool) -> MagicMock:
+        mock = MagicMock()
+        mock.__aenter__ = AsyncMock(return_value=mock)
+        mock.__aexit__ = AsyncMock(return_value=False)
+        mock.async_get = updates.get
+        return mock
+
+    return patch("iterm2_focus.reader.ScreenStreamer", side_effect=streamer)
+
+
+async def _settle() -> None:
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_wait_for_output_matches_only_new_rows() -> None:
+    """Test output already on screen is ignored and new output matches."""
+    session = _FakeSession(["$ pytest", "3 passed", ""])
+    snapshot = _snapshot(session)
+    updates: asyncio.Queue[None] = asyncio.Queue()
+
+    with (
+        _streamer(updates),
+        patch("iterm2_focus.reader.async_track_changes", AsyncMock()),
+    ):
+        waiting = asyncio.create_task(
+            wait_for_output("abc", "passed|failed", snapshot=snapshot)
+        )
+        await _settle()
+        session.rows[2:] = ["collecting", ""]
+        await updates.put(None)
+        await _settle()
+        assert not waiting.done()
+
+        session.rows[3:] = ["5 passed", "$"]
+        await updates.put(None)
+        match = await asyncio.wait_for(waiting, 1)
+        assert match is not None
+
+    assert (match.line, match.text, match.start, match.end) == (3, "5 passed", 2, 8)
+    assert match.lines_below == 1
+
+
+@pytest.mark.asyncio
+async def test_wait_for_output_since_and_closed_session() -> None:
+    """Test since checks earlier output first and a closed session ends it."""
+    session = _FakeSession(["$ make", ""], screen=2)
+    snapshot = _snapshot(session)
+    initial = await read_session("abc", snapshot=snapshot)
+    assert initial is not None
+    token = initial.token
+    session.rows[1:] = ["Error 2", "$"]
+
+    with (
+        _streamer(asyncio.Queue()),
+        patch("iterm2_focus.reader.async_track_changes", AsyncMock()),
+        patch(
+            "iterm2_focus.reader.async_get_snapshot",
+            AsyncMock(return_value=_snapshot()),
+        ),
+    ):
+        match = await wait_for_output("abc", "Error", since=token, snapshot=snapshot)
+        assert match is not None
+        assert match.text == "Error 2"
+
+        waiting = asyncio.create_task(
+            wait_for_output("abc", "never", snapshot=snapshot)
+        )
+        await _settle()
+        topology_tracker._changed()
+        assert await asyncio.wait_for(waiting, 1) is None
+
+    assert await wait_for_output("missing", "x", snapshot=snapshot) is None
@@ -0,0 +1,151 @@
+"""Tests for rpc module."""
+
+import asyncio
+from contextlib import aclosing
+
+import pytest
+
+from iterm2_focus.rpc import RPCLimiter, deadline_after, gather_until, iter_until
+
+
+@pytest.mark.asyncio
+async def test_limiter_bounds_concurrency() -> None:
+    """Test no more than `limit` RPCs run at once."""
+    limiter = RPCLimiter(limit=2)
+    running = 0
+    peak = 0
+
+    async def fake_rpc() -> None:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    await asyncio.gather(*[limiter.call(fake_rpc()) for _ in range(6)])
+
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_limiter_cancelled_while_queued() -> None:
+    """Test an RPC cancelled while waiting for a slot never starts."""
+    limiter = RPCLimiter(limit=1)
+    started: list[str] = []
+    release = asyncio.Event()
+
+    async def fake_rpc(name: str) -> None:
+        started.append(name)
+        await release.wait()
+
+    first = asyncio.create_task(limiter.call(fake_rpc("first")))
+    await asyncio.sleep(0)
+    queued = asyncio.create_task(limiter.call(fake_rpc("queued")))
+    await asyncio.sleep(0)
+    queued.cancel()
+    release.set()
+    await first
+
+    with pytest.raises(asyncio.CancelledError):
+        await queued
+    assert started == ["first"]
+
+
+def test_limiter_rejects_invalid_limit() -> None:
+    """Test limits below one are rejected."""
+    limiter = RPCLimiter()
+    with pytest.raises(ValueError):
+        limiter.limit = 0
+
+
+@pytest.mark.asyncio
+async def test_gather_until_returns_partial_results() -> None:
+    """Test slow awaitables are cancelled at the deadline."""
+    cancelled = False
+
+    async def fast() -> str:
+        return "fast"
+
+    async def slow() -> str:
+        nonlocal cancelled
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        return "slow"
+
+    results = await gather_until([fast(), slow(), fast()], deadline_after(0.02))
+
+    assert results == ["fast", None, "fast"]
+    assert cancelled is True
+
+
+@pytest.mark.asyncio
+async def test_gather_until_without_deadline() -> None:
+    """Test all results are returned when there is no deadline."""
+
+    async def value(n: int) -> int:
+        await asyncio.sleep(0)
+        return n
+
+    assert await gather_until([value(1), value(2)], None) == [1, 2]
+    assert await gather_until([], None) == []
+
+
+@pytest.mark.asyncio
+async def test_iter_until_completion_order() -> None:
+    """Test results are yielded as they finish."""
+
+    async def value(n: int, delay: float) -> int:
+        await asyncio.sleep(delay)
+        return n
+
+    results = [n async for n in iter_until([value(1, 0.02), value(2, 0)], None)]
+    ordered = [
+        n async for n in iter_until([value(1, 0.02), value(2, 0)], None, ordered=True)
+    ]
+
+    assert results == [2, 1]
+    assert ordered == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_iter_until_cancels_pending_on_close() -> None:
+    """Test closing the generator early cancels the remaining awaitables."""
+    cancelled = 0
+
+    async def fast() -> str:
+        return "fast"
+
+    async def slow() -> str:
+        nonlocal cancelled
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled += 1
+            raise
+        return "slow"
+
+    results = iter_until([slow(), fast(), slow()], None)
+    async with aclosing(results):
+        async for result in results:
+            assert result == "fast"
+            break
+
+    assert cancelled == 2
+
+
+@pytest.mark.asyncio
+async def test_iter_until_stops_at_deadline() -> None:
+    """Test iteration ends at the deadline."""
+
+    async def value(n: int, delay: float) -> int:
+        await asyncio.sleep(delay)
+        return n
+
+    results = [
+        n async for n in iter_until([value(1, 0), value(2, 10)], deadline_after(0.02))
+    ]
+
+    assert results == [1]
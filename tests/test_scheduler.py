@@ -0,0 +1,133 @@
+"""Tests for scheduler module."""
+
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from iterm2_focus.focus import FocusError
+from iterm2_focus.scheduler import FocusScheduler
+
+
+@pytest.mark.asyncio
+async def test_single_request_is_applied() -> None:
+    """Test a lone request is applied after the window."""
+    focus = AsyncMock(return_value=True)
+    scheduler = FocusScheduler(focus, window=0.01)
+
+    outcome = await scheduler.submit("session1")
+
+    assert outcome.status == "applied"
+    assert outcome.success is True
+    assert outcome.applied_session_id == "session1"
+    focus.assert_awaited_once_with("session1")
+
+
+@pytest.mark.asyncio
+async def test_burst_last_writer_wins() -> None:
+    """Test only the last request of a burst reaches iTerm2."""
+    focus = AsyncMock(return_value=True)
+    scheduler = FocusScheduler(focus, window=0.01)
+
+    outcomes = await asyncio.gather(
+        scheduler.submit("session1"),
+        scheduler.submit("session2"),
+        scheduler.submit("session3"),
+    )
+
+    assert [o.status for o in outcomes] == ["preempted", "preempted", "applied"]
+    assert outcomes[0].success is False
+    assert [o.applied_session_id for o in outcomes] == [
+        "session2",
+        "session3",
+        "session3",
+    ]
+    focus.assert_awaited_once_with("session3")
+
+
+@pytest.mark.asyncio
+async def test_same_target_is_coalesced() -> None:
+    """Test repeated requests for one session share the activation."""
+    focus = AsyncMock(return_value=True)
+    scheduler = FocusScheduler(focus, window=0.01)
+
+    outcomes = await asyncio.gather(
+        scheduler.submit("session1"), scheduler.submit("session1")
+    )
+
+    assert [o.status for o in outcomes] == ["coalesced", "applied"]
+    assert all(o.success for o in outcomes)
+    focus.assert_awaited_once_with("session1")
+
+
+@pytest.mark.asyncio
+async def test_higher_priority_wins() -> None:
+    """Test a later lower-priority request does not override a higher one."""
+    focus = AsyncMock(return_value=True)
+    scheduler = FocusScheduler(focus, window=0.01)
+
+    outcomes = await asyncio.gather(
+        scheduler.submit("urgent", priority=10),
+        scheduler.submit("casual", priority=0),
+    )
+
+    assert outcomes[0].status == "applied"
+    assert outcomes[1].status == "preempted"
+    assert outcomes[1].applied_session_id == "urgent"
+    focus.assert_awaited_once_with("urgent")
+
+
+@pytest.mark.asyncio
+async def test_lower_priority_same_target_is_coalesced() -> None:
+    """Test a lower-priority request for the winner's session shares its result."""
+    focus = AsyncMock(return_value=True)
+    scheduler = FocusScheduler(focus, window=0.01)
+
+    outcomes = await asyncio.gather(
+        scheduler.submit("urgent", priority=10),
+        scheduler.submit("urgent", priority=0),
+    )
+
+    assert [o.status for o in outcomes] == ["applied", "coalesced"]
+    assert all(o.success for o in outcomes)
+    assert outcomes[1].applied_session_id == "urgent"
+    focus.assert_awaited_once_with("urgent")
+
+
+@pytest.mark.asyncio
+async def test_not_found_is_reported() -> None:
+    """Test the focus result is passed through."""
+    scheduler = FocusScheduler(AsyncMock(return_value=False), window=0)
+
+    outcome = await scheduler.submit("missing")
+
+    assert outcome.status == "applied"
+    assert outcome.success is False
+
+
+@pytest.mark.asyncio
+async def test_error_propagates_to_coalesced_requests() -> None:
+    """Test applied and coalesced requests receive the focus error."""
+    focus = AsyncMock(side_effect=FocusError("iTerm2 not running"))
+    scheduler = FocusScheduler(focus, window=0.01)
+
+    results = await asyncio.gather(
+        scheduler.submit("session1"),
+        scheduler.submit("session1"),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(r, FocusError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_separate_windows_apply_separately() -> None:
+    """Test requests in different windows are each applied."""
+    focus = AsyncMock(return_value=True)
+    scheduler = FocusScheduler(focus, window=0)
+
+    first = await scheduler.submit("session1")
+    second = await scheduler.submit("session2")
+
+    assert first.status == second.status == "applied"
+    assert focus.await_count == 2
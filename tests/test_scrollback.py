@@ -0,0 +1,213 @@
+"""Tests for scrollback module."""
+
+import asyncio
+import re
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from iterm2_focus.scrollback import TextIndex, required_grams, scrollback_index
+from iterm2_focus.search import search_sessions
+from iterm2_focus.topology import TopologySnapshot
+
+
+def test_required_grams() -> None:
+    """Test only trigrams every match must contain are required."""
+    assert required_grams(re.compile("Traceback")) == {
+        "tra",
+        "rac",
+        "ace",
+        "ceb",
+        "eba",
+        "bac",
+        "ack",
+    }
+    assert required_grams(re.compile("(?i)ERR(?:ors)+!")) == {"err", "ors"}
+    assert required_grams(re.compile("error|fail")) == set()
+    assert required_grams(re.compile("ab?cd")) == set()
+    assert required_grams(re.compile(r"x(\d+)?yz")) == set()
+
+
+@pytest.mark.asyncio
+async def test_index_searches_candidate_blocks_and_screen() -> None:
+    """Test final lines are found through postings and screen lines by scan."""
+    index = TextIndex()
+    index.append(
+        "a", [(0, "$ make"), (1, "Traceback (most recent call last):"), (2, "$")], 3
+    )
+    index.set_screen("a", [(3, "Traceback on screen")], 4)
+    index.append("b", [(0, "nothing here")], 1)
+    index.set_screen("b", [], 1)
+
+    matches = await index.search(re.compile("Traceback"))
+
+    assert [(m.session_id, m.line, m.lines_below) for m in matches] == [
+        ("a", 3, 0),
+        ("a", 1, 2),
+    ]
+    assert (await index.search(re.compile("here")))[0].session_id == "b"
+    recent = await index.search(re.compile("Traceback"), scrollback=2)
+    assert [m.line for m in recent] == [3]
+
+
+@pytest.mark.asyncio
+async def test_index_evicts_oldest_blocks() -> None:
+    """Test per-session and total limits evict whole blocks, oldest first."""
+    with patch("iterm2_focus.scrollback.BLOCK_LINES", 2):
+        index = TextIndex(max_lines=6, session_lines=4)
+        index.append("a", [(i, f"line {i}") for i in range(6)], 6)
+        assert len(index) == 4
+        assert not await index.search(re.compile("line 1"))
+
+        index.append("b", [(i, f"other {i}") for i in range(4)], 4)
+        assert len(index) == 6
+        assert not await index.search(re.compile("line 3"))
+        assert await index.search(re.compile("line 5"))
+
+        index.remove("a")
+        index.remove("b")
+    assert len(index) == 0
+    assert index._postings == {}
+
+
+@pytest.mark.asyncio
+async def test_index_reports_sessions_with_evicted_lines() -> None:
+    """Test lines evicted by the total limit make a session uncovered."""
+    with patch("iterm2_focus.scrollback.BLOCK_LINES", 2):
+        index = TextIndex(max_lines=6, session_lines=4)
+        index.append("a", [(i, f"line {i}") for i in range(4)], 4)
+        index.set_screen("a", [], 4)
+        assert index.uncovered(4) == set()
+
+        index.append("b", [(i, f"other {i}") for i in range(4)], 4)
+        index.set_screen("b", [], 4)
+        # a lost rows 0 and 1 to make room for b
+        assert index.uncovered(4) == {"a"}
+        assert index.uncovered(2) == set()
+
+        assert await index.search(re.compile("line 3"))
+        assert not await index.search(re.compile("line 3"), skip={"a"})
+
+
+class _FakeSession:
+    """A session whose output grows as the test appends rows."""
+
+    def __init__(self, session_id: str, rows: list[str], screen: int = 2) -> None:
+        self.session_id = session_id
+        self.rows = rows
+        self.screen = screen
+        self.fetched: list[tuple[int, int]] = []
+        self.async_get_line_info = AsyncMock(side_effect=self._line_info)
+        self.async_get_contents = AsyncMock(side_effect=self._contents)
+
+    async def _line_info(self) -> SimpleNamespace:
+        history = max(0, len(self.rows) - self.screen)
+        return SimpleNamespace(
+            overflow=0,
+            scrollback_buffer_height=history,
+            mutable_area_height=len(self.rows) - history,
+        )
+
+    async def _contents(self, first: int, count: int) -> list[SimpleNamespace]:
+        self.fetched.append((first, count))
+        return [
+            SimpleNamespace(string=row, hard_eol=True)
+            for row in self.rows[first : first + count]
+        ]
+
+
+def _snapshot(*sessions: _FakeSession) -> TopologySnapshot:
+    """Build a snapshot of one tab holding sessions, on an open connection."""
+    tab = MagicMock()
+    tab.tab_id = "tab1"
+    tab.sessions = list(sessions)
+    window = MagicMock()
+    window.window_id = "window1"
+    window.tabs = [tab]
+    app = MagicMock()
+    app.terminal_windows = [window]
+    app.connection.websocket = SimpleNamespace(open=True)
+    return TopologySnapshot.from_app(app)
+
+
+def _streamer(updates: asyncio.Queue[None]) -> Any:
+    """Patch ScreenStreamer to deliver an update per item put in updates."""
+
+    def streamer(connection: Any, session_id: str, want_contents: bool) -> MagicMock:
+        mock = MagicMock()
+        mock.__aenter__ = AsyncMock(return_value=mock)
+        mock.__aexit__ = AsyncMock(return_value=False)
+        mock.async_get = updates.get
+        return mock
+
+    return patch("iterm2_focus.scrollback.ScreenStreamer", side_effect=streamer)
+
+
+@pytest.mark.asyncio
+async def test_scrollback_index_fetches_only_new_rows() -> None:
+    """Test screen updates fetch new rows and searches fetch nothing."""
+    session = _FakeSession("a", ["$ make", "building", "$"])
+    snapshot = _snapshot(session)
+    app = snapshot.app
+    updates: asyncio.Queue[None] = asyncio.Queue()
+
+    with (
+        _streamer(updates),
+        patch("iterm2_focus.scrollback.REFRESH_INTERVAL", 0),
+    ):
+        assert await scrollback_index.async_start(snapshot) is True
+        try:
+            assert session.fetched == [(0, 3)]
+
+            session.rows += ["error: boom", "$"]
+            await updates.put(None)
+            for _ in range(5):
+                await asyncio.sleep(0)
+
+            # Rows 0 and 1 were final; only the rest is fetched again
+            assert session.fetched[1:] == [(1, 4)]
+            matches = [m async for m in search_sessions("boom", snapshot=snapshot)]
+            assert [(m.line, m.lines_below) for m in matches] == [(3, 1)]
+            assert len(session.fetched) == 2
+
+            # After iTerm2 quits the copy is dropped, with no callback run
+            app.connection.websocket.open = False
+            assert not scrollback_index.running
+            assert len(scrollback_index.index) == 0
+        finally:
+            await scrollback_index.async_stop()
+
+    assert len(scrollback_index.index) == 0
+
+
+@pytest.mark.asyncio
+async def test_search_reads_sessions_with_evicted_lines_live() -> None:
+    """Test a session that lost lines to the total limit is searched live."""
+    a = _FakeSession("a", [f"line {i}" for i in range(6)])
+    b = _FakeSession("b", [f"other {i}" for i in range(6)])
+    snapshot = _snapshot(a, b)
+
+    with (
+        _streamer(asyncio.Queue()),
+        patch("iterm2_focus.scrollback.BLOCK_LINES", 2),
+        patch.object(scrollback_index.index, "max_lines", 6),
+    ):
+        assert await scrollback_index.async_start(snapshot) is True
+        try:
+            assert scrollback_index.index.uncovered() == {"a"}
+            fetched = len(a.fetched), len(b.fetched)
+
+            matches = [
+                m async for m in search_sessions("line 1|other 5", snapshot=snapshot)
+            ]
+
+            assert sorted((m.session_id, m.line) for m in matches) == [
+                ("a", 1),
+                ("b", 5),
+            ]
+            assert len(a.fetched) > fetched[0]
+            assert len(b.fetched) == fetched[1]
+        finally:
+            await scrollback_index.async_stop()
@@ -0,0 +1,150 @@
+"""Tests for search module."""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from iterm2_focus.errors import FocusTimeoutError
+from iterm2_focus.search import Match, best_match, search_sessions
+from iterm2_focus.topology import TopologySnapshot
+
+
+def _mock_session(session_id: str, rows: list[str], overflow: int = 0) -> MagicMock:
+    """Build a session whose output is rows; a trailing "\\" marks a wrap."""
+    contents = [
+        SimpleNamespace(string=row.rstrip("\\"), hard_eol=not row.endswith("\\"))
+        for row in rows
+    ]
+    session = MagicMock()
+    session.session_id = session_id
+    session.async_get_line_info = AsyncMock(
+        return_value=SimpleNamespace(
+            overflow=overflow,
+            scrollback_buffer_height=len(rows) - 2,
+            mutable_area_height=2,
+        )
+    )
+
+    async def get_contents(first: int, count: int) -> list[SimpleNamespace]:
+        return contents[max(0, first - overflow) : first - overflow + count]
+
+    session.async_get_contents = AsyncMock(side_effect=get_contents)
+    return session
+
+
+def _snapshot(*sessions: MagicMock) -> TopologySnapshot:
+    tab = MagicMock()
+    tab.tab_id = "tab1"
+    tab.sessions = list(sessions)
+    window = MagicMock()
+    window.window_id = "window1"
+    window.tabs = [tab]
+    app = MagicMock()
+    app.terminal_windows = [window]
+    return TopologySnapshot.from_app(app)
+
+
+async def _collect(*args: Any, **kwargs: Any) -> list[Match]:
+    return [match async for match in search_sessions(*args, **kwargs)]
+
+
+@pytest.mark.asyncio
+async def test_search_joins_wrapped_lines_across_windows() -> None:
+    """Test lines wrapped across window boundaries are matched whole."""
+    rows = ["$ make", "Traceback (most\\", " recent call\\", " last):", "ok", "$"]
+    snapshot = _snapshot(_mock_session("a", rows, overflow=100))
+
+    with patch("iterm2_focus.search.WINDOW", 2):
+        matches = await _collect(r"most recent call last", snapshot=snapshot)
+
+    assert matches == [Match("a", 101, 4, "Traceback (most recent call last):", 11, 32)]
+
+
+@pytest.mark.asyncio
+async def test_search_yields_newest_first_within_scrollback() -> None:
+    """Test matches come newest first and old lines beyond scrollback are skipped."""
+    rows = [f"error {i}" for i in range(10)]
+    snapshot = _snapshot(_mock_session("a", rows))
+
+    with patch("iterm2_focus.search.WINDOW", 3):
+        matches = await _collect("error", snapshot=snapshot, scrollback=5)
+
+    assert [m.text for m in matches] == [f"error {i}" for i in range(9, 4, -1)]
+    assert best_match(matches) == matches[0]
+    assert best_match([]) is None
+
+
+@pytest.mark.asyncio
+async def test_search_matches_long_scrollback_in_the_pool() -> None:
+    """Test windows are matched together so long searches are offloaded."""
+    rows = [
+        f"{i:>6} {'error' if i % 1000 == 0 else 'ok'} {'.' * 90}" for i in range(8000)
+    ]
+    snapshot = _snapshot(_mock_session("a", rows))
+
+    with (
+        ThreadPoolExecutor() as pool,
+        patch("iterm2_focus.matcher._get_pool", return_value=pool) as get_pool,
+    ):
+        matches = await _collect("error", snapshot=snapshot)
+
+    assert get_pool.called
+    assert [m.line for m in matches] == list(range(7000, -1, -1000))
+
+
+@pytest.mark.asyncio
+async def test_search_skips_unreadable_sessions_and_bounds_concurrency() -> None:
+    """Test failing sessions are skipped and sessions are searched in turn."""
+    closed = _mock_session("closed", ["panic"])
+    closed.async_get_line_info = AsyncMock(side_effect=RuntimeError("gone"))
+    sessions = [_mock_session(f"s{i}", ["panic: boom", "$"]) for i in range(4)]
+    active = peak = 0
+
+    for session in sessions:
+        contents = session.async_get_contents.side_effect
+
+        async def tracked(
+            first: int,
+            count: int,
+            contents: Callable[[int, int], Awaitable[Any]] = contents,
+        ) -> list[SimpleNamespace]:
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0)
+            active -= 1
+            result: list[SimpleNamespace] = await contents(first, count)
+            return result
+
+        session.async_get_contents.side_effect = tracked
+
+    matches = await _collect(
+        "panic", snapshot=_snapshot(closed, *sessions), concurrency=2
+    )
+
+    assert sorted(m.session_id for m in matches) == ["s0", "s1", "s2", "s3"]
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_search_times_out_after_yielding_what_it_found() -> None:
+    """Test a stalled session ends the search with FocusTimeoutError."""
+    stalled = _mock_session("stalled", ["error"])
+
+    async def stall(first: int, count: int) -> None:
+        await asyncio.Event().wait()
+
+    stalled.async_get_contents = AsyncMock(side_effect=stall)
+    snapshot = _snapshot(_mock_session("a", ["error", "$"]), stalled)
+    found: list[Match] = []
+
+    with pytest.raises(FocusTimeoutError):
+        async for match in search_sessions("error", 0.05, snapshot):
+            found.append(match)
+
+    assert [m.session_id for m in found] == ["a"]
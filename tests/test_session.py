@@ -0,0 +1,41 @@
+"""Tests for session module."""
+
+import dataclasses
+import json
+
+import pytest
+
+from iterm2_focus.session import Session
+
+
+def test_to_dict() -> None:
+    """Test conversion to a dictionary with every field."""
+    session = Session(session_id="session1", window_id="window1", name="Build")
+
+    assert session.to_dict() == {
+        "session_id": "session1",
+        "window_id": "window1",
+        "tab_id": None,
+        "name": "Build",
+        "hostname": None,
+        "username": None,
+        "path": None,
+        "tty": None,
+        "is_active": None,
+    }
+
+
+def test_to_json() -> None:
+    """Test conversion to JSON."""
+    session = Session(session_id="session1", path="/home/user")
+
+    assert json.loads(session.to_json()) == session.to_dict()
+
+
+def test_is_immutable_and_slotted() -> None:
+    """Test records cannot be modified and carry no per-instance dict."""
+    session = Session(session_id="session1")
+
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        session.name = "changed"  # type: ignore[misc]
+    assert not hasattr(session, "__dict__")
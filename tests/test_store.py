@@ -0,0 +1,94 @@
+"""Tests for store module."""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from iterm2_focus.session import Session
+from iterm2_focus.store import (
+    FORMAT,
+    STALE_AFTER,
+    cache_listing,
+    cache_path,
+    load_cached_listing,
+    load_listing,
+    save_listing,
+)
+
+
+def test_save_and_load_round_trip(tmp_path: Path) -> None:
+    """Test a saved listing loads back unchanged."""
+    path = tmp_path / "nested" / "sessions.json"
+    sessions = [
+        Session(session_id="session1", window_id="window1", name="Build"),
+        Session(session_id="session2", path="/home/user", tty="/dev/ttys001"),
+    ]
+
+    save_listing(path, sessions, "abc123")
+    saved = load_listing(path)
+
+    assert saved is not None
+    assert saved.sessions == tuple(sessions)
+    assert saved.version == "abc123"
+    assert 0 <= saved.age < STALE_AFTER
+    assert [p.name for p in path.parent.iterdir()] == ["sessions.json"]
+
+
+def test_load_missing_or_corrupt_file(tmp_path: Path) -> None:
+    """Test unreadable files load as None."""
+    path = tmp_path / "sessions.json"
+    assert load_listing(path) is None
+
+    path.write_text("{not json")
+    assert load_listing(path) is None
+
+    path.write_text(json.dumps({"format": FORMAT + 1, "sessions": []}))
+    assert load_listing(path) is None
+
+
+def test_load_ignores_unknown_fields(tmp_path: Path) -> None:
+    """Test fields written by a newer version are dropped."""
+    path = tmp_path / "sessions.json"
+    path.write_text(
+        json.dumps(
+            {
+                "format": FORMAT,
+                "version": None,
+                "saved_at": 0,
+                "fields": ["session_id", "colour"],
+                "sessions": [["session1", "red"]],
+            }
+        )
+    )
+
+    saved = load_listing(path)
+
+    assert saved is not None
+    assert saved.sessions == (Session(session_id="session1"),)
+
+
+def test_cache_listing_uses_cache_dir(tmp_path: Path) -> None:
+    """Test the cached listing lives in the cache directory."""
+    assert load_cached_listing() is None
+
+    cache_listing([Session(session_id="session1")], "etag1")
+    saved = load_cached_listing()
+
+    assert cache_path() == tmp_path / "cache" / "sessions.json"
+    assert saved is not None
+    assert saved.version == "etag1"
+    assert not saved.stale
+
+
+def test_cache_listing_ignores_write_errors(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test an unwritable cache directory does not raise."""
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    monkeypatch.setenv("ITERM2_FOCUS_CACHE_DIR", str(blocker / "cache"))
+
+    cache_listing([Session(session_id="session1")])
+
+    assert load_cached_listing() is None
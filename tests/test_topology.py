@@ -0,0 +1,322 @@
+"""Tests for topology module."""
+
+import asyncio
+from collections.abc import Callable
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from iterm2_focus.errors import FocusTimeoutError
+from iterm2_focus.focus import async_focus_session
+from iterm2_focus.topology import (
+    TopologySnapshot,
+    async_get_snapshot,
+    async_wait_for_session,
+    topology_tracker,
+)
+from iterm2_focus.utils import get_all_sessions, get_session_info
+
+
+def _mock_app() -> MagicMock:
+    """Build an app with two tabs in one window."""
+    tabs = []
+    for tab_id, session_ids in [("tab1", ["session1", "session2"]), ("tab2", ["s3"])]:
+        tab = MagicMock()
+        tab.tab_id = tab_id
+        tab.async_select = AsyncMock()
+        tab.sessions = []
+        for session_id in session_ids:
+            session = MagicMock()
+            session.session_id = session_id
+            session.async_activate = AsyncMock()
+            session.async_get_variable = AsyncMock(return_value=None)
+            tab.sessions.append(session)
+        tabs.append(tab)
+
+    window = MagicMock()
+    window.window_id = "window1"
+    window.tabs = tabs
+    window.async_activate = AsyncMock()
+
+    app = MagicMock()
+    app.terminal_windows = [window]
+    return app
+
+
+def test_from_app_indexes_topology() -> None:
+    """Test the snapshot maps are built from one walk."""
+    app = _mock_app()
+    snapshot = TopologySnapshot.from_app(app)
+
+    assert len(snapshot) == 3
+    assert "session2" in snapshot
+    assert "missing" not in snapshot
+    assert [s.session_id for _, _, s in snapshot.entries()] == [
+        "session1",
+        "session2",
+        "s3",
+    ]
+    entry = snapshot.find("s3")
+    assert entry is not None
+    window, tab, session = entry
+    assert (window.window_id, tab.tab_id) == ("window1", "tab2")
+    assert [t.tab_id for t in snapshot.window_tabs["window1"]] == ["tab1", "tab2"]
+    assert len(snapshot.tab_sessions["tab1"]) == 2
+    assert snapshot.find("missing") is None
+
+
+def test_versions_increase() -> None:
+    """Test each new snapshot gets a greater version."""
+    app = _mock_app()
+    first = TopologySnapshot.from_app(app)
+    second = TopologySnapshot.from_app(app)
+
+    assert second.version > first.version
+    assert TopologySnapshot.from_app(app, version=first.version).version == (
+        first.version
+    )
+
+
+@pytest.mark.asyncio
+async def test_compound_operation_connects_once() -> None:
+    """Test helpers given a snapshot reuse it instead of reconnecting."""
+    app = _mock_app()
+    mock_create = AsyncMock()
+
+    with (
+        patch("iterm2_focus.connection.Connection.async_create", mock_create),
+        patch("iterm2_focus.connection.async_get_app", AsyncMock(return_value=app)),
+    ):
+        snapshot = await async_get_snapshot()
+        assert snapshot is not None
+        info = await get_session_info("session2", snapshot=snapshot)
+        focused = await async_focus_session("session2", snapshot=snapshot)
+
+    mock_create.assert_awaited_once()
+    assert info is not None
+    assert info.tab_id == "tab1"
+    assert focused is True
+    app.terminal_windows[0].tabs[0].sessions[1].async_activate.assert_awaited_once()
+
+
+def test_etag_follows_layout() -> None:
+    """Test the etag only changes when the layout does."""
+    app = _mock_app()
+    first = TopologySnapshot.from_app(app)
+    assert TopologySnapshot.from_app(app).etag == first.etag
+
+    session = MagicMock()
+    session.session_id = "s4"
+    app.terminal_windows[0].tabs[1].sessions.append(session)
+
+    assert TopologySnapshot.from_app(app).etag != first.etag
+
+
+@pytest.mark.asyncio
+async def test_tracker_reuses_snapshot_until_change() -> None:
+    """Test a running tracker serves snapshots without RPCs until a change."""
+    app = _mock_app()
+    mock_create = AsyncMock()
+    callbacks: list[Callable[..., Any]] = []
+
+    async def subscribe(connection: Any, callback: Callable[..., Any]) -> int:
+        callbacks.append(callback)
+        return len(callbacks)
+
+    with (
+        patch("iterm2_focus.connection.Connection.async_create", mock_create),
+        patch("iterm2_focus.connection.async_get_app", AsyncMock(return_value=app)),
+        patch(
+            "iterm2_focus.topology.async_subscribe_to_layout_change_notification",
+            subscribe,
+        ),
+        patch(
+            "iterm2_focus.topology.async_subscribe_to_new_session_notification",
+            subscribe,
+        ),
+        patch(
+            "iterm2_focus.topology.async_subscribe_to_terminate_session_notification",
+            subscribe,
+        ),
+        patch("iterm2_focus.topology.async_unsubscribe", AsyncMock()) as unsub,
+    ):
+        await topology_tracker.async_start(app.connection)
+        first = await async_get_snapshot()
+        second = await async_get_snapshot()
+        assert second is first
+        assert mock_create.await_count == 1
+
+        # A layout change invalidates the remembered snapshot
+        await callbacks[0](app.connection, None)
+        third = await async_get_snapshot()
+        assert third is not first
+        assert mock_create.await_count == 2
+
+        await topology_tracker.async_stop()
+        assert topology_tracker.running is False
+        assert unsub.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_tracker_stops_when_connection_closes() -> None:
+    """Test a closed connection is noticed without a disconnect callback."""
+    app = _mock_app()
+    app.connection.websocket = SimpleNamespace(open=True)
+    mock_create = AsyncMock()
+
+    async def subscribe(
+        connection: Any, callback: Callable[..., Any]
+    ) -> Callable[..., Any]:
+        return callback
+
+    with (
+        patch("iterm2_focus.connection.Connection.async_create", mock_create),
+        patch("iterm2_focus.connection.async_get_app", AsyncMock(return_value=app)),
+        patch(
+            "iterm2_focus.topology.async_subscribe_to_layout_change_notification",
+            subscribe,
+        ),
+        patch(
+            "iterm2_focus.topology.async_subscribe_to_new_session_notification",
+            subscribe,
+        ),
+        patch(
+            "iterm2_focus.topology.async_subscribe_to_terminate_session_notification",
+            subscribe,
+        ),
+    ):
+        await topology_tracker.async_start(app.connection)
+        first = await async_get_snapshot()
+        assert await async_get_snapshot() is first
+
+        # iTerm2 quits: the websocket closes and no callback runs
+        app.connection.websocket.open = False
+        generation = topology_tracker.generation
+
+        assert topology_tracker.cached() is None
+        assert topology_tracker.running is False
+        assert topology_tracker.generation == generation + 1
+        assert await async_get_snapshot() is not first
+        assert mock_create.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_get_all_sessions_if_changed_since() -> None:
+    """Test an unchanged layout skips fetching session metadata."""
+    app = _mock_app()
+
+    with (
+        patch("iterm2_focus.connection.Connection.async_create", AsyncMock()),
+        patch("iterm2_focus.connection.async_get_app", AsyncMock(return_value=app)),
+    ):
+        etag = TopologySnapshot.from_app(app).etag
+        unchanged = await get_all_sessions(if_changed_since=etag)
+        changed = await get_all_sessions(if_changed_since="stale")
+
+    assert unchanged is None
+    assert changed is not None
+    assert len(changed) == 3
+
+
+@pytest.mark.asyncio
+async def test_tracker_wait_for_change() -> None:
+    """Test waiters wake on a change and time out otherwise."""
+    assert await topology_tracker.wait_for_change(0.01) is False
+
+    waiter = asyncio.create_task(topology_tracker.wait_for_change(5))
+    await asyncio.sleep(0)
+    topology_tracker._changed()
+
+    assert await waiter is True
+
+
+def _add_session(app: MagicMock, session_id: str) -> MagicMock:
+    """Open a new session in the app's second tab."""
+    session = MagicMock()
+    session.session_id = session_id
+    session.async_activate = AsyncMock()
+    app.terminal_windows[0].tabs[1].sessions.append(session)
+    return session
+
+
+@pytest.mark.asyncio
+async def test_focus_waits_for_session_on_one_connection() -> None:
+    """Test wait focuses a new session on notification, without reconnecting."""
+    app = _mock_app()
+    app.async_refresh = AsyncMock()
+    mock_create = AsyncMock()
+    callbacks: list[Callable[..., Any]] = []
+
+    async def subscribe(connection: Any, callback: Callable[..., Any]) -> int:
+        callbacks.append(callback)
+        return len(callbacks)
+
+    with (
+        patch("iterm2_focus.connection.Connection.async_create", mock_create),
+        patch("iterm2_focus.connection.async_get_app", AsyncMock(return_value=app)),
+        patch(
+            "iterm2_focus.topology.async_subscribe_to_layout_change_notification",
+            subscribe,
+        ),
+        patch(
+            "iterm2_focus.topology.async_subscribe_to_new_session_notification",
+            subscribe,
+        ),
+        patch(
+            "iterm2_focus.topology.async_subscribe_to_terminate_session_notification",
+            subscribe,
+        ),
+        patch("iterm2_focus.topology.async_unsubscribe", AsyncMock()),
+    ):
+        assert await async_focus_session("new") is False
+
+        waiting = asyncio.create_task(async_focus_session("new", wait=True))
+        for _ in range(10):
+            await asyncio.sleep(0)
+        assert not waiting.done()
+        # Looked again once subscribed, then waits without fetching
+        assert app.async_refresh.await_count == 1
+
+        session = _add_session(app, "new")
+        await callbacks[1](app.connection, None)
+        assert await asyncio.wait_for(waiting, 1) is True
+
+        session.async_activate.assert_awaited_once()
+        assert app.async_refresh.await_count == 2
+        assert mock_create.await_count == 2
+
+        with pytest.raises(FocusTimeoutError):
+            await async_focus_session("never", timeout=0.01, wait=True)
+
+        await topology_tracker.async_stop()
+
+
+@pytest.mark.asyncio
+async def test_wait_for_session_polls_without_notifications() -> None:
+    """Test the layout is refetched periodically if subscribing fails."""
+    app = _mock_app()
+    refreshes = 0
+
+    async def refresh() -> None:
+        nonlocal refreshes
+        refreshes += 1
+        if refreshes == 3:
+            _add_session(app, "late")
+
+    app.async_refresh = AsyncMock(side_effect=refresh)
+    with (
+        patch(
+            "iterm2_focus.topology.async_subscribe_to_layout_change_notification",
+            AsyncMock(side_effect=ConnectionError),
+        ),
+        patch("iterm2_focus.topology.WAIT_FALLBACK_INTERVAL", 0),
+    ):
+        snapshot = await async_wait_for_session(
+            "late", snapshot=TopologySnapshot.from_app(app)
+        )
+
+    assert snapshot is not None
+    assert "late" in snapshot
+    assert refreshes == 3
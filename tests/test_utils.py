@@ -1,14 +1,19 @@
 """Tests for utils module."""
 
+import asyncio
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
+from iterm2_focus.history import load_history
 from iterm2_focus.utils import (
     focus_session_by_name,
     get_all_sessions,
     get_session_info,
+    get_sessions_info,
+    iter_sessions,
     run_async,
+    sessions_exist,
 )
 
 
@@ -45,21 +50,22 @@ async def test_get_session_info_found() -> None:
 
     with (
         patch(
-            "iterm2_focus.utils.Connection.async_create", return_value=mock_connection
+            "iterm2_focus.connection.Connection.async_create",
+            return_value=mock_connection,
         ),
-        patch("iterm2_focus.utils.async_get_app", return_value=mock_app),
+        patch("iterm2_focus.connection.async_get_app", return_value=mock_app),
     ):
         info = await get_session_info("test_session_id")
 
     assert info is not None
-    assert info["id"] == "test_session_id"
-    assert info["name"] == "Test Session"
-    assert info["hostname"] == "test.host"
-    assert info["username"] == "testuser"
-    assert info["path"] == "/test/path"
-    assert info["tty"] == "/dev/ttys001"
-    assert info["window_id"] == "window1"
-    assert info["tab_id"] == "tab1"
+    assert info.session_id == "test_session_id"
+    assert info.name == "Test Session"
+    assert info.hostname == "test.host"
+    assert info.username == "testuser"
+    assert info.path == "/test/path"
+    assert info.tty == "/dev/ttys001"
+    assert info.window_id == "window1"
+    assert info.tab_id == "tab1"
 
 
 @pytest.mark.asyncio
@@ -81,9 +87,10 @@ async def test_get_session_info_not_found() -> None:
 
     with (
         patch(
-            "iterm2_focus.utils.Connection.async_create", return_value=mock_connection
+            "iterm2_focus.connection.Connection.async_create",
+            return_value=mock_connection,
         ),
-        patch("iterm2_focus.utils.async_get_app", return_value=mock_app),
+        patch("iterm2_focus.connection.async_get_app", return_value=mock_app),
     ):
         info = await get_session_info("test_session_id")
 
@@ -95,6 +102,7 @@ async def test_focus_session_by_name_found() -> None:
     """Test focusing session by name when match found."""
     # Mock session with matching name
     mock_session = MagicMock()
+    mock_session.session_id = "production"
     mock_session.async_get_variable = AsyncMock(return_value="Test Production Server")
     mock_session.async_activate = AsyncMock()
 
@@ -113,9 +121,10 @@ async def test_focus_session_by_name_found() -> None:
 
     with (
         patch(
-            "iterm2_focus.utils.Connection.async_create", return_value=mock_connection
+            "iterm2_focus.connection.Connection.async_create",
+            return_value=mock_connection,
         ),
-        patch("iterm2_focus.utils.async_get_app", return_value=mock_app),
+        patch("iterm2_focus.connection.async_get_app", return_value=mock_app),
     ):
         result = await focus_session_by_name("production")
 
@@ -123,12 +132,14 @@ async def test_focus_session_by_name_found() -> None:
     mock_session.async_activate.assert_called_once()
     mock_tab.async_select.assert_called_once()
     mock_window.async_activate.assert_called_once()
+    assert load_history().entries[-1] == "production"
 
 
 @pytest.mark.asyncio
 async def test_focus_session_by_name_case_insensitive() -> None:
     """Test focusing session by name is case insensitive."""
     mock_session = MagicMock()
+    mock_session.session_id = "production"
     mock_session.async_get_variable = AsyncMock(return_value="Test PRODUCTION Server")
     mock_session.async_activate = AsyncMock()
 
@@ -147,9 +158,10 @@ async def test_focus_session_by_name_case_insensitive() -> None:
 
     with (
         patch(
-            "iterm2_focus.utils.Connection.async_create", return_value=mock_connection
+            "iterm2_focus.connection.Connection.async_create",
+            return_value=mock_connection,
         ),
-        patch("iterm2_focus.utils.async_get_app", return_value=mock_app),
+        patch("iterm2_focus.connection.async_get_app", return_value=mock_app),
     ):
         result = await focus_session_by_name("production")
 
@@ -176,9 +188,10 @@ async def test_focus_session_by_name_not_found() -> None:
 
     with (
         patch(
-            "iterm2_focus.utils.Connection.async_create", return_value=mock_connection
+            "iterm2_focus.connection.Connection.async_create",
+            return_value=mock_connection,
         ),
-        patch("iterm2_focus.utils.async_get_app", return_value=mock_app),
+        patch("iterm2_focus.connection.async_get_app", return_value=mock_app),
     ):
         result = await focus_session_by_name("production")
 
@@ -231,21 +244,22 @@ async def test_get_all_sessions() -> None:
 
     with (
         patch(
-            "iterm2_focus.utils.Connection.async_create", return_value=mock_connection
+            "iterm2_focus.connection.Connection.async_create",
+            return_value=mock_connection,
         ),
-        patch("iterm2_focus.utils.async_get_app", return_value=mock_app),
+        patch("iterm2_focus.connection.async_get_app", return_value=mock_app),
     ):
         sessions = await get_all_sessions()
 
     assert len(sessions) == 2
 
-    assert sessions[0]["id"] == "session1"
-    assert sessions[0]["name"] == "Session 1"
-    assert sessions[0]["hostname"] == "host1"
+    assert sessions[0].session_id == "session1"
+    assert sessions[0].name == "Session 1"
+    assert sessions[0].hostname == "host1"
 
-    assert sessions[1]["id"] == "session2"
-    assert sessions[1]["name"] == "Unnamed"  # Default for None
-    assert sessions[1]["hostname"] == "host2"
+    assert sessions[1].session_id == "session2"
+    assert sessions[1].name is None  # Unnamed session
+    assert sessions[1].hostname == "host2"
 
 
 def test_run_async() -> None:
@@ -266,3 +280,220 @@ def test_run_async_with_exception() -> None:
 
     with pytest.raises(ValueError, match="Test error"):
         run_async(failing_coroutine())
+
+
+@pytest.mark.asyncio
+async def test_get_all_sessions_coalesces_concurrent_calls() -> None:
+    """Test concurrent get_all_sessions calls share one tree walk."""
+    import asyncio
+
+    mock_session = MagicMock()
+    mock_session.session_id = "session1"
+    mock_session.async_get_variable = AsyncMock(return_value="value")
+
+    mock_tab = MagicMock()
+    mock_tab.sessions = [mock_session]
+
+    mock_window = MagicMock()
+    mock_window.tabs = [mock_tab]
+
+    mock_app = MagicMock()
+    mock_app.terminal_windows = [mock_window]
+
+    with (
+        patch(
+            "iterm2_focus.connection.Connection.async_create", return_value=AsyncMock()
+        ) as mock_create,
+        patch("iterm2_focus.connection.async_get_app", return_value=mock_app),
+    ):
+        results = await asyncio.gather(*[get_all_sessions() for _ in range(3)])
+
+    mock_create.assert_called_once()
+    assert results[0] is results[1] is results[2]
+    assert results[0][0].session_id == "session1"
+
+
+@pytest.mark.asyncio
+async def test_get_all_sessions_timeout_returns_partial() -> None:
+    """Test sessions whose metadata is late are left out at the deadline."""
+    import asyncio
+
+    async def slow_variable(var: str) -> str:
+        await asyncio.sleep(10)
+        return "late"
+
+    fast_session = MagicMock()
+    fast_session.session_id = "fast"
+    fast_session.async_get_variable = AsyncMock(return_value="value")
+
+    slow_session = MagicMock()
+    slow_session.session_id = "slow"
+    slow_session.async_get_variable = slow_variable
+
+    mock_tab = MagicMock()
+    mock_tab.sessions = [fast_session, slow_session]
+
+    mock_window = MagicMock()
+    mock_window.tabs = [mock_tab]
+
+    mock_app = MagicMock()
+    mock_app.terminal_windows = [mock_window]
+
+    with (
+        patch(
+            "iterm2_focus.connection.Connection.async_create", return_value=AsyncMock()
+        ),
+        patch("iterm2_focus.connection.async_get_app", return_value=mock_app),
+    ):
+        sessions = await get_all_sessions(timeout=0.5)
+
+    assert [s.session_id for s in sessions] == ["fast"]
+
+
+@pytest.mark.asyncio
+async def test_get_all_sessions_if_changed_since_shares_timeout() -> None:
+    """Test the layout check and the listing share one deadline."""
+
+    async def slow_variable(name: str) -> str:
+        await asyncio.sleep(0.06)
+        return "value"
+
+    session = MagicMock()
+    session.session_id = "slow"
+    session.async_get_variable = slow_variable
+    mock_tab = MagicMock()
+    mock_tab.sessions = [session]
+    mock_window = MagicMock()
+    mock_window.tabs = [mock_tab]
+    mock_app = MagicMock()
+    mock_app.terminal_windows = [mock_window]
+
+    async def slow_app(connection: object) -> MagicMock:
+        await asyncio.sleep(0.06)
+        return mock_app
+
+    with (
+        patch(
+            "iterm2_focus.connection.Connection.async_create", return_value=AsyncMock()
+        ),
+        patch("iterm2_focus.connection.async_get_app", slow_app),
+    ):
+        sessions = await get_all_sessions(timeout=0.1, if_changed_since="stale")
+
+    # Either step fits in the timeout, but not both
+    assert sessions == []
+
+
+@pytest.mark.asyncio
+async def test_get_session_info_timeout() -> None:
+    """Test get_session_info raises FocusTimeoutError when iTerm2 stalls."""
+    import asyncio
+
+    from iterm2_focus.focus import FocusTimeoutError
+
+    async def stall() -> None:
+        await asyncio.sleep(10)
+
+    with (
+        patch("iterm2_focus.connection.Connection.async_create", side_effect=stall),
+        pytest.raises(FocusTimeoutError),
+    ):
+        await get_session_info("test_session_id", timeout=0.01)
+
+
+def _app_with_sessions(*session_ids: str) -> MagicMock:
+    """Build an app whose single tab holds the given sessions."""
+    sessions = []
+    for session_id in session_ids:
+        session = MagicMock()
+        session.session_id = session_id
+        session.async_get_variable = AsyncMock(
+            side_effect=lambda var, sid=session_id: f"{sid}:{var}"
+        )
+        sessions.append(session)
+
+    mock_tab = MagicMock()
+    mock_tab.tab_id = "tab1"
+    mock_tab.sessions = sessions
+
+    mock_window = MagicMock()
+    mock_window.window_id = "window1"
+    mock_window.tabs = [mock_tab]
+
+    mock_app = MagicMock()
+    mock_app.terminal_windows = [mock_window]
+    return mock_app
+
+
+@pytest.mark.asyncio
+async def test_sessions_exist() -> None:
+    """Test bulk existence checks use one snapshot and no metadata RPCs."""
+    mock_app = _app_with_sessions("session1", "session2")
+    mock_create = AsyncMock()
+
+    with (
+        patch("iterm2_focus.connection.Connection.async_create", mock_create),
+        patch("iterm2_focus.connection.async_get_app", return_value=mock_app),
+    ):
+        result = await sessions_exist(["session2", "gone", "session1"])
+
+    assert result == {"session2": True, "gone": False, "session1": True}
+    mock_create.assert_awaited_once()
+    for session in mock_app.terminal_windows[0].tabs[0].sessions:
+        session.async_get_variable.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_sessions_info() -> None:
+    """Test metadata is fetched only for live sessions."""
+    mock_app = _app_with_sessions("session1", "session2")
+
+    with (
+        patch("iterm2_focus.connection.Connection.async_create", AsyncMock()),
+        patch("iterm2_focus.connection.async_get_app", return_value=mock_app),
+    ):
+        infos = await get_sessions_info(["session1", "gone"])
+
+    assert list(infos) == ["session1", "gone"]
+    assert infos["gone"] is None
+    assert infos["session1"] is not None
+    assert infos["session1"].name == "session1:session.name"
+    assert infos["session1"].window_id == "window1"
+    session2 = mock_app.terminal_windows[0].tabs[0].sessions[1]
+    session2.async_get_variable.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_iter_sessions_tree_order() -> None:
+    """Test iter_sessions yields every session in tree order."""
+    mock_app = _app_with_sessions("session1", "session2")
+
+    with (
+        patch("iterm2_focus.connection.Connection.async_create", AsyncMock()),
+        patch("iterm2_focus.connection.async_get_app", return_value=mock_app),
+    ):
+        sessions = [s async for s in iter_sessions(order="tree")]
+
+    assert [s.session_id for s in sessions] == ["session1", "session2"]
+    assert sessions[0].window_id == "window1"
+
+
+@pytest.mark.asyncio
+async def test_iter_sessions_completion_order() -> None:
+    """Test a slow session does not hold back the others."""
+    mock_app = _app_with_sessions("slow", "fast")
+    slow = mock_app.terminal_windows[0].tabs[0].sessions[0]
+
+    async def slow_variable(var: str) -> str:
+        await asyncio.sleep(0.02)
+        return var
+
+    slow.async_get_variable = AsyncMock(side_effect=slow_variable)
+
+    with (
+        patch("iterm2_focus.connection.Connection.async_create", AsyncMock()),
+        patch("iterm2_focus.connection.async_get_app", return_value=mock_app),
+    ):
+        sessions = [s.session_id async for s in iter_sessions()]
+
+    assert sessions == ["fast", "slow"]
@@ -0,0 +1,144 @@
+"""Tests for watch module."""
+
+import asyncio
+from contextlib import aclosing
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from iterm2.focus import FocusUpdate, FocusUpdateWindowChanged
+
+from iterm2_focus.history import load_history
+from iterm2_focus.session import Session
+from iterm2_focus.store import load_listing, save_listing
+from iterm2_focus.topology import topology_tracker
+from iterm2_focus.watch import record_focus_changes, watch_sessions
+
+
+def _mock_session(session_id: str) -> MagicMock:
+    session = MagicMock()
+    session.session_id = session_id
+    session.async_get_variable = AsyncMock(return_value=None)
+    return session
+
+
+@pytest.mark.asyncio
+async def test_watch_reports_initial_listing_then_changes(tmp_path: Path) -> None:
+    """Test the first event adds everything and later ones carry the diff."""
+    tab = MagicMock()
+    tab.tab_id = "tab1"
+    tab.sessions = [_mock_session("session1")]
+    window = MagicMock()
+    window.window_id = "window1"
+    window.tabs = [tab]
+    app = MagicMock()
+    app.terminal_windows = [window]
+    saved = tmp_path / "sessions.json"
+
+    with (
+        patch("iterm2_focus.connection.Connection.async_create", AsyncMock()),
+        patch("iterm2_focus.connection.async_get_app", AsyncMock(return_value=app)),
+        patch(
+            "iterm2_focus.topology.async_subscribe_to_layout_change_notification",
+            AsyncMock(),
+        ),
+        patch(
+            "iterm2_focus.topology.async_subscribe_to_new_session_notification",
+            AsyncMock(),
+        ),
+        patch(
+            "iterm2_focus.topology.async_subscribe_to_terminate_session_notification",
+            AsyncMock(),
+        ),
+    ):
+        async with aclosing(
+            watch_sessions(interval=0.01, timeout=5, save_to=saved)
+        ) as events:
+            first = await anext(events)
+            assert topology_tracker.running
+
+            tab.sessions = [_mock_session("session2")]
+            topology_tracker._changed()
+            second = await anext(events)
+
+    assert [s.session_id for s in first.added] == ["session1"]
+    assert not first.removed
+    assert [s.session_id for s in second.added] == ["session2"]
+    assert [s.session_id for s in second.removed] == ["session1"]
+    listing = load_listing(saved)
+    assert listing is not None
+    assert [s.session_id for s in listing.sessions] == ["session2"]
+
+
+@pytest.mark.asyncio
+async def test_watch_skips_incomplete_listing(tmp_path: Path) -> None:
+    """Test a listing missing sessions is not reported as removals."""
+    tab = MagicMock()
+    tab.tab_id = "tab1"
+    tab.sessions = [_mock_session("session1"), _mock_session("session2")]
+    window = MagicMock()
+    window.window_id = "window1"
+    window.tabs = [tab]
+    app = MagicMock()
+    app.terminal_windows = [window]
+    complete = [Session(session_id="session1"), Session(session_id="session2")]
+    listings = AsyncMock(side_effect=[complete, complete[1:], *[complete] * 100])
+
+    with (
+        patch("iterm2_focus.connection.Connection.async_create", AsyncMock()),
+        patch("iterm2_focus.connection.async_get_app", AsyncMock(return_value=app)),
+        patch("iterm2_focus.topology.async_track_changes", AsyncMock()),
+        patch("iterm2_focus.watch.async_track_changes", AsyncMock()),
+        patch("iterm2_focus.watch.get_all_sessions", listings),
+        patch("iterm2_focus.watch.save_listing", wraps=save_listing) as save,
+    ):
+        async with aclosing(
+            watch_sessions(interval=0.01, timeout=5, save_to=tmp_path / "s.json")
+        ) as events:
+            first = await anext(events)
+            with pytest.raises(TimeoutError):
+                async with asyncio.timeout(0.2):
+                    await anext(events)
+
+    assert [s.session_id for s in first.added] == ["session1", "session2"]
+    assert listings.await_count >= 3
+    # Only complete listings are saved
+    assert all(len(call.args[1]) == 2 for call in save.call_args_list)
+
+
+@pytest.mark.asyncio
+async def test_record_focus_changes_updates_history() -> None:
+    """Test session, tab and window focus changes are recorded."""
+    app = MagicMock()
+    app.get_tab_by_id.return_value.current_session.session_id = "tab-session"
+    app.get_window_by_id.return_value.current_tab.current_session.session_id = (
+        "window-session"
+    )
+    updates = [
+        FocusUpdate(active_session_changed=MagicMock(session_id="session1")),
+        FocusUpdate(selected_tab_changed=MagicMock(tab_id="tab2")),
+        FocusUpdate(
+            window_changed=FocusUpdateWindowChanged(
+                "window1", FocusUpdateWindowChanged.Reason.TERMINAL_WINDOW_RESIGNED_KEY
+            )
+        ),
+        FocusUpdate(
+            window_changed=FocusUpdateWindowChanged(
+                "window2", FocusUpdateWindowChanged.Reason.TERMINAL_WINDOW_BECAME_KEY
+            )
+        ),
+    ]
+    monitor = MagicMock()
+    monitor.__aenter__ = AsyncMock(return_value=monitor)
+    monitor.__aexit__ = AsyncMock(return_value=False)
+    monitor.async_get_next_update = AsyncMock(
+        side_effect=[*updates, asyncio.CancelledError()]
+    )
+
+    with (
+        patch("iterm2_focus.watch.FocusMonitor", return_value=monitor),
+        pytest.raises(asyncio.CancelledError),
+    ):
+        await record_focus_changes(app)
+
+    assert load_history().entries == ("session1", "tab-session", "window-session")